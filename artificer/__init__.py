@@ -5,9 +5,20 @@ __version__ = '0.0.1'
 def main(global_config, **settings):
     """ This function returns a Pyramid WSGI application.
     """
+    from artificer.lib.cache import configure_result_cache
+    from artificer.lib.events import start_event_broadcaster
+    from artificer.lib.facets import warm_facet_engine
+    from artificer.lib.jobs import start_import_worker
+    from artificer.lib.vocabulary import warm_vocabulary_cache
+
     config = Configurator(settings=settings)
     config.include('pyramid_jinja2')
     config.include('.models')
     config.include('.routes')
     config.scan()
+    configure_result_cache(settings)
+    warm_vocabulary_cache(config.registry['dbsession_factory'])
+    warm_facet_engine(config.registry['dbsession_factory'])
+    start_event_broadcaster(settings, config.registry['dbsession_factory'])
+    start_import_worker(settings, config.registry['dbsession_factory'])
     return config.make_wsgi_app()
@@ -1,33 +1,90 @@
+import hashlib
 import json
+from collections import OrderedDict
 
+from sqlalchemy import and_, bindparam, func, or_
+from sqlalchemy.orm import joinedload, subqueryload
 from sqlalchemy.orm.exc import NoResultFound
-from artificer.models import User, Artifact, Label, SupportedOS, Source
+import zope.sqlalchemy
 
+from artificer.models import (User, Artifact, ArtifactChange, ArtifactSearch, GroupMember, Label, SupportedOS,
+                              Source, SourceAttribute, SourcePath)
+from artificer.models.artifact import artifact_labels, artifact_os, artifact_sources
+
+from artificer.lib.attributes import source_attribute_condition, source_attribute_rows
+from artificer.lib.catalog import mark_catalog_changed
+from artificer.lib.changes import record_artifact_changes
 from artificer.lib.errors import ArtifactAlreadyExists, MissingAuthor
+from artificer.lib.groups import group_member_rows
+from artificer.lib.paths import source_path_rows
+from artificer.lib.search import set_artifact_search, search_document
+from artificer.lib.vocabulary import get_vocabulary, vocabulary_cache
 
 import artifacts.definitions as fa_definitions
+import artifacts.reader as fa_readers
 import artifacts.source_type as fa_sources
+import artifacts.writer as fa_writers
+
+
+def format_artifact_json(forensic_artifact):
+    """Returns the canonical JSON definition of an artifact.
+
+    Keys are sorted and separators fixed so the stored bytes are identical
+    for identical definitions and can be served without re-encoding.
+    """
+    return json.dumps(forensic_artifact.AsDict(), sort_keys=True, separators=(',', ':'))
+
+
+def hash_artifact_definition(artifact_definition):
+    """Returns the content hash of a canonical JSON definition."""
+    return hashlib.sha256(artifact_definition.encode('utf-8')).hexdigest()
+
+
+def format_artifact_yaml(forensic_artifact):
+    artifact_writer = fa_writers.YamlArtifactsWriter()
+    return artifact_writer.FormatArtifacts([forensic_artifact])
+
+
+def read_forensic_artifact(artifact):
+    artifact_reader = fa_readers.ArtifactsReader()
+    return artifact_reader.ReadArtifactDefinitionValues(json.loads(artifact.data))
+
+
+def render_artifact_yaml(artifact):
+    """Returns the YAML document of an artifact, rendering it from data if it was never stored."""
+    if artifact.yaml_data is not None:
+        return artifact.yaml_data
+
+    return format_artifact_yaml(read_forensic_artifact(artifact))
 
 def get_artifact(db_session, forensic_artifact, author, replace=False):
-    artifact_definition = json.dumps(forensic_artifact.AsDict())
+    artifact_definition = format_artifact_json(forensic_artifact)
 
     try:
         author = db_session.query(User).filter_by(name=author).one()
     except NoResultFound:
         raise MissingAuthor
 
+    data_hash = hash_artifact_definition(artifact_definition)
+
     try:
         artifact = db_session.query(Artifact).filter_by(name=forensic_artifact.name).one()
         if not replace:
             raise ArtifactAlreadyExists
+        elif artifact.data_hash == data_hash and artifact.author == author:
+            # Unchanged, leave the stored artifact alone
+            return artifact
         else:
             artifact.author = author
             # TODO Fix data
             artifact.data = artifact_definition
+            artifact.data_hash = data_hash
+            artifact.yaml_data = format_artifact_yaml(forensic_artifact)
 
     except NoResultFound:
         # TODO Fix data
-        artifact = Artifact(name=forensic_artifact.name, author=author, data=artifact_definition)
+        artifact = Artifact(name=forensic_artifact.name, author=author, data=artifact_definition,
+                            data_hash=data_hash, yaml_data=format_artifact_yaml(forensic_artifact))
 
     set_artifact_labels(db_session, artifact, forensic_artifact.labels)
 
@@ -35,11 +92,300 @@ def get_artifact(db_session, forensic_artifact, author, replace=False):
 
     set_artifact_supported_os(db_session, artifact, forensic_artifact.supported_os)
 
+    set_artifact_indexes(artifact, forensic_artifact)
+
     return artifact
 
 
+def import_artifacts(db_session, forensic_artifacts, author, replace=False):
+    """
+    Import many artifacts at once with set-based statements.
+
+    Existing names, the author and the label, source and supported_os
+    vocabularies are resolved with a handful of IN queries, and artifacts and
+    their association rows are written with bulk statements, so the number of
+    statements does not grow with the number of artifacts.
+
+    Definitions are handled in order like repeated calls to get_artifact:
+    existing artifacts (and repeated names) are replaced when ``replace`` is
+    set and reported as failed otherwise. Replacements whose content hash
+    and author match the stored artifact are skipped entirely.
+
+    Returns a dict of the imported artifact ``ids``, the ``failed`` names of
+    artifacts that already existed and the number of artifacts ``added``,
+    ``changed`` and left ``unchanged``.
+    """
+    # Make pending ORM changes visible to the bulk statements below
+    db_session.flush()
+
+    try:
+        author_id, = db_session.query(User.id).filter_by(name=author).one()
+    except NoResultFound:
+        raise MissingAuthor
+
+    definitions = OrderedDict()
+    result = {'ids': [], 'failed': [], 'added': 0, 'changed': 0, 'unchanged': 0}
+    for forensic_artifact in forensic_artifacts:
+        if forensic_artifact.name in definitions and not replace:
+            result['failed'].append(forensic_artifact.name)
+        else:
+            definitions[forensic_artifact.name] = forensic_artifact
+
+    if not definitions:
+        return result
+
+    existing = {}
+    for chunk in _chunks(definitions):
+        for artifact_id, name, data_hash, user_id in db_session.query(
+                Artifact.id, Artifact.name, Artifact.data_hash, Artifact.user_id).filter(Artifact.name.in_(chunk)):
+            existing[name] = (artifact_id, data_hash, user_id)
+
+    if not replace:
+        for name in [name for name in definitions if name in existing]:
+            result['failed'].append(name)
+            del definitions[name]
+
+    rows = OrderedDict()
+    artifact_ids = {}
+    for name, forensic_artifact in definitions.items():
+        artifact_definition = format_artifact_json(forensic_artifact)
+        data_hash = hash_artifact_definition(artifact_definition)
+        if name in existing:
+            artifact_ids[name] = existing[name][0]
+            if existing[name][1:] == (data_hash, author_id):
+                result['unchanged'] += 1
+                continue
+            result['changed'] += 1
+        else:
+            result['added'] += 1
+
+        rows[name] = {
+            'name': name,
+            'user_id': author_id,
+            'data': artifact_definition,
+            'data_hash': data_hash,
+            'yaml_data': format_artifact_yaml(forensic_artifact),
+        }
+
+    if rows:
+        _write_artifact_rows(db_session, rows, definitions, artifact_ids)
+
+    result['ids'] = [artifact_ids[name] for name in definitions]
+    return result
+
+
+def delete_artifacts(db_session, artifact_ids, partial=False):
+    """
+    Delete many artifacts at once with set-based statements.
+
+    Returns the status of each id in order: ``deleted`` or ``not_found``.
+    Unless ``partial`` is set nothing is deleted when any id is not found,
+    and the ids that would have been deleted are reported as ``skipped``.
+    """
+    db_session.flush()
+
+    existing = {}
+    for chunk in _chunks(set(artifact_ids)):
+        existing.update(db_session.query(Artifact.id, Artifact.name).filter(Artifact.id.in_(chunk)))
+
+    statuses = []
+    for artifact_id in artifact_ids:
+        statuses.append({'id': artifact_id, 'status': 'deleted' if artifact_id in existing else 'not_found'})
+    if not existing or (len(existing) < len(set(artifact_ids)) and not partial):
+        return _skip_pending(statuses, 'deleted')
+
+    artifacts = Artifact.__table__
+    for chunk in _chunks(existing):
+        for association in (artifact_labels, artifact_os, artifact_sources) + INDEX_TABLES:
+            db_session.execute(association.delete().where(association.c.artifact_id.in_(chunk)))
+        db_session.execute(artifacts.delete().where(artifacts.c.id.in_(chunk)))
+
+    record_artifact_changes(db_session, sorted(
+        (artifact_id, name, ArtifactChange.DELETED) for artifact_id, name in existing.items()))
+    zope.sqlalchemy.mark_changed(db_session)
+    db_session.expire_all()
+    return statuses
+
+
+def update_artifacts(db_session, updates, author, partial=False):
+    """
+    Update many artifacts at once with set-based statements.
+
+    ``updates`` is a sequence of ``(artifact_id, forensic_artifact)`` pairs,
+    where a forensic_artifact of None stands for a definition that could not
+    be read. Returns the status of each pair in order: ``updated``,
+    ``unchanged`` when the definition and author already match,
+    ``invalid``, ``not_found``,
+    ``duplicate`` when the id was already given, or ``exists`` when the new
+    name belongs to another artifact. Unless ``partial`` is set nothing is
+    written when any update fails, and the updates that would have been
+    applied are reported as ``skipped``.
+    """
+    db_session.flush()
+
+    try:
+        author_id, = db_session.query(User.id).filter_by(name=author).one()
+    except NoResultFound:
+        raise MissingAuthor
+
+    requested_ids = set(artifact_id for artifact_id, _ in updates)
+    requested_names = set(forensic_artifact.name for _, forensic_artifact in updates if forensic_artifact)
+    existing = {}
+    for chunk in _chunks(requested_ids):
+        for artifact_id, name, data_hash, user_id in db_session.query(
+                Artifact.id, Artifact.name, Artifact.data_hash, Artifact.user_id).filter(Artifact.id.in_(chunk)):
+            existing[artifact_id] = (name, data_hash, user_id)
+    name_ids = _query_ids(db_session, Artifact.name, requested_names)
+
+    statuses = []
+    rows = OrderedDict()
+    definitions = {}
+    artifact_ids = {}
+    seen_ids = set()
+    for artifact_id, forensic_artifact in updates:
+        status = {'id': artifact_id, 'status': 'updated'}
+        statuses.append(status)
+        if forensic_artifact is None:
+            status['status'] = 'invalid'
+            continue
+
+        name = forensic_artifact.name
+        if artifact_id not in existing:
+            status['status'] = 'not_found'
+        elif artifact_id in seen_ids:
+            status['status'] = 'duplicate'
+        elif name_ids.get(name, artifact_id) != artifact_id or name in rows:
+            status['status'] = 'exists'
+        seen_ids.add(artifact_id)
+        if status['status'] != 'updated':
+            continue
+
+        artifact_definition = format_artifact_json(forensic_artifact)
+        data_hash = hash_artifact_definition(artifact_definition)
+        if existing[artifact_id] == (name, data_hash, author_id):
+            status['status'] = 'unchanged'
+            continue
+
+        rows[name] = {
+            'name': name,
+            'user_id': author_id,
+            'data': artifact_definition,
+            'data_hash': data_hash,
+            'yaml_data': format_artifact_yaml(forensic_artifact),
+        }
+        definitions[name] = forensic_artifact
+        artifact_ids[name] = artifact_id
+
+    failed = any(status['status'] not in ('updated', 'unchanged') for status in statuses)
+    if failed and not partial:
+        return _skip_pending(statuses, 'updated')
+
+    if rows:
+        _write_artifact_rows(db_session, rows, definitions, artifact_ids)
+    return statuses
+
+
+def _skip_pending(statuses, pending):
+    for status in statuses:
+        if status['status'] == pending:
+            status['status'] = 'skipped'
+    return statuses
+
+
+def _write_artifact_rows(db_session, rows, definitions, artifact_ids):
+    """Writes artifact rows and replaces their association rows with bulk statements."""
+    artifacts = Artifact.__table__
+    replaced_names = set(name for name in rows if name in artifact_ids)
+    replaced_ids = [artifact_ids[name] for name in rows if name in artifact_ids]
+    if replaced_ids:
+        updates = [dict(rows[name], artifact_id=artifact_ids[name]) for name in rows if name in artifact_ids]
+        db_session.execute(artifacts.update().
+                           where(artifacts.c.id == bindparam('artifact_id')).
+                           values(name=bindparam('name'), user_id=bindparam('user_id'),
+                                  data=bindparam('data'), data_hash=bindparam('data_hash'),
+                                  yaml_data=bindparam('yaml_data')),
+                           updates)
+        for association in (artifact_labels, artifact_os, artifact_sources) + INDEX_TABLES:
+            for chunk in _chunks(replaced_ids):
+                db_session.execute(association.delete().where(association.c.artifact_id.in_(chunk)))
+
+    created = [row for name, row in rows.items() if name not in artifact_ids]
+    if created:
+        db_session.execute(artifacts.insert(), created)
+        artifact_ids.update(_query_ids(db_session, Artifact.name, [row['name'] for row in created]))
+
+    written = [definitions[name] for name in rows]
+    label_ids = _resolve_vocabulary(db_session, Label.name, set(
+        label for forensic_artifact in written for label in forensic_artifact.labels),
+        desc="")
+    source_ids = _resolve_vocabulary(db_session, Source.type, set(
+        source.TYPE_INDICATOR for forensic_artifact in written for source in forensic_artifact.sources))
+    os_ids = _resolve_vocabulary(db_session, SupportedOS.name, set(
+        os_name for forensic_artifact in written for os_name in forensic_artifact.supported_os))
+
+    label_rows = []
+    source_rows = []
+    os_rows = []
+    index_rows = dict((table, []) for table in INDEX_TABLES)
+    for forensic_artifact in written:
+        artifact_id = artifact_ids[forensic_artifact.name]
+        for table, artifact_index_rows in _index_rows(forensic_artifact.AsDict()):
+            index_rows[table].extend(dict(row, artifact_id=artifact_id) for row in artifact_index_rows)
+        for label_id in set(label_ids[label] for label in forensic_artifact.labels):
+            label_rows.append({'artifact_id': artifact_id, 'label_id': label_id})
+        for source_id in set(source_ids[source.TYPE_INDICATOR] for source in forensic_artifact.sources):
+            source_rows.append({'artifact_id': artifact_id, 'source_id': source_id})
+        for os_id in set(os_ids[os_name] for os_name in forensic_artifact.supported_os):
+            os_rows.append({'artifact_id': artifact_id, 'os_id': os_id})
+
+    for table, table_rows in [(artifact_labels, label_rows),
+                              (artifact_sources, source_rows),
+                              (artifact_os, os_rows)] + list(index_rows.items()):
+        if table_rows:
+            db_session.execute(table.insert(), table_rows)
+
+    record_artifact_changes(db_session, sorted(
+        (artifact_ids[name], name, ArtifactChange.UPDATED if name in replaced_names else ArtifactChange.CREATED)
+        for name in rows))
+
+    # Bulk statements bypass the unit of work; tell the transaction manager
+    # there is something to commit and drop any stale loaded state.
+    zope.sqlalchemy.mark_changed(db_session)
+    mark_catalog_changed(db_session)
+    db_session.expire_all()
+
+
+def _chunks(values, size=500):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _query_ids(db_session, column, values):
+    """Returns a mapping of column value to row id for the given values."""
+    model = column.class_
+    ids = {}
+    for chunk in _chunks(values):
+        ids.update(db_session.query(column, model.id).filter(column.in_(chunk)))
+    return ids
+
+
+def _resolve_vocabulary(db_session, column, names, **defaults):
+    """Returns a mapping of vocabulary name to id, inserting the missing names."""
+    ids = vocabulary_cache.lookup(db_session, column, names)
+    ids.update(_query_ids(db_session, column, [name for name in names if name not in ids]))
+    missing = [name for name in names if name not in ids]
+    if missing:
+        model = column.class_
+        db_session.execute(model.__table__.insert(),
+                           [dict(defaults, **{column.key: name}) for name in missing])
+        vocabulary_cache.added(db_session)
+        ids.update(_query_ids(db_session, column, missing))
+    return ids
+
+
 def update_artifact(db_session, artifact, forensic_artifact, author='admin'):
-    artifact_definition = json.dumps(forensic_artifact.AsDict())
+    artifact_definition = format_artifact_json(forensic_artifact)
 
     try:
         author = db_session.query(User).filter_by(name=author).one()
@@ -53,6 +399,8 @@ def update_artifact(db_session, artifact, forensic_artifact, author='admin'):
     artifact.author = author
     artifact.name = forensic_artifact.name
     artifact.data = artifact_definition
+    artifact.data_hash = hash_artifact_definition(artifact_definition)
+    artifact.yaml_data = format_artifact_yaml(forensic_artifact)
 
     set_artifact_labels(db_session, artifact, forensic_artifact.labels)
 
@@ -60,13 +408,139 @@ def update_artifact(db_session, artifact, forensic_artifact, author='admin'):
 
     set_artifact_supported_os(db_session, artifact, forensic_artifact.supported_os)
 
+    set_artifact_indexes(artifact, forensic_artifact)
+
     return artifact
 
 
+def query_artifact_index(db_session, labels=None, supported_os=None, authors=None, sources=None,
+                         source_attributes=None, modes=None, after=None, limit=None):
+    """Returns a query over the artifact index with all filters applied.
+
+    The author is joined in and the labels, supported_os and sources
+    collections are each fetched with a single additional query, so listing
+    the catalog costs a constant number of statements. The definition data
+    is never loaded.
+
+    ``source_attributes`` is a list of name:pattern filters, each answered
+    by an indexed lookup on the source_attributes table.
+
+    ``modes`` maps a filter name to ``any`` (the default), ``all`` or
+    ``not``. Results are ordered by id; ``after`` and ``limit`` select a
+    keyset page.
+    """
+    modes = modes or {}
+    artifacts = db_session.query(Artifact).options(
+        joinedload(Artifact.author),
+        subqueryload(Artifact.supported_os),
+        subqueryload(Artifact.labels),
+        subqueryload(Artifact.sources))
+
+    facet_filters = (
+        ('labels', labels, Artifact.labels.any, Label.name),
+        ('supported_os', supported_os, Artifact.supported_os.any, SupportedOS.name),
+        ('authors', authors, Artifact.author.has, User.name),
+        ('sources', sources, Artifact.sources.any, Source.type),
+    )
+    for filter_key, values, exists, column in facet_filters:
+        if values:
+            artifacts = artifacts.filter(_facet_condition(exists, column, values, modes.get(filter_key, 'any')))
+
+    if source_attributes:
+        conditions = [Artifact.id.in_(source_attribute_condition(value)) for value in set(source_attributes)]
+        mode = modes.get('source_attributes', 'any')
+        if mode == 'all':
+            artifacts = artifacts.filter(and_(*conditions))
+        elif mode == 'not':
+            artifacts = artifacts.filter(~or_(*conditions))
+        else:
+            artifacts = artifacts.filter(or_(*conditions))
+
+    if after is not None:
+        artifacts = artifacts.filter(Artifact.id > after)
+
+    artifacts = artifacts.order_by(Artifact.id)
+
+    if limit is not None:
+        artifacts = artifacts.limit(limit)
+
+    return artifacts
+
+
+def _facet_condition(exists, column, values, mode):
+    if mode == 'all':
+        return and_(*[exists(column == value) for value in set(values)])
+    if mode == 'not':
+        return ~exists(column.in_(values))
+    return exists(column.in_(values))
+
+
+def artifact_index_entry(artifact):
+    return {
+        'name': artifact.name,
+        'id': artifact.id,
+        'author': artifact.author.name,
+        'supported_os': [supported_os.name for supported_os in artifact.supported_os],
+        'labels': [label.name for label in artifact.labels],
+        'sources': [source.type for source in artifact.sources]
+    }
+
+
+def query_facet_index(db_session, facet_column, facet_artifacts):
+    """Returns an ordered mapping of facet value to the artifacts carrying it.
+
+    The whole mapping is built from a single outer join, so facet values
+    without any artifacts are still listed.
+    """
+    facets = OrderedDict()
+    facet_model = facet_column.class_
+    rows = db_session.query(facet_column, Artifact.id, Artifact.name).\
+        outerjoin(facet_artifacts).\
+        order_by(facet_model.id, Artifact.id)
+
+    for facet_value, artifact_id, artifact_name in rows:
+        artifacts = facets.setdefault(facet_value, [])
+        if artifact_id is not None:
+            artifacts.append({'id': artifact_id, 'name': artifact_name})
+
+    return facets
+
+
+def query_facet_counts(db_session, facet_column, facet_artifacts):
+    """Returns an ordered mapping of facet value to its number of artifacts."""
+    facet_model = facet_column.class_
+    rows = db_session.query(facet_column, func.count(Artifact.id)).\
+        outerjoin(facet_artifacts).\
+        group_by(facet_model.id, facet_column).\
+        order_by(facet_model.id)
+
+    return OrderedDict(rows)
+
+
+# Tables derived from each artifact definition to index it
+INDEX_TABLES = (ArtifactSearch.__table__, SourcePath.__table__, GroupMember.__table__, SourceAttribute.__table__)
+
+
+def _index_rows(artifact_definition):
+    """Returns the rows of each index table derived from an artifact definition dict."""
+    return ((ArtifactSearch.__table__, [search_document(artifact_definition)]),
+            (SourcePath.__table__, source_path_rows(artifact_definition)),
+            (GroupMember.__table__, group_member_rows(artifact_definition)),
+            (SourceAttribute.__table__, source_attribute_rows(artifact_definition)))
+
+
+def set_artifact_indexes(artifact, forensic_artifact):
+    """Rebuilds the index rows derived from an artifact definition."""
+    artifact_definition = forensic_artifact.AsDict()
+    set_artifact_search(artifact, artifact_definition)
+    artifact.source_paths = [SourcePath(**row) for row in source_path_rows(artifact_definition)]
+    artifact.group_members = [GroupMember(**row) for row in group_member_rows(artifact_definition)]
+    artifact.source_attributes = [SourceAttribute(**row) for row in source_attribute_rows(artifact_definition)]
+
+
 def set_artifact_labels(db_session, artifact, labels):
     artifact.labels = []
-    for label_name in labels:
-        label = get_label(db_session, label_name, "")
+    for label in get_vocabulary(db_session, Label.name, labels, desc=""):
         if label not in artifact.labels:
             artifact.labels.append(label)
 
@@ -74,9 +548,8 @@ def set_artifact_labels(db_session, artifact, labels):
 def set_artifact_sources(db_session, artifact, sources):
     artifact.sources = []
 
-    for source_data in sources:
-        source_type = source_data.TYPE_INDICATOR
-        source = get_source(db_session, source_type)
+    source_types = [source_data.TYPE_INDICATOR for source_data in sources]
+    for source in get_vocabulary(db_session, Source.type, source_types):
         if source not in artifact.sources:
             artifact.sources.append(source)
 
@@ -85,9 +558,9 @@ def set_artifact_supported_os(db_session, artifact, supported_os):
     artifact.supported_os = []
 
     # Add unique supported os to artifact
-    for os_name in supported_os:
-        supported_os = get_supported_os(db_session, os_name)
-        artifact.supported_os.append(supported_os)
+    for os_row in get_vocabulary(db_session, SupportedOS.name, supported_os):
+        if os_row not in artifact.supported_os:
+            artifact.supported_os.append(os_row)
 
 
 def init_sources(db_session):
@@ -106,30 +579,15 @@ def init_labels(db_session):
 
 
 def get_label(db_session, label_name, label_desc):
-    try:
-        label = db_session.query(Label).filter_by(name=label_name).one()
-    except NoResultFound:
-        label = Label(name=label_name, desc=label_desc)
-        db_session.add(label)
-
+    label, = get_vocabulary(db_session, Label.name, [label_name], desc=label_desc)
     return label
 
 
 def get_source(db_session, source_type):
-    try:
-        source = db_session.query(Source).filter_by(type=source_type).one()
-    except NoResultFound:
-        source = Source(type=source_type)
-        db_session.add(source)
-
+    source, = get_vocabulary(db_session, Source.type, [source_type])
     return source
 
 
 def get_supported_os(db_session, os_name):
-    try:
-        supported_os = db_session.query(SupportedOS).filter_by(name=os_name).one()
-    except NoResultFound:
-        supported_os = SupportedOS(name=os_name)
-        db_session.add(supported_os)
-
+    supported_os, = get_vocabulary(db_session, SupportedOS.name, [os_name])
     return supported_os
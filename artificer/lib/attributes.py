@@ -0,0 +1,76 @@
+from sqlalchemy import and_, select
+
+from artificer.models import SourceAttribute
+
+# Characters escaped in LIKE patterns built from attribute filters
+LIKE_ESCAPE = '^'
+
+
+def _attribute_rows(source_type, name, value):
+    if isinstance(value, dict):
+        for field, field_value in sorted(value.items()):
+            for row in _attribute_rows(source_type, '%s.%s' % (name, field), field_value):
+                yield row
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            for row in _attribute_rows(source_type, name, item):
+                yield row
+    elif value is not None:
+        yield (source_type, name, (u'%s' % value).lower())
+
+
+def source_attribute_rows(artifact_definition):
+    """Returns the source_attributes rows of an artifact definition dict."""
+    rows = []
+    seen = set()
+    for source in artifact_definition.get('sources', []):
+        values = dict(source.get('attributes') or {})
+        if source.get('conditions'):
+            values['conditions'] = source['conditions']
+        for name, value in sorted(values.items()):
+            for row in _attribute_rows(source['type'], name, value):
+                if row not in seen:
+                    seen.add(row)
+                    rows.append({'source_type': row[0], 'name': row[1], 'value': row[2]})
+    return rows
+
+
+def parse_source_attribute_filter(value):
+    """Splits a name:pattern attribute filter, raising ValueError without a name or pattern."""
+    name, separator, pattern = value.partition(':')
+    if not separator or not name or not pattern:
+        raise ValueError(value)
+    return name, pattern.lower()
+
+
+def source_attribute_condition(value):
+    """
+    Returns a select of the ids of artifacts with a source attribute matching a name:pattern filter.
+
+    Patterns may use the * and ? wildcards. The literal prefix ahead of the
+    first wildcard is matched as a range of the (name, value) index and
+    the rest of the pattern with LIKE.
+    """
+    name, pattern = parse_source_attribute_filter(value)
+    wildcard = min(index for index in (pattern.find('*'), pattern.find('?'), len(pattern)) if index != -1)
+    prefix = pattern[:wildcard]
+
+    if wildcard == len(pattern):
+        condition = SourceAttribute.value == pattern
+    else:
+        like = []
+        for character in pattern:
+            if character == '*':
+                like.append('%')
+            elif character == '?':
+                like.append('_')
+            elif character in ('%', '_', LIKE_ESCAPE):
+                like.append(LIKE_ESCAPE + character)
+            else:
+                like.append(character)
+        condition = SourceAttribute.value.like(''.join(like), escape=LIKE_ESCAPE)
+        if prefix:
+            upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+            condition = and_(SourceAttribute.value >= prefix, SourceAttribute.value < upper, condition)
+
+    return select([SourceAttribute.artifact_id]).where(and_(SourceAttribute.name == name, condition))
@@ -0,0 +1,61 @@
+import threading
+from collections import OrderedDict
+
+default_result_cache_size = 256
+
+
+class ResultCache(object):
+    """
+    Bounded, thread safe LRU cache of rendered view results.
+
+    Keys must include the catalog generation the result was read at, so an
+    entry can never be served once a later transaction changed the catalog;
+    entries of older generations simply age out.
+    """
+
+    def __init__(self, max_size=default_result_cache_size):
+        self._lock = threading.Lock()
+        self._results = OrderedDict()
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._results)
+
+    def get(self, key):
+        with self._lock:
+            try:
+                result = self._results.pop(key)
+            except KeyError:
+                self.misses += 1
+                return None
+            self._results[key] = result
+            self.hits += 1
+            return result
+
+    def put(self, key, result):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._results.pop(key, None)
+            self._results[key] = result
+            while len(self._results) > self.max_size:
+                self._results.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        return {'size': len(self._results), 'max_size': self.max_size, 'hits': self.hits, 'misses': self.misses}
+
+
+result_cache = ResultCache()
+
+
+def configure_result_cache(settings):
+    result_cache.max_size = int(settings.get('artificer.result_cache_size', default_result_cache_size))
+    result_cache.clear()
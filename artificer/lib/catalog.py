@@ -0,0 +1,67 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+import zope.sqlalchemy
+
+from artificer.models import User, Artifact, CatalogGeneration, Label, SupportedOS, Source
+
+CATALOG_MODELS = (User, Artifact, Label, SupportedOS, Source)
+
+# Session.info key set while a session holds uncommitted catalog changes
+CATALOG_CHANGED = 'artificer.catalog_changed'
+
+# Callables run once a transaction that changed the catalog commits
+catalog_listeners = []
+
+
+def get_catalog_generation(db_session):
+    generation = db_session.query(CatalogGeneration.generation).\
+        filter(CatalogGeneration.id == 1).\
+        scalar()
+    return generation or 0
+
+
+def catalog_changed(db_session):
+    """Returns True if db_session holds catalog changes that are not committed yet."""
+    return bool(db_session.info.get(CATALOG_CHANGED))
+
+
+def mark_catalog_changed(db_session):
+    """Bumps the catalog generation in the current transaction of db_session.
+
+    The generation is bumped once per transaction. ORM changes are recorded
+    on flush; writes made with Core statements must call this themselves.
+    """
+    if catalog_changed(db_session):
+        return
+
+    db_session.info[CATALOG_CHANGED] = True
+    generations = CatalogGeneration.__table__
+    connection = db_session.connection()
+    bumped = connection.execute(generations.update().
+                                where(generations.c.id == 1).
+                                values(generation=generations.c.generation + 1))
+    if not bumped.rowcount:
+        connection.execute(generations.insert().values(id=1, generation=1))
+    zope.sqlalchemy.mark_changed(db_session)
+
+
+@event.listens_for(Session, 'after_flush')
+def _mark_after_flush(db_session, flush_context):
+    for instance in db_session.new | db_session.dirty | db_session.deleted:
+        if isinstance(instance, CATALOG_MODELS):
+            mark_catalog_changed(db_session)
+            return
+
+
+@event.listens_for(Session, 'after_commit')
+def _notify_after_commit(db_session):
+    if db_session.info.pop(CATALOG_CHANGED, False):
+        for listener in catalog_listeners:
+            listener()
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def _forget_after_transaction(db_session, session_transaction):
+    # Still set only when the transaction was rolled back or discarded
+    if session_transaction.parent is None:
+        db_session.info.pop(CATALOG_CHANGED, None)
@@ -0,0 +1,108 @@
+import json
+
+from sqlalchemy import and_, event, exists, func
+from sqlalchemy.orm import Session, aliased
+import zope.sqlalchemy
+
+from artificer.models import Artifact, ArtifactChange
+
+from artificer.lib.catalog import mark_catalog_changed
+
+
+# Session.info key mapping the artifacts logged in the current transaction to their action
+CHANGES_LOGGED = 'artificer.changes_logged'
+
+
+def record_artifact_changes(db_session, changes):
+    """Appends (artifact_id, name, action) entries to the change log.
+
+    An artifact is logged as updated at most once per transaction, and not
+    at all when the same transaction created it.
+
+    The catalog generation is bumped first, which holds its row lock until
+    the transaction ends, so change log entries are committed in seq order.
+    """
+    logged = db_session.info.setdefault(CHANGES_LOGGED, {})
+    rows = []
+    for artifact_id, name, action in changes:
+        if action == ArtifactChange.UPDATED and artifact_id in logged:
+            continue
+        logged[artifact_id] = action
+        rows.append({'artifact_id': artifact_id, 'name': name, 'action': action})
+    if not rows:
+        return
+
+    mark_catalog_changed(db_session)
+    db_session.connection().execute(ArtifactChange.__table__.insert(), rows)
+    zope.sqlalchemy.mark_changed(db_session)
+
+
+@event.listens_for(Session, 'after_flush')
+def _record_after_flush(db_session, flush_context):
+    changes = []
+    for instance in db_session.new:
+        if isinstance(instance, Artifact):
+            changes.append((instance.id, instance.name, ArtifactChange.CREATED))
+    for instance in db_session.dirty:
+        if isinstance(instance, Artifact) and db_session.is_modified(instance):
+            changes.append((instance.id, instance.name, ArtifactChange.UPDATED))
+    for instance in db_session.deleted:
+        if isinstance(instance, Artifact):
+            changes.append((instance.id, instance.name, ArtifactChange.DELETED))
+    if changes:
+        record_artifact_changes(db_session, sorted(changes))
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def _forget_logged_changes(db_session, session_transaction):
+    if session_transaction.parent is None:
+        db_session.info.pop(CHANGES_LOGGED, None)
+
+
+def query_artifact_changes(db_session, since=0, limit=None):
+    """Returns the latest change of each artifact changed after seq ``since``, in seq order.
+
+    Earlier changes of an artifact that changed again are skipped, so a
+    client catching up reads at most one entry per changed artifact. The
+    current definition is joined in for artifacts that still exist.
+    """
+    later = aliased(ArtifactChange)
+    changes = db_session.query(ArtifactChange, Artifact.data).\
+        outerjoin(Artifact, and_(Artifact.id == ArtifactChange.artifact_id,
+                                 ArtifactChange.action != ArtifactChange.DELETED)).\
+        filter(ArtifactChange.seq > since).\
+        filter(~exists().where(and_(later.artifact_id == ArtifactChange.artifact_id,
+                                    later.seq > ArtifactChange.seq))).\
+        order_by(ArtifactChange.seq)
+
+    if limit is not None:
+        changes = changes.limit(limit)
+
+    return [{
+        'seq': change.seq,
+        'id': change.artifact_id,
+        'name': change.name,
+        'action': change.action,
+        'artifact': json.loads(artifact_definition) if artifact_definition is not None else None,
+    } for change, artifact_definition in changes]
+
+
+def query_change_log(db_session, since=0, limit=None):
+    """Returns the change log entries after seq ``since``, in seq order, without definitions."""
+    changes = db_session.query(ArtifactChange).\
+        filter(ArtifactChange.seq > since).\
+        order_by(ArtifactChange.seq)
+
+    if limit is not None:
+        changes = changes.limit(limit)
+
+    return [{
+        'seq': change.seq,
+        'id': change.artifact_id,
+        'name': change.name,
+        'action': change.action,
+    } for change in changes]
+
+
+def latest_change_seq(db_session):
+    return db_session.query(func.max(ArtifactChange.seq)).scalar() or 0
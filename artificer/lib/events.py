@@ -0,0 +1,272 @@
+import asyncio
+import json
+import logging
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+from sqlalchemy.exc import DBAPIError
+
+from artificer.lib.catalog import catalog_listeners
+from artificer.lib.changes import latest_change_seq, query_change_log
+
+log = logging.getLogger(__name__)
+
+default_events_host = '127.0.0.1'
+default_poll_interval = 5.0
+default_keepalive_interval = 15.0
+
+STREAM_HEADERS = (b'HTTP/1.1 200 OK\r\n'
+                  b'Content-Type: text/event-stream; charset=UTF-8\r\n'
+                  b'Cache-Control: no-cache\r\n'
+                  b'Access-Control-Allow-Origin: *\r\n'
+                  b'Connection: close\r\n'
+                  b'\r\n')
+
+BAD_REQUEST = (b'HTTP/1.1 400 Bad Request\r\n'
+               b'Content-Type: text/plain\r\n'
+               b'Connection: close\r\n'
+               b'\r\n'
+               b'Expected GET with an optional non-negative since parameter\n')
+
+
+def format_event(change):
+    """Returns a change log entry as a server-sent event, using its seq as the event id."""
+    return ('id: %d\nevent: %s\ndata: %s\n\n' % (change['seq'], change['action'],
+                                                  json.dumps(change, sort_keys=True))).encode('utf-8')
+
+
+def _parse_since(request_head):
+    """Returns the seq a subscriber asked to resume after, or None to start from now.
+
+    The since query parameter takes precedence over a Last-Event-ID header.
+    """
+    lines = request_head.decode('latin-1').split('\r\n')
+    method, target, _ = lines[0].split(' ', 2)
+    if method != 'GET':
+        raise ValueError(method)
+
+    since = parse_qs(urlsplit(target).query).get('since', [None])[0]
+    if since is None:
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            if name.strip().lower() == 'last-event-id' and value.strip():
+                since = value.strip()
+    if since is None:
+        return None
+    since = int(since)
+    if since < 0:
+        raise ValueError(since)
+    return since
+
+
+class _Subscriber(object):
+
+    def __init__(self, writer, last_seq, max_buffer):
+        self.writer = writer
+        self.last_seq = last_seq
+        self.max_buffer = max_buffer
+        # Live events are only sent once the subscriber has caught up
+        self.ready = False
+
+    def send(self, change):
+        if change['seq'] <= self.last_seq or self.writer.is_closing():
+            return
+        self.writer.write(format_event(change))
+        self.last_seq = change['seq']
+        if self.writer.transport.get_write_buffer_size() > self.max_buffer:
+            # Drop clients that stopped reading rather than buffer for them
+            self.writer.close()
+
+
+class EventBroadcaster(object):
+    """
+    Pushes change log entries to server-sent event subscribers.
+
+    The broadcaster serves its own port from an asyncio loop in a single
+    background thread, so idle subscribers cost a socket each rather than
+    a WSGI worker thread. It reads new change log entries when a local
+    transaction that changed the catalog commits, and every poll_interval
+    seconds to pick up commits from other processes.
+
+    Events carry the change log seq as their id, so a reconnecting
+    EventSource resumes from Last-Event-ID without missing changes.
+    """
+
+    def __init__(self, session_factory, host=default_events_host, port=0,
+                 poll_interval=default_poll_interval, keepalive_interval=default_keepalive_interval,
+                 batch_size=500, max_buffer=1024 * 1024):
+        self.session_factory = session_factory
+        self.host = host
+        self.port = port
+        self.poll_interval = poll_interval
+        self.keepalive_interval = keepalive_interval
+        self.batch_size = batch_size
+        self.max_buffer = max_buffer
+        self.last_seq = 0
+        self._subscribers = set()
+        self._loop = None
+        self._thread = None
+        self._started = threading.Event()
+        self._stopping = None
+        self._wake = None
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='event-broadcaster')
+        self._thread.daemon = True
+        self._thread.start()
+        self._started.wait()
+        catalog_listeners.append(self.notify)
+
+    @property
+    def running(self):
+        return self._loop is not None
+
+    def stop(self):
+        if self.notify in catalog_listeners:
+            catalog_listeners.remove(self.notify)
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._stopping.set)
+        if self._thread is not None:
+            self._thread.join()
+
+    def notify(self):
+        """Wakes the broadcaster to publish new changes; safe to call from any thread."""
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._wake.set)
+
+    def _run(self):
+        loop = self._loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self._serve())
+        finally:
+            self._loop = None
+            loop.close()
+
+    async def _serve(self):
+        self._stopping = asyncio.Event()
+        self._wake = asyncio.Event()
+        try:
+            server = await asyncio.start_server(self._handle, self.host, self.port)
+        except OSError:
+            log.exception('Failed to serve events on %s:%s', self.host, self.port)
+            self._started.set()
+            return
+
+        self.port = server.sockets[0].getsockname()[1]
+        try:
+            self.last_seq = await self._read(latest_change_seq)
+        except DBAPIError:
+            log.exception('Failed to read the change log, publishing from the start')
+        self._started.set()
+
+        publisher = asyncio.ensure_future(self._publish_loop())
+        await self._stopping.wait()
+        publisher.cancel()
+        try:
+            await publisher
+        except asyncio.CancelledError:
+            pass
+        server.close()
+        for subscriber in list(self._subscribers):
+            subscriber.writer.close()
+        await server.wait_closed()
+
+    def _read(self, query, *args):
+        def read():
+            db_session = self.session_factory()
+            try:
+                return query(db_session, *args)
+            finally:
+                db_session.close()
+        return self._loop.run_in_executor(None, read)
+
+    async def _publish_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self._publish()
+            except DBAPIError:
+                log.exception('Failed to read the change log')
+
+    async def _publish(self):
+        while True:
+            changes = await self._read(query_change_log, self.last_seq, self.batch_size)
+            for change in changes:
+                for subscriber in list(self._subscribers):
+                    if subscriber.ready:
+                        subscriber.send(change)
+            if changes:
+                self.last_seq = changes[-1]['seq']
+            if len(changes) < self.batch_size:
+                return
+
+    async def _catch_up(self, subscriber):
+        # Send the backlog up to the published position; the check and
+        # marking the subscriber ready happen without yielding, so no live
+        # event can be published in between.
+        while subscriber.last_seq < self.last_seq:
+            changes = await self._read(query_change_log, subscriber.last_seq, self.batch_size)
+            if not changes:
+                break
+            for change in changes:
+                if change['seq'] <= self.last_seq:
+                    subscriber.send(change)
+            if changes[-1]['seq'] > self.last_seq:
+                break
+        subscriber.ready = True
+
+    async def _handle(self, reader, writer):
+        subscriber = None
+        try:
+            try:
+                request_head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), self.keepalive_interval)
+                since = _parse_since(request_head)
+            except (ValueError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError):
+                writer.write(BAD_REQUEST)
+                return
+
+            writer.write(STREAM_HEADERS)
+            subscriber = _Subscriber(writer, self.last_seq if since is None else since, self.max_buffer)
+            self._subscribers.add(subscriber)
+            await self._catch_up(subscriber)
+
+            while not writer.is_closing():
+                try:
+                    if not await asyncio.wait_for(reader.read(1024), self.keepalive_interval):
+                        break
+                except asyncio.TimeoutError:
+                    writer.write(b': keepalive\n\n')
+        except (ConnectionError, DBAPIError):
+            pass
+        finally:
+            self._subscribers.discard(subscriber)
+            writer.close()
+
+
+event_broadcaster = None
+
+
+def start_event_broadcaster(settings, session_factory):
+    """Starts the process-wide broadcaster when artificer.events_port is set."""
+    global event_broadcaster
+    port = settings.get('artificer.events_port')
+    if port is None or event_broadcaster is not None:
+        return event_broadcaster
+
+    event_broadcaster = EventBroadcaster(
+        session_factory,
+        host=settings.get('artificer.events_host', default_events_host),
+        port=int(port),
+        poll_interval=float(settings.get('artificer.events_poll_interval', default_poll_interval)))
+    event_broadcaster.start()
+    return event_broadcaster
@@ -0,0 +1,181 @@
+import bisect
+import logging
+import threading
+
+from sqlalchemy.exc import DBAPIError
+
+from artificer.lib.artifacts import artifact_index_entry, query_artifact_index
+from artificer.lib.catalog import catalog_changed, catalog_listeners, get_catalog_generation
+
+log = logging.getLogger(__name__)
+
+FILTER_MODES = ('any', 'all', 'not')
+
+# Filter names and the index entry values they select on
+FACET_KEYS = (
+    ('labels', 'labels'),
+    ('supported_os', 'supported_os'),
+    ('authors', 'author'),
+    ('sources', 'sources'),
+)
+
+
+class FacetIndex(object):
+    """
+    Snapshot of the artifact index with one bitmap per facet value.
+
+    Bit n of a bitmap is set when the nth artifact, in id order, carries
+    that value. Bitmaps are plain Python integers, so filters are answered
+    with integer and, or and not.
+    """
+
+    def __init__(self, entries, generation=0):
+        self.entries = entries
+        self.generation = generation
+        self.ids = [entry['id'] for entry in entries]
+        self.all_bits = (1 << len(entries)) - 1
+        self.bitmaps = dict((filter_key, {}) for filter_key, _ in FACET_KEYS)
+
+        for position, entry in enumerate(entries):
+            bit = 1 << position
+            for filter_key, entry_key in FACET_KEYS:
+                values = entry[entry_key]
+                if not isinstance(values, list):
+                    values = [values]
+                bitmaps = self.bitmaps[filter_key]
+                for value in values:
+                    bitmaps[value] = bitmaps.get(value, 0) | bit
+
+    def facet_bits(self, filter_key, values, mode='any'):
+        bitmaps = self.bitmaps[filter_key]
+        if mode == 'all':
+            bits = self.all_bits
+            for value in set(values):
+                bits &= bitmaps.get(value, 0)
+            return bits
+
+        bits = 0
+        for value in values:
+            bits |= bitmaps.get(value, 0)
+        if mode == 'not':
+            return self.all_bits & ~bits
+        return bits
+
+    def select(self, filters, modes=None, after=None, limit=None):
+        modes = modes or {}
+        bits = self.all_bits
+        for filter_key, values in filters.items():
+            if values:
+                bits &= self.facet_bits(filter_key, values, modes.get(filter_key, 'any'))
+
+        start = 0
+        if after is not None:
+            start = bisect.bisect_right(self.ids, after)
+        bits >>= start
+
+        # Walk the set bits from the least significant up, in id order
+        flags = bin(bits)[:1:-1]
+        entries = []
+        position = flags.find('1')
+        while position != -1 and (limit is None or len(entries) < limit):
+            entries.append(self.entries[start + position])
+            position = flags.find('1', position + 1)
+        return entries
+
+
+class FacetEngine(object):
+    """
+    Process-wide in-memory filter engine over the artifact index.
+
+    The loaded index is tagged with the catalog generation it was read at
+    and only answers requests at that generation. While it is cold or
+    stale, callers fall back to SQL; when a session factory is configured
+    it is rebuilt in a background thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._rebuilding = False
+        self.session_factory = None
+
+    @property
+    def warm(self):
+        return self._index is not None
+
+    def load(self, db_session):
+        generation = get_catalog_generation(db_session)
+        artifacts = query_artifact_index(db_session)
+        index = FacetIndex([artifact_index_entry(artifact) for artifact in artifacts], generation)
+        with self._lock:
+            # Never replace a snapshot of a later generation
+            if self._index is None or self._index.generation <= generation:
+                self._index = index
+        return index
+
+    def invalidate(self):
+        self._index = None
+        self._schedule_rebuild()
+
+    def _schedule_rebuild(self):
+        if self.session_factory is None:
+            return
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        thread = threading.Thread(target=self.rebuild, name='facet-engine-rebuild')
+        thread.daemon = True
+        thread.start()
+
+    def rebuild(self):
+        db_session = self.session_factory()
+        try:
+            self.load(db_session)
+        except DBAPIError:
+            log.exception('Failed to rebuild the facet engine')
+        finally:
+            db_session.close()
+            self._rebuilding = False
+
+    def select(self, generation, filters, modes=None, after=None, limit=None):
+        """Returns index entries for the filters, or None unless the engine holds this generation."""
+        index = self._index
+        if index is None or index.generation != generation:
+            if index is None or index.generation < generation:
+                self._schedule_rebuild()
+            return None
+        return index.select(filters, modes, after, limit)
+
+
+facet_engine = FacetEngine()
+catalog_listeners.append(facet_engine.invalidate)
+
+
+def warm_facet_engine(session_factory):
+    db_session = session_factory()
+    try:
+        facet_engine.load(db_session)
+    except DBAPIError:
+        # The database has not been initialized yet, load once it changes
+        pass
+    finally:
+        db_session.close()
+    facet_engine.session_factory = session_factory
+
+
+def select_artifact_index(db_session, filters, modes=None, after=None, limit=None, generation=None):
+    """Returns index entries for the filters from the facet engine, or from SQL while it is cold.
+
+    A session holding uncommitted catalog changes, or filtering on source
+    attributes, which the engine does not index, always reads with SQL.
+    """
+    entries = None
+    if not catalog_changed(db_session) and not filters.get('source_attributes'):
+        if generation is None:
+            generation = get_catalog_generation(db_session)
+        entries = facet_engine.select(generation, filters, modes, after, limit)
+    if entries is None:
+        artifacts = query_artifact_index(db_session, modes=modes, after=after, limit=limit, **filters)
+        entries = [artifact_index_entry(artifact) for artifact in artifacts]
+    return entries
@@ -0,0 +1,125 @@
+from sqlalchemy.orm.exc import NoResultFound
+
+from artificer.models import Artifact, GroupMember
+
+
+def group_member_rows(artifact_definition):
+    """Returns the group_members rows of an artifact definition dict, in definition order."""
+    rows = []
+    seen = set()
+    for source in artifact_definition.get('sources', []):
+        if source['type'] != 'ARTIFACT_GROUP':
+            continue
+        for name in (source.get('attributes') or {}).get('names') or []:
+            if name not in seen:
+                seen.add(name)
+                rows.append({'member_name': name})
+    return rows
+
+
+def _load_group_graph(db_session, artifact_ids, chunk_size=500):
+    """Returns the names and member edges of every artifact reachable from artifact_ids.
+
+    The graph is read one level at a time, with one query per level and
+    chunk of ids.
+    """
+    artifact_ids = sorted(set(artifact_ids))
+    names = {}
+    for start in range(0, len(artifact_ids), chunk_size):
+        names.update(db_session.query(Artifact.id, Artifact.name).
+                     filter(Artifact.id.in_(artifact_ids[start:start + chunk_size])))
+
+    edges = {}
+    frontier = sorted(names)
+    while frontier:
+        next_frontier = []
+        for start in range(0, len(frontier), chunk_size):
+            members = db_session.query(GroupMember.artifact_id, GroupMember.member_name, Artifact.id).\
+                outerjoin(Artifact, Artifact.name == GroupMember.member_name).\
+                filter(GroupMember.artifact_id.in_(frontier[start:start + chunk_size])).\
+                order_by(GroupMember.id)
+            for group_id, member_name, member_id in members:
+                edges.setdefault(group_id, []).append((member_name, member_id))
+                if member_id is not None and member_id not in names:
+                    names[member_id] = member_name
+                    next_frontier.append(member_id)
+        frontier = next_frontier
+    return names, edges
+
+
+def expand_group(db_session, artifact_id):
+    """
+    Returns the de-duplicated member closure of an ARTIFACT_GROUP artifact.
+
+    Members are listed depth first in definition order. ``members`` are the
+    reachable artifacts that are not groups themselves and ``groups`` the
+    nested groups; member names that match no artifact are listed in
+    ``dangling`` and every member reference that leads back into the
+    current path is listed in ``cycles`` as the path of names around it.
+    Raises NoResultFound when the artifact does not exist.
+    """
+    names, edges = _load_group_graph(db_session, [artifact_id])
+    if artifact_id not in names:
+        raise NoResultFound()
+
+    closure = {
+        'id': artifact_id,
+        'name': names[artifact_id],
+        'members': [],
+        'groups': [],
+        'dangling': [],
+        'cycles': [],
+    }
+    visited = set([artifact_id])
+    path = [artifact_id]
+    stack = [iter(edges.get(artifact_id, []))]
+    while stack:
+        for member_name, member_id in stack[-1]:
+            if member_id is None:
+                closure['dangling'].append({'group': names[path[-1]], 'member': member_name})
+            elif member_id in path:
+                closure['cycles'].append([names[node] for node in path[path.index(member_id):]] + [member_name])
+            elif member_id not in visited:
+                visited.add(member_id)
+                entry = {'id': member_id, 'name': member_name}
+                if member_id in edges:
+                    closure['groups'].append(entry)
+                    path.append(member_id)
+                    stack.append(iter(edges[member_id]))
+                    break
+                closure['members'].append(entry)
+        else:
+            stack.pop()
+            path.pop()
+    return closure
+
+
+def dependency_order(db_session, artifact_ids):
+    """
+    Returns artifact_ids and the ids of every artifact their groups reach, each once.
+
+    Members come before the groups that reference them; otherwise ids keep
+    the order they were given and groups their definition order. A member
+    that loops back to a group still being expanded is skipped. Ids that do
+    not exist and dangling member names are left out.
+    """
+    names, edges = _load_group_graph(db_session, artifact_ids)
+
+    ordered = []
+    visited = set()
+    for artifact_id in artifact_ids:
+        if artifact_id not in names or artifact_id in visited:
+            continue
+        visited.add(artifact_id)
+        stack = [(artifact_id, iter(edges.get(artifact_id, [])))]
+        while stack:
+            node, members = stack[-1]
+            for _, member_id in members:
+                if member_id is not None and member_id not in visited:
+                    visited.add(member_id)
+                    stack.append((member_id, iter(edges.get(member_id, []))))
+                    break
+            else:
+                stack.pop()
+                ordered.append(node)
+    return ordered
@@ -0,0 +1,290 @@
+import datetime
+import json
+import logging
+import os
+import socket
+import tempfile
+import threading
+import uuid
+
+import transaction
+import yaml
+from pyramid.settings import asbool
+from sqlalchemy import event, or_
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+import artifacts.errors as fa_errors
+
+from artificer.models import ImportJob, get_tm_session
+
+from artificer.lib.artifacts import import_artifacts
+from artificer.lib.errors import MissingAuthor
+from artificer.lib.parsing import get_parse_workers, read_artifacts_file_object
+
+log = logging.getLogger(__name__)
+
+default_chunk_size = 200
+default_poll_interval = 30.0
+default_heartbeat_interval = 30.0
+default_stale_after = 300.0
+
+# Session.info key listing the spooled uploads of jobs a session queued but
+# has not committed yet
+IMPORT_QUEUED = 'artificer.import_queued'
+
+
+def get_spool_dir(settings):
+    return settings.get('artificer.import_spool_dir',
+                        os.path.join(tempfile.gettempdir(), 'artificer-imports'))
+
+
+def queue_import(db_session, file_object, filename, author, replace=False, spool_dir=None):
+    """Spools an upload to disk and queues a job to import it once the transaction commits."""
+    spool_dir = spool_dir or get_spool_dir({})
+    if not os.path.isdir(spool_dir):
+        os.makedirs(spool_dir)
+
+    spool_fd, path = tempfile.mkstemp(prefix='import-', suffix='.yaml', dir=spool_dir)
+    with os.fdopen(spool_fd, 'wb') as spool:
+        while True:
+            data = file_object.read(64 * 1024)
+            if not data:
+                break
+            if not isinstance(data, bytes):
+                data = data.encode('utf-8')
+            spool.write(data)
+
+    job = ImportJob(status=ImportJob.QUEUED, filename=filename, path=path, author=author, replace=replace)
+    db_session.add(job)
+    db_session.flush()
+    db_session.info.setdefault(IMPORT_QUEUED, []).append(path)
+    return job
+
+
+def import_job_entry(job):
+    return {
+        'id': job.id,
+        'status': job.status,
+        'filename': job.filename,
+        'total': job.total,
+        'processed': job.processed,
+        'added': job.added,
+        'changed': job.changed,
+        'unchanged': job.unchanged,
+        'failed': json.loads(job.failed),
+        'ids': json.loads(job.ids),
+        'error': job.error,
+    }
+
+
+class ImportWorker(object):
+    """
+    Background thread that runs queued import jobs one at a time.
+
+    Each batch of chunk_size definitions is imported in its own
+    transaction together with the job's progress, so a request never holds
+    one transaction for a whole upload. A second thread refreshes the
+    heartbeat of the jobs the worker owns every heartbeat_interval seconds;
+    running jobs whose heartbeat is older than stale_after seconds were
+    left by a worker that stopped, and are queued again to resume after
+    their last committed batch.
+    """
+
+    def __init__(self, session_factory, parse_workers=1, chunk_size=default_chunk_size,
+                 poll_interval=default_poll_interval, heartbeat_interval=default_heartbeat_interval,
+                 stale_after=default_stale_after):
+        self.session_factory = session_factory
+        self.parse_workers = parse_workers
+        self.chunk_size = chunk_size
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        self.owner = '%s:%d:%s' % (socket.gethostname(), os.getpid(), uuid.uuid4().hex[:8])
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self._heartbeat_thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='import-worker')
+        self._thread.daemon = True
+        self._thread.start()
+        self._heartbeat_thread = threading.Thread(target=self._beat, name='import-worker-heartbeat')
+        self._heartbeat_thread.daemon = True
+        self._heartbeat_thread.start()
+
+    def stop(self):
+        self._stopping = True
+        self._stopped.set()
+        self._wake.set()
+        for thread in (self._thread, self._heartbeat_thread):
+            if thread is not None:
+                thread.join()
+
+    def notify(self):
+        self._wake.set()
+
+    def _run(self):
+        while not self._stopping:
+            try:
+                self.resume_interrupted()
+                self.run_pending()
+            except Exception:
+                # Keep the worker alive for the jobs queued behind
+                log.exception('Failed to run import jobs')
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _beat(self):
+        while not self._stopping:
+            try:
+                self.heartbeat()
+            except Exception:
+                log.exception('Failed to update import job heartbeat')
+            self._stopped.wait(self.heartbeat_interval)
+
+    def heartbeat(self):
+        """Marks the running jobs of this worker as alive."""
+        with transaction.manager:
+            db_session = get_tm_session(self.session_factory, transaction.manager)
+            db_session.query(ImportJob).\
+                filter_by(status=ImportJob.RUNNING, owner=self.owner).\
+                update({'heartbeat': datetime.datetime.utcnow()}, synchronize_session=False)
+
+    def resume_interrupted(self):
+        """Queues again the running jobs whose worker has missed its heartbeats."""
+        stale = datetime.datetime.utcnow() - datetime.timedelta(seconds=self.stale_after)
+        with transaction.manager:
+            db_session = get_tm_session(self.session_factory, transaction.manager)
+            db_session.query(ImportJob).\
+                filter(ImportJob.status == ImportJob.RUNNING,
+                       or_(ImportJob.heartbeat.is_(None), ImportJob.heartbeat < stale)).\
+                update({'status': ImportJob.QUEUED, 'owner': None}, synchronize_session=False)
+
+    def run_pending(self):
+        """Runs queued jobs in the calling thread until none are left."""
+        while not self._stopping:
+            job_id = self._claim()
+            if job_id is None:
+                return
+            try:
+                self.run_job(job_id)
+            except Exception as error:
+                log.exception('Import job %d failed', job_id)
+                self._finish(job_id, ImportJob.FAILED, error=str(error))
+
+    def _claim(self):
+        with transaction.manager:
+            db_session = get_tm_session(self.session_factory, transaction.manager)
+            job_id = db_session.query(ImportJob.id).\
+                filter_by(status=ImportJob.QUEUED).\
+                order_by(ImportJob.id).\
+                limit(1).\
+                scalar()
+            if job_id is None:
+                return None
+            claimed = db_session.query(ImportJob).\
+                filter_by(id=job_id, status=ImportJob.QUEUED).\
+                update({'status': ImportJob.RUNNING,
+                        'owner': self.owner,
+                        'heartbeat': datetime.datetime.utcnow()}, synchronize_session=False)
+        return job_id if claimed else self._claim()
+
+    def run_job(self, job_id):
+        with transaction.manager:
+            db_session = get_tm_session(self.session_factory, transaction.manager)
+            job = db_session.query(ImportJob).get(job_id)
+            path, author, replace, processed = job.path, job.author, job.replace, job.processed
+
+        try:
+            # Read as bytes so yaml detects the encoding; undecodable uploads
+            # fail the job with a UnicodeDecodeError, which is a ValueError
+            with open(path, 'rb') as spool:
+                forensic_artifacts = list(read_artifacts_file_object(spool, workers=self.parse_workers))
+        except (EnvironmentError, ValueError, yaml.YAMLError, fa_errors.FormatError) as error:
+            self._finish(job_id, ImportJob.FAILED, error=str(error))
+            return
+
+        try:
+            with transaction.manager:
+                db_session = get_tm_session(self.session_factory, transaction.manager)
+                db_session.query(ImportJob).get(job_id).total = len(forensic_artifacts)
+
+            for start in range(processed, len(forensic_artifacts), self.chunk_size):
+                chunk = forensic_artifacts[start:start + self.chunk_size]
+                with transaction.manager:
+                    db_session = get_tm_session(self.session_factory, transaction.manager)
+                    job = db_session.query(ImportJob).get(job_id)
+                    if job.owner != self.owner:
+                        # Queued again after missed heartbeats; its new owner imports the rest
+                        log.warning('Import job %d was taken over by %s', job_id, job.owner)
+                        return
+                    results = import_artifacts(db_session, chunk, author=author, replace=replace)
+                    job.processed = start + len(chunk)
+                    job.added += results['added']
+                    job.changed += results['changed']
+                    job.unchanged += results['unchanged']
+                    job.failed = json.dumps(json.loads(job.failed) + results['failed'])
+                    job.ids = json.dumps(json.loads(job.ids) + results['ids'])
+        except MissingAuthor:
+            self._finish(job_id, ImportJob.FAILED, error='Missing author')
+            return
+        except DBAPIError as error:
+            log.exception('Import job %d failed', job_id)
+            self._finish(job_id, ImportJob.FAILED, error=str(error.orig))
+            return
+
+        self._finish(job_id, ImportJob.FINISHED)
+
+    def _finish(self, job_id, status, error=None):
+        with transaction.manager:
+            db_session = get_tm_session(self.session_factory, transaction.manager)
+            job = db_session.query(ImportJob).get(job_id)
+            if job.owner != self.owner:
+                # Taken over by another worker, which still needs the upload
+                return
+            job.status = status
+            job.error = error
+            path = job.path
+        try:
+            os.remove(path)
+        except EnvironmentError:
+            pass
+
+
+import_worker = None
+
+
+@event.listens_for(Session, 'after_commit')
+def _notify_after_commit(db_session):
+    if db_session.info.pop(IMPORT_QUEUED, None) and import_worker is not None:
+        import_worker.notify()
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def _remove_after_transaction(db_session, session_transaction):
+    if session_transaction.parent is not None:
+        return
+    # Still set only when the jobs were rolled back or discarded, so nothing
+    # will import their uploads
+    for path in db_session.info.pop(IMPORT_QUEUED, []):
+        try:
+            os.remove(path)
+        except EnvironmentError:
+            pass
+
+
+def start_import_worker(settings, session_factory):
+    """Starts the process-wide import worker when artificer.import_worker is enabled."""
+    global import_worker
+    if not asbool(settings.get('artificer.import_worker')) or import_worker is not None:
+        return import_worker
+
+    import_worker = ImportWorker(session_factory,
+                                 parse_workers=get_parse_workers(settings),
+                                 chunk_size=int(settings.get('artificer.import_chunk_size', default_chunk_size)),
+                                 stale_after=float(settings.get('artificer.import_stale_after', default_stale_after)))
+    import_worker.start()
+    return import_worker
@@ -0,0 +1,129 @@
+import atexit
+import glob
+import multiprocessing
+import os
+import re
+import threading
+
+import yaml
+
+import artifacts.errors as fa_errors
+import artifacts.reader as fa_readers
+
+# A line starting with --- begins a new YAML document
+DOCUMENT_START = re.compile(r'^---(?=\s|$)', re.MULTILINE)
+
+# Process pools shared by every parse, by number of workers
+_parse_pools = {}
+_parse_pools_lock = threading.Lock()
+
+
+def split_yaml_documents(yaml_data):
+    """Splits a YAML stream into the text of its documents without parsing it."""
+    if isinstance(yaml_data, bytes):
+        yaml_data = yaml_data.decode('utf-8')
+
+    documents = []
+    start = 0
+    for match in DOCUMENT_START.finditer(yaml_data):
+        documents.append(yaml_data[start:match.start()])
+        start = match.end()
+    documents.append(yaml_data[start:])
+    return [document for document in documents if document.strip()]
+
+
+def _read_yaml(yaml_data):
+    """
+    Parses and validates the artifact definitions in yaml_data.
+
+    Runs in the worker processes. Validation errors are returned rather than
+    raised so the parent can report them with the same location the serial
+    reader would use.
+    """
+    artifact_reader = fa_readers.YamlArtifactsReader()
+    results = []
+    for yaml_definition in yaml.safe_load_all(yaml_data):
+        try:
+            results.append(artifact_reader.ReadArtifactDefinitionValues(yaml_definition))
+        except fa_errors.FormatError as exception:
+            results.append(exception)
+            break
+    return results
+
+
+def _read_yaml_file(filename):
+    with open(filename, 'r') as file_object:
+        return _read_yaml(file_object.read())
+
+
+def get_parse_pool(workers):
+    """
+    Returns the long-lived process pool with the given number of workers.
+
+    Workers are started by a fork server, or spawned where there is none,
+    rather than forked from a process that may be running other threads.
+    """
+    with _parse_pools_lock:
+        pool = _parse_pools.get(workers)
+        if pool is None:
+            if 'forkserver' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('forkserver')
+            else:
+                context = multiprocessing.get_context('spawn')
+            pool = _parse_pools[workers] = context.Pool(workers)
+        return pool
+
+
+@atexit.register
+def shutdown_parse_pools():
+    with _parse_pools_lock:
+        for pool in _parse_pools.values():
+            pool.terminate()
+            pool.join()
+        _parse_pools.clear()
+
+
+def _parse(function, items, workers, per_item_location=False):
+    last_artifact = None
+    for results in get_parse_pool(workers).imap(function, items):
+        if per_item_location:
+            last_artifact = None
+        for result in results:
+            if isinstance(result, fa_errors.FormatError):
+                error_location = 'At start'
+                if last_artifact:
+                    error_location = 'After: {0:s}'.format(last_artifact.name)
+                raise fa_errors.FormatError('{0:s} {1!s}'.format(error_location, result))
+            yield result
+            last_artifact = result
+
+
+def read_artifacts_file_object(file_object, workers=1):
+    """
+    Yields the artifact definitions of a YAML file object in order.
+
+    With more than one worker the documents are parsed and validated in the
+    shared process pool; errors are raised exactly as YamlArtifactsReader
+    raises them.
+    """
+    if workers <= 1:
+        return fa_readers.YamlArtifactsReader().ReadFileObject(file_object)
+
+    return _parse(_read_yaml, split_yaml_documents(file_object.read()), workers)
+
+
+def read_artifacts_directory(path, extension='yaml', workers=1):
+    """Yields the artifact definitions of every YAML file in a directory, in order."""
+    if workers <= 1:
+        return fa_readers.YamlArtifactsReader().ReadDirectory(path, extension=extension)
+
+    if extension:
+        glob_spec = os.path.join(path, '*.{0:s}'.format(extension))
+    else:
+        glob_spec = os.path.join(path, '*')
+
+    return _parse(_read_yaml_file, glob.glob(glob_spec), workers, per_item_location=True)
+
+
+def get_parse_workers(settings):
+    return int(settings.get('artificer.parse_workers', 1))
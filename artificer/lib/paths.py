@@ -0,0 +1,257 @@
+import re
+
+from artificer.models import Artifact, SourcePath
+
+# Source attributes holding paths or registry keys
+PATH_ATTRIBUTES = ('paths', 'keys', 'key_value_pairs')
+
+REGISTRY_HIVES = {
+    'hklm': 'hkey_local_machine',
+    'hku': 'hkey_users',
+    'hkcr': 'hkey_classes_root',
+    'hkcu': 'hkey_current_user',
+}
+
+# %%interpolation%%, **recursion (with optional depth), * and ?
+GLOB_TOKENS = re.compile(r'%%[^%]*%%|\*\*\d*|\*|\?')
+
+# Recursion depth of ** without an explicit depth
+DEFAULT_RECURSION_DEPTH = 3
+
+# Marks an anchor held by a component anywhere in a path, rather than by its leading components
+INNER_ANCHOR = '**/'
+
+
+def normalize_path(path):
+    """Lower cases a path or registry key, uses / as separator and expands hive abbreviations."""
+    path = re.sub(r'[\\/]+', '/', path.strip().lower())
+    if len(path) > 1:
+        path = path.rstrip('/')
+
+    hive, separator, rest = path.partition('/')
+    if hive in REGISTRY_HIVES:
+        path = REGISTRY_HIVES[hive] + separator + rest
+    return path
+
+
+def path_prefixes(path):
+    """Returns every leading run of components of a normalised path, including the empty one."""
+    components = path.split('/')
+    return set('/'.join(components[:index]) for index in range(len(components) + 1))
+
+
+def path_anchors(path):
+    """Returns the anchors under which the patterns that may match a normalised path are indexed."""
+    anchors = path_prefixes(path)
+    anchors.update(INNER_ANCHOR + component for component in path.split('/') if component)
+    return anchors
+
+
+def pattern_anchor(pattern):
+    """
+    Returns the anchor a normalised pattern is indexed under.
+
+    This is the leading run of components without wildcards or
+    interpolations. Patterns without one, such as those starting with
+    %%environ_systemroot%%, are anchored on their first such component
+    instead, marked with INNER_ANCHOR, which a matching path holds somewhere.
+    """
+    components = pattern.split('/')
+    for index, component in enumerate(components):
+        if GLOB_TOKENS.search(component):
+            break
+    else:
+        return pattern
+    anchor = '/'.join(components[:index])
+    if anchor:
+        return anchor
+    for component in components[index + 1:]:
+        if component and not GLOB_TOKENS.search(component):
+            return INNER_ANCHOR + component
+    return anchor
+
+
+def compile_pattern(pattern):
+    """
+    Compiles a normalised pattern to a regular expression matching whole paths.
+
+    ``*`` and ``?`` stay within one component, ``**N`` spans up to N
+    components (DEFAULT_RECURSION_DEPTH without N) and path interpolations
+    such as %%environ_systemroot%% may span any number of components.
+    """
+    expression = []
+    position = 0
+    for match in GLOB_TOKENS.finditer(pattern):
+        expression.append(re.escape(pattern[position:match.start()]))
+        token = match.group()
+        if token == '*':
+            expression.append('[^/]*')
+        elif token == '?':
+            expression.append('[^/]')
+        elif token.startswith('**'):
+            depth = int(token[2:] or DEFAULT_RECURSION_DEPTH)
+            expression.append('[^/]*(?:/[^/]*){0,%d}' % (depth - 1))
+        else:
+            expression.append('.*')
+        position = match.end()
+    expression.append(re.escape(pattern[position:]))
+    return re.compile(''.join(expression) + r'\Z')
+
+
+# Recursion markers of a covered pattern, which only an identical pattern covers
+RECURSION_TOKENS = re.compile(r'\*\*\d*')
+
+
+def _cover_expression(pattern):
+    """
+    Compiles a normalised pattern to a regular expression matching the patterns it covers.
+
+    Covered patterns have their ** tokens replaced with NUL first. Path
+    interpolations stand for one specific value here, so they only cover
+    themselves, and wildcards never cover an interpolation.
+    """
+    expression = []
+    position = 0
+    for match in GLOB_TOKENS.finditer(pattern):
+        expression.append(re.escape(pattern[position:match.start()]))
+        token = match.group()
+        if token == '*':
+            expression.append('[^/%\x00]*')
+        elif token == '?':
+            expression.append('[^/%*?\x00]')
+        elif token.startswith('**'):
+            depth = int(token[2:] or DEFAULT_RECURSION_DEPTH)
+            expression.append('[^/%%\x00]*(?:/[^/%%\x00]*){0,%d}' % (depth - 1))
+        else:
+            expression.append(re.escape(token))
+        position = match.end()
+    expression.append(re.escape(pattern[position:]))
+    return re.compile(''.join(expression) + r'\Z')
+
+
+def _literal_anchor(pattern):
+    components = pattern.split('/')
+    for index, component in enumerate(components):
+        if '*' in component or '?' in component:
+            return '/'.join(components[:index])
+    return None
+
+
+def find_cover(pattern, wildcards):
+    """Returns the first pattern of a wildcard index that covers a normalised pattern, or None."""
+    subject = RECURSION_TOKENS.sub('\x00', pattern)
+    for prefix in sorted(path_prefixes(pattern)):
+        for candidate, expression in wildcards.get(prefix, ()):
+            if candidate != pattern and expression.match(subject):
+                return candidate
+    return None
+
+
+def wildcard_index(patterns):
+    """Indexes the normalised patterns holding wildcards by their literal leading components."""
+    wildcards = {}
+    for pattern in sorted(patterns):
+        anchor = _literal_anchor(pattern)
+        if anchor is not None:
+            wildcards.setdefault(anchor, []).append((pattern, _cover_expression(pattern)))
+    return wildcards
+
+
+def collapse_patterns(patterns):
+    """
+    Maps each normalised pattern to the pattern that covers it, or to itself when none does.
+
+    A pattern covers another when every path the other matches is matched
+    by it too. The check is conservative: coverage through ** or
+    interpolations of the covered pattern is not detected, so such
+    patterns are kept.
+    """
+    patterns = set(patterns)
+    wildcards = wildcard_index(patterns)
+    covers = dict((pattern, find_cover(pattern, wildcards)) for pattern in patterns)
+
+    collapsed = {}
+    for pattern in patterns:
+        seen = [pattern]
+        cover = covers[pattern]
+        while cover is not None and cover not in seen:
+            seen.append(cover)
+            cover = covers[cover]
+        # Patterns that cover each other collapse onto the least of them
+        collapsed[pattern] = seen[-1] if cover is None else min(seen[seen.index(cover):])
+    return collapsed
+
+
+def source_path_rows(artifact_definition):
+    """Returns the source_paths rows of an artifact definition dict."""
+    rows = []
+    seen = set()
+    for source in artifact_definition.get('sources', []):
+        attributes = source.get('attributes') or {}
+        for attribute in PATH_ATTRIBUTES:
+            for value in attributes.get(attribute) or []:
+                if attribute == 'key_value_pairs':
+                    value = value['key']
+                pattern = normalize_path(value)
+                if (source['type'], attribute, pattern) in seen:
+                    continue
+                seen.add((source['type'], attribute, pattern))
+                rows.append({
+                    'source_type': source['type'],
+                    'attribute': attribute,
+                    'pattern': pattern,
+                    'anchor': pattern_anchor(pattern),
+                })
+    return rows
+
+
+def index_patterns(rows):
+    """Groups (anchor, pattern, artifact id, artifact name) rows as {anchor: {pattern: artifacts}}."""
+    index = {}
+    for anchor, pattern, artifact_id, artifact_name in rows:
+        index.setdefault(anchor, {}).setdefault(pattern, set()).add((artifact_id, artifact_name))
+    return index
+
+
+def candidate_patterns(index, path):
+    """Yields the patterns of an anchor index that may match a normalised path, with their artifacts."""
+    for anchor in path_anchors(path):
+        for pattern, artifacts in index.get(anchor, {}).items():
+            yield pattern, artifacts
+
+
+def match_paths(db_session, paths, chunk_size=500):
+    """
+    Returns, for each path, the ids and names of the artifacts with a source pattern matching it.
+
+    Candidate patterns for all paths are fetched with one indexed IN query on
+    their anchors, and each path is then matched in memory against the
+    patterns under its own anchors only.
+    """
+    normalized = [normalize_path(path) for path in paths]
+    anchors = set()
+    for path in normalized:
+        anchors.update(path_anchors(path))
+
+    rows = []
+    anchors = sorted(anchors)
+    for start in range(0, len(anchors), chunk_size):
+        rows.extend(db_session.query(SourcePath.anchor, SourcePath.pattern, Artifact.id, Artifact.name).
+                    join(Artifact, Artifact.id == SourcePath.artifact_id).
+                    filter(SourcePath.anchor.in_(anchors[start:start + chunk_size])))
+    index = index_patterns(rows)
+
+    compiled = {}
+    matches = []
+    for path, normalized_path in zip(paths, normalized):
+        artifacts = set()
+        for pattern, pattern_artifacts in candidate_patterns(index, normalized_path):
+            if pattern not in compiled:
+                compiled[pattern] = compile_pattern(pattern)
+            if compiled[pattern].match(normalized_path):
+                artifacts.update(pattern_artifacts)
+        matches.append({
+            'path': path,
+            'artifacts': [{'id': artifact_id, 'name': name} for artifact_id, name in sorted(artifacts)],
+        })
+    return matches
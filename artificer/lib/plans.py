@@ -0,0 +1,121 @@
+import json
+import re
+
+from artificer.models import Artifact
+
+from artificer.lib.groups import dependency_order
+from artificer.lib.paths import collapse_patterns, find_cover, normalize_path, wildcard_index
+
+# Source types merged into collection plans
+PLAN_SOURCE_TYPES = ('FILE', 'PATH', 'REGISTRY_KEY', 'REGISTRY_VALUE', 'WMI')
+
+
+def _path_key(path, separator):
+    # Windows paths are case insensitive, other paths only fold separators
+    if separator == '\\':
+        return normalize_path(path)
+    path = re.sub(r'/+', '/', path.strip())
+    if len(path) > 1:
+        path = path.rstrip('/')
+    return path
+
+
+def _supported(supported_os, definition):
+    return not supported_os or not definition.get('supported_os') or \
+        bool(set(supported_os) & set(definition['supported_os']))
+
+
+class _PlanEntries(object):
+    """Plan entries of one source type keyed on their normalised form, with the artifacts behind each."""
+
+    def __init__(self):
+        self.entries = {}
+        self.artifacts = {}
+
+    def add(self, key, entry, artifact_name):
+        self.entries.setdefault(key, entry)
+        self.artifacts.setdefault(key, set()).add(artifact_name)
+
+    def merge(self, key, into, target=None):
+        """Drops an entry, crediting its artifacts to entry into of target (by default this type)."""
+        target = target or self
+        target.artifacts[into].update(self.artifacts.pop(key))
+        del self.entries[key]
+
+    def collapse(self):
+        """Merges every entry into the entry whose pattern covers it."""
+        for key, cover in collapse_patterns(self.entries).items():
+            if cover != key:
+                self.merge(key, cover)
+
+    def as_list(self):
+        return [dict(self.entries[key], artifacts=sorted(self.artifacts[key])) for key in sorted(self.entries)]
+
+
+def _load_definitions(db_session, artifact_ids, chunk_size=500):
+    definitions = {}
+    for start in range(0, len(artifact_ids), chunk_size):
+        definitions.update(db_session.query(Artifact.id, Artifact.data).
+                           filter(Artifact.id.in_(artifact_ids[start:start + chunk_size])))
+    return [json.loads(definitions[artifact_id]) for artifact_id in artifact_ids if artifact_id in definitions]
+
+
+def compile_collection_plan(db_session, artifact_ids, supported_os=None):
+    """
+    Returns the merged sources of artifact_ids and every artifact their groups reach.
+
+    FILE and PATH paths, REGISTRY_KEY keys, REGISTRY_VALUE key and value
+    pairs and WMI queries are each listed once, sorted, with the names of
+    the artifacts that asked for them. Paths and keys covered by a wildcard
+    pattern of the same source type are merged into it, and registry values
+    under a collected REGISTRY_KEY are merged into that key. When
+    supported_os is given, artifacts and sources for other systems are
+    left out.
+    """
+    artifact_ids = dependency_order(db_session, artifact_ids)
+
+    names = []
+    plan = dict((source_type, _PlanEntries()) for source_type in PLAN_SOURCE_TYPES)
+    for definition in _load_definitions(db_session, artifact_ids):
+        if not _supported(supported_os, definition):
+            continue
+        names.append(definition['name'])
+        for source in definition.get('sources', []):
+            source_type = source['type']
+            if source_type not in plan or not _supported(supported_os, source):
+                continue
+            attributes = source.get('attributes') or {}
+            entries = plan[source_type]
+            if source_type in ('FILE', 'PATH'):
+                separator = attributes.get('separator', '/')
+                for path in attributes.get('paths') or []:
+                    entries.add(_path_key(path, separator), {'path': path, 'separator': separator}, definition['name'])
+            elif source_type == 'REGISTRY_KEY':
+                for key in attributes.get('keys') or []:
+                    entries.add(normalize_path(key), {'key': key}, definition['name'])
+            elif source_type == 'REGISTRY_VALUE':
+                for pair in attributes.get('key_value_pairs') or []:
+                    entries.add((normalize_path(pair['key']), pair['value'].lower()),
+                                {'key': pair['key'], 'value': pair['value']}, definition['name'])
+            else:
+                query = ' '.join(attributes['query'].split())
+                base_object = attributes.get('base_object')
+                entries.add((query.lower(), base_object or ''),
+                            {'query': query, 'base_object': base_object}, definition['name'])
+
+    for source_type in ('FILE', 'PATH', 'REGISTRY_KEY'):
+        plan[source_type].collapse()
+
+    # Collecting a key collects its values
+    registry_keys = plan['REGISTRY_KEY']
+    wildcards = wildcard_index(registry_keys.entries)
+    registry_values = plan['REGISTRY_VALUE']
+    for key, value in list(registry_values.entries):
+        cover = key if key in registry_keys.entries else find_cover(key, wildcards)
+        if cover is not None:
+            registry_values.merge((key, value), cover, registry_keys)
+
+    return {
+        'artifacts': sorted(names),
+        'sources': dict((source_type, entries.as_list()) for source_type, entries in plan.items()),
+    }
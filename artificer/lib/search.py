@@ -0,0 +1,102 @@
+import re
+
+from sqlalchemy import and_, or_, text
+
+from artificer.models import ArtifactSearch
+from artificer.models.search import FTS_TABLE
+
+# Relevance weights of the name, doc and attributes columns
+SEARCH_WEIGHTS = (10.0, 2.0, 1.0)
+
+
+def search_terms(query):
+    """Splits a query into lower cased alphanumeric terms, the way the FTS5 tokenizer does."""
+    return [term.lower() for term in re.findall(r'[^\W_]+', query, re.UNICODE)]
+
+
+def _attribute_values(value):
+    if isinstance(value, dict):
+        for item in value.values():
+            for item_value in _attribute_values(item):
+                yield item_value
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            for item_value in _attribute_values(item):
+                yield item_value
+    elif value is not None:
+        yield u'%s' % value
+
+
+def search_document(artifact_definition):
+    """Returns the searchable columns of an artifact definition dict."""
+    attributes = []
+    for source in artifact_definition.get('sources', []):
+        attributes.extend(_attribute_values(source.get('attributes')))
+
+    return {
+        'name': artifact_definition['name'],
+        'doc': artifact_definition.get('doc'),
+        'attributes': u'\n'.join(attributes),
+    }
+
+
+def set_artifact_search(artifact, artifact_definition):
+    """Sets the search row of an artifact from its definition dict."""
+    document = search_document(artifact_definition)
+    if artifact.search is None:
+        artifact.search = ArtifactSearch(**document)
+    else:
+        for column, value in document.items():
+            setattr(artifact.search, column, value)
+
+
+def fts_available(db_session):
+    if db_session.get_bind().dialect.name != 'sqlite':
+        return False
+
+    statement = text("SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name = :name")
+    return db_session.execute(statement, {'name': FTS_TABLE}).scalar() > 0
+
+
+def search_artifacts(db_session, query, limit=50):
+    """
+    Returns the ids and names of the artifacts matching every term of query, most relevant first.
+
+    Uses the FTS5 index when SQLite provides it, ranked by bm25 with the
+    name weighted over the doc and source attributes. Otherwise the terms are
+    matched as substrings of the artifact_search rows and ranked with the
+    same weights.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+
+    if fts_available(db_session):
+        # Textual statements do not autoflush like ORM queries do
+        db_session.flush()
+        statement = text(
+            "SELECT artifact_search.artifact_id, artifact_search.name FROM artifact_fts "
+            "JOIN artifact_search ON artifact_search.artifact_id = artifact_fts.rowid "
+            "WHERE artifact_fts MATCH :match "
+            "ORDER BY bm25(artifact_fts, %s, %s, %s), artifact_search.artifact_id "
+            "LIMIT :limit" % SEARCH_WEIGHTS)
+        match = u' '.join(u'"%s"*' % term for term in terms)
+        rows = db_session.execute(statement, {'match': match, 'limit': limit})
+        return [{'id': artifact_id, 'name': name} for artifact_id, name in rows]
+
+    columns = (ArtifactSearch.name, ArtifactSearch.doc, ArtifactSearch.attributes)
+    conditions = []
+    for term in terms:
+        pattern = u'%' + term + u'%'
+        conditions.append(or_(*[column.ilike(pattern) for column in columns]))
+
+    scored = []
+    for row in db_session.query(ArtifactSearch.artifact_id, *columns).filter(and_(*conditions)):
+        values = [(value or u'').lower() for value in row[1:]]
+        score = sum(weight * value.count(term)
+                    for term in terms
+                    for weight, value in zip(SEARCH_WEIGHTS, values))
+        scored.append((-score, row.artifact_id, row.name))
+
+    scored.sort()
+    return [{'id': artifact_id, 'name': name} for _, artifact_id, name in scored[:limit]]
@@ -0,0 +1,136 @@
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+
+from artificer.models import Label, SupportedOS, Source
+
+VOCABULARY_COLUMNS = (Label.name, Source.type, SupportedOS.name)
+
+# Session.info key set while a session holds uncommitted vocabulary rows
+VOCABULARY_ADDED = 'artificer.vocabulary_added'
+
+
+class VocabularyCache(object):
+    """
+    Process-wide cache of label, source and supported_os names to ids.
+
+    The cache only ever holds committed rows. It is loaded at startup (or
+    lazily when cold) and invalidated once a transaction that inserted
+    vocabulary commits. A session that inserted vocabulary bypasses the
+    cache until its transaction ends, so rows from a transaction that is
+    rolled back are never cached.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = None
+
+    @property
+    def warm(self):
+        return self._ids is not None
+
+    def load(self, db_session):
+        ids = {}
+        for column in VOCABULARY_COLUMNS:
+            model = column.class_
+            ids[model] = dict(db_session.query(column, model.id))
+        self._ids = ids
+
+    def invalidate(self):
+        self._ids = None
+
+    def lookup(self, db_session, column, names):
+        """Returns the cached ids for the names that are known."""
+        if db_session.info.get(VOCABULARY_ADDED):
+            return {}
+
+        ids = self._ids
+        if ids is None:
+            with self._lock:
+                if self._ids is None:
+                    self.load(db_session)
+                ids = self._ids
+
+        cached = ids[column.class_]
+        return dict((name, cached[name]) for name in names if name in cached)
+
+    def added(self, db_session):
+        """Records that db_session inserted vocabulary rows in its current transaction."""
+        db_session.info[VOCABULARY_ADDED] = True
+
+
+vocabulary_cache = VocabularyCache()
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(db_session):
+    if db_session.info.pop(VOCABULARY_ADDED, False):
+        vocabulary_cache.invalidate()
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def _forget_after_transaction(db_session, session_transaction):
+    # Still set only when the transaction was rolled back or discarded
+    if session_transaction.parent is None:
+        db_session.info.pop(VOCABULARY_ADDED, None)
+
+
+def warm_vocabulary_cache(session_factory):
+    db_session = session_factory()
+    try:
+        vocabulary_cache.load(db_session)
+    except DBAPIError:
+        # The database has not been initialized yet, load lazily instead
+        vocabulary_cache.invalidate()
+    finally:
+        db_session.close()
+
+
+def get_vocabulary(db_session, column, names, **defaults):
+    """
+    Returns the vocabulary rows for names, in order, creating any that are missing.
+
+    Cached names are resolved from the session identity map or with a
+    single query by id; the remaining names are looked up with a single
+    query by name.
+    """
+    model = column.class_
+    rows = {}
+
+    cached_ids = vocabulary_cache.lookup(db_session, column, names)
+    missing_ids = []
+    for name, row_id in cached_ids.items():
+        row = db_session.identity_map.get(identity_key(model, row_id))
+        if row is not None:
+            rows[row_id] = row
+        else:
+            missing_ids.append(row_id)
+    if missing_ids:
+        for row in db_session.query(model).filter(model.id.in_(missing_ids)):
+            rows[row.id] = row
+
+    found = {}
+    for name, row_id in cached_ids.items():
+        row = rows.get(row_id)
+        if row is not None and getattr(row, column.key) == name:
+            found[name] = row
+        else:
+            # The cached id no longer refers to this name
+            vocabulary_cache.invalidate()
+
+    missing_names = [name for name in set(names) if name not in found]
+    if missing_names:
+        for row in db_session.query(model).filter(column.in_(missing_names)):
+            found[getattr(row, column.key)] = row
+
+    for name in names:
+        if name not in found:
+            row = model(**dict(defaults, **{column.key: name}))
+            db_session.add(row)
+            vocabulary_cache.added(db_session)
+            found[name] = row
+
+    return [found[name] for name in names]
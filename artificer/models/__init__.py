@@ -8,6 +8,14 @@ import zope.sqlalchemy
 
 from .user import User
 from .artifact import Artifact, Label, SupportedOS, Source
+from .catalog import CatalogGeneration
+from .change import ArtifactChange
+from .import_job import ImportJob
+from .search import ArtifactSearch
+from .source_path import SourcePath
+from .group_member import GroupMember
+from .source_attribute import SourceAttribute
+from .storage import configure_storage
 # run configure_mappers after defining all of the models to ensure
 # all relationships can be setup
 configure_mappers()
@@ -58,6 +66,7 @@ def includeme(config):
 
     """
     settings = config.get_settings()
+    configure_storage(settings)
 
     # use pyramid_tm to hook the transaction lifecycle to the request
     config.include('pyramid_tm')
@@ -8,9 +8,10 @@ from sqlalchemy import (
     ForeignKey
 )
 
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
 
 from .meta import Base
+from .storage import StoredDefinition
 
 
 # Association tables
@@ -34,11 +35,20 @@ class Artifact(Base):
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'))
     name = Column(String, unique=True)
-    data = Column(Text)
+    # Only loaded where the body is needed, so compressed rows are decoded there
+    data = deferred(Column(StoredDefinition))
+    # sha256 of the canonical JSON in data
+    data_hash = Column(String(64))
+    # Canonical YAML rendering of data, written alongside it for exports
+    yaml_data = deferred(Column(Text))
     author = relationship('User', back_populates='artifacts')
     labels = relationship('Label', secondary=artifact_labels, back_populates='artifacts')
     supported_os = relationship('SupportedOS', secondary=artifact_os, back_populates='artifacts')
     sources = relationship('Source', secondary=artifact_sources, back_populates='artifacts')
+    search = relationship('ArtifactSearch', uselist=False, cascade='all, delete-orphan')
+    source_paths = relationship('SourcePath', cascade='all, delete-orphan')
+    group_members = relationship('GroupMember', cascade='all, delete-orphan')
+    source_attributes = relationship('SourceAttribute', cascade='all, delete-orphan')
 
     def __repr__(self):
         return "%s" % self.data
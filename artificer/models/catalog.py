@@ -0,0 +1,21 @@
+from sqlalchemy import (
+    Column,
+    Integer,
+)
+
+from .meta import Base
+
+
+class CatalogGeneration(Base):
+    """
+    Single row counter bumped by every transaction that changes the catalog.
+
+    Anything derived from the catalog can be tagged with the generation it
+    was read at and is current for as long as the generation is unchanged.
+    """
+    __tablename__ = 'catalog_generation'
+    id = Column(Integer, primary_key=True)
+    generation = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return "%s" % self.generation
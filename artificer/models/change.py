@@ -0,0 +1,28 @@
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+)
+
+from .meta import Base
+
+
+class ArtifactChange(Base):
+    """
+    One entry of the artifact change log.
+
+    Entries are never updated; seq orders them in commit order. The
+    artifact id is not a foreign key so deletions can be logged.
+    """
+    __tablename__ = 'artifact_changes'
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+
+    seq = Column(Integer, primary_key=True)
+    artifact_id = Column(Integer, nullable=False, index=True)
+    name = Column(String, nullable=False)
+    action = Column(String(10), nullable=False)
+
+    def __repr__(self):
+        return "%s %s" % (self.action, self.name)
@@ -0,0 +1,24 @@
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    ForeignKey
+)
+
+from .meta import Base
+
+
+class GroupMember(Base):
+    """
+    A name referenced by an ARTIFACT_GROUP source of an artifact.
+
+    Members are stored by name, as in the definition, so references to
+    artifacts that do not exist (yet) are kept and reported as dangling.
+    """
+    __tablename__ = 'group_members'
+    id = Column(Integer, primary_key=True)
+    artifact_id = Column(Integer, ForeignKey('artifacts.id'), nullable=False, index=True)
+    member_name = Column(String, nullable=False, index=True)
+
+    def __repr__(self):
+        return "%s" % self.member_name
@@ -0,0 +1,48 @@
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Integer,
+    String,
+    Text,
+)
+
+from .meta import Base
+
+
+class ImportJob(Base):
+    """
+    A YAML upload imported in the background.
+
+    The upload is spooled to path. Progress is committed together with
+    each batch of imported artifacts, so processed always counts the
+    definitions whose artifacts are stored, and an interrupted job resumes
+    after them. A running job names the worker that owns it, which keeps
+    heartbeat current for as long as it runs.
+    """
+    __tablename__ = 'import_jobs'
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FINISHED = 'finished'
+    FAILED = 'failed'
+
+    id = Column(Integer, primary_key=True)
+    status = Column(String(20), nullable=False, default=QUEUED, index=True)
+    filename = Column(String)
+    path = Column(Text, nullable=False)
+    author = Column(String, nullable=False)
+    replace = Column(Boolean, nullable=False, default=False)
+    total = Column(Integer)
+    processed = Column(Integer, nullable=False, default=0)
+    added = Column(Integer, nullable=False, default=0)
+    changed = Column(Integer, nullable=False, default=0)
+    unchanged = Column(Integer, nullable=False, default=0)
+    # JSON lists of the names that failed and the ids imported so far
+    failed = Column(Text, nullable=False, default='[]')
+    ids = Column(Text, nullable=False, default='[]')
+    error = Column(Text)
+    owner = Column(String)
+    heartbeat = Column(DateTime)
+
+    def __repr__(self):
+        return "%s %s" % (self.filename, self.status)
@@ -0,0 +1,70 @@
+from sqlalchemy import (
+    Column,
+    Integer,
+    Text,
+    ForeignKey,
+    event,
+    text
+)
+
+from sqlalchemy.exc import OperationalError
+
+from .meta import Base
+
+
+class ArtifactSearch(Base):
+    """
+    Searchable text of an artifact: its name, doc and source attribute values.
+
+    This table is the portable search index. On SQLite builds with FTS5 it is
+    also the external content of the artifact_fts full-text index, which
+    triggers keep in sync with it.
+    """
+    __tablename__ = 'artifact_search'
+    artifact_id = Column(Integer, ForeignKey('artifacts.id'), primary_key=True)
+    name = Column(Text)
+    doc = Column(Text)
+    attributes = Column(Text)
+
+    def __repr__(self):
+        return "%s" % self.name
+
+
+FTS_TABLE = 'artifact_fts'
+
+FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS artifact_fts USING fts5("
+    "name, doc, attributes, content='artifact_search', content_rowid='artifact_id')",
+    "CREATE TRIGGER IF NOT EXISTS artifact_search_ai AFTER INSERT ON artifact_search BEGIN "
+    "INSERT INTO artifact_fts(rowid, name, doc, attributes) "
+    "VALUES (new.artifact_id, new.name, new.doc, new.attributes); END",
+    "CREATE TRIGGER IF NOT EXISTS artifact_search_ad AFTER DELETE ON artifact_search BEGIN "
+    "INSERT INTO artifact_fts(artifact_fts, rowid, name, doc, attributes) "
+    "VALUES ('delete', old.artifact_id, old.name, old.doc, old.attributes); END",
+    "CREATE TRIGGER IF NOT EXISTS artifact_search_au AFTER UPDATE ON artifact_search BEGIN "
+    "INSERT INTO artifact_fts(artifact_fts, rowid, name, doc, attributes) "
+    "VALUES ('delete', old.artifact_id, old.name, old.doc, old.attributes); "
+    "INSERT INTO artifact_fts(rowid, name, doc, attributes) "
+    "VALUES (new.artifact_id, new.name, new.doc, new.attributes); END",
+]
+
+
+@event.listens_for(Base.metadata, 'after_create')
+def create_fts_index(target, connection, **kw):
+    if connection.dialect.name != 'sqlite':
+        return
+
+    try:
+        connection.execute(text(FTS_DDL[0]))
+    except OperationalError:
+        # SQLite was built without FTS5, search falls back to artifact_search
+        return
+
+    for statement in FTS_DDL[1:]:
+        connection.execute(text(statement))
+
+
+@event.listens_for(Base.metadata, 'before_drop')
+def drop_fts_index(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        connection.execute(text("DROP TABLE IF EXISTS %s" % FTS_TABLE))
@@ -0,0 +1,34 @@
+from sqlalchemy import (
+    Column,
+    Index,
+    Integer,
+    String,
+    Text,
+    ForeignKey
+)
+
+from .meta import Base
+
+
+class SourceAttribute(Base):
+    """
+    One value of a source attribute of an artifact.
+
+    List attributes are stored one row per item and the fields of nested
+    mappings under dotted names such as key_value_pairs.key. Values are
+    lower cased so attribute filters ignore case, and the (name, value)
+    index answers exact and prefix lookups.
+    """
+    __tablename__ = 'source_attributes'
+    id = Column(Integer, primary_key=True)
+    artifact_id = Column(Integer, ForeignKey('artifacts.id'), nullable=False, index=True)
+    source_type = Column(String(20), nullable=False, index=True)
+    name = Column(String(40), nullable=False)
+    value = Column(Text, nullable=False)
+
+    __table_args__ = (
+        Index('ix_source_attributes_name_value', 'name', 'value'),
+    )
+
+    def __repr__(self):
+        return "%s:%s" % (self.name, self.value)
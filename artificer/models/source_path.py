@@ -0,0 +1,31 @@
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    Text,
+    ForeignKey
+)
+
+from .meta import Base
+
+
+class SourcePath(Base):
+    """
+    A normalised path or registry key pattern collected by an artifact source.
+
+    The anchor is the leading run of pattern components that contain no
+    wildcards, which lets concrete paths find their candidate patterns with
+    an indexed IN lookup over their own leading components. Patterns that
+    start with a wildcard or interpolation are anchored on their first
+    literal component, looked up among every component of a path.
+    """
+    __tablename__ = 'source_paths'
+    id = Column(Integer, primary_key=True)
+    artifact_id = Column(Integer, ForeignKey('artifacts.id'), nullable=False, index=True)
+    source_type = Column(String(20), nullable=False)
+    attribute = Column(String(20), nullable=False)
+    pattern = Column(Text, nullable=False)
+    anchor = Column(Text, nullable=False, index=True)
+
+    def __repr__(self):
+        return "%s" % self.pattern
@@ -0,0 +1,70 @@
+import base64
+import zlib
+
+from sqlalchemy.types import Text, TypeDecorator
+
+# Formats artifact definitions can be stored in
+STORAGE_FORMATS = ('json', 'zlib')
+
+# Stored definitions starting with this are zlib compressed, base85 encoded
+# canonical JSON; plain JSON always starts with {
+ZLIB_PREFIX = 'zlib:'
+
+# Format new and rewritten definitions are stored in, see configure_storage
+storage_format = 'json'
+
+
+def get_storage_format(settings):
+    value = settings.get('artificer.storage_format', 'json').lower()
+    if value not in STORAGE_FORMATS:
+        raise ValueError('artificer.storage_format must be one of: %s' % ', '.join(STORAGE_FORMATS))
+    return value
+
+
+def configure_storage(settings):
+    """Sets the process-wide storage format from artificer.storage_format."""
+    global storage_format
+    storage_format = get_storage_format(settings)
+    return storage_format
+
+
+def encode_definition(artifact_definition, value_format):
+    """Returns canonical JSON as it is stored in value_format.
+
+    Definitions too small to gain from compression stay plain JSON.
+    """
+    artifact_definition = decode_definition(artifact_definition)
+    if artifact_definition is None or value_format == 'json':
+        return artifact_definition
+    packed = zlib.compress(artifact_definition.encode('utf-8'), 9)
+    packed = ZLIB_PREFIX + base64.b85encode(packed).decode('ascii')
+    if len(packed) < len(artifact_definition.encode('utf-8')):
+        return packed
+    return artifact_definition
+
+
+def decode_definition(value):
+    """Returns the canonical JSON of a stored definition in any format."""
+    if value is None or not value.startswith(ZLIB_PREFIX):
+        return value
+    return zlib.decompress(base64.b85decode(value[len(ZLIB_PREFIX):])).decode('utf-8')
+
+
+class StoredDefinition(TypeDecorator):
+    """
+    Text column holding canonical JSON, compressed when the storage format is zlib.
+
+    Values are always read back as canonical JSON, whatever format each
+    row was written in, so rows can be converted in place and the format
+    changed without touching readers.
+    """
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or storage_format == 'json':
+            return value
+        return encode_definition(value, storage_format)
+
+    def process_result_value(self, value, dialect):
+        return decode_definition(value)
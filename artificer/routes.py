@@ -2,10 +2,19 @@ def includeme(config):
     config.add_static_view('static', 'static', cache_max_age=3600)
     config.add_route('index', '/')
     config.add_route('artifacts', 'api/artifacts')
+    config.add_route('artifact_match', 'api/artifacts/match')
+    config.add_route('artifact_batch', 'api/artifacts/batch')
+    config.add_route('artifacts_bulk', 'api/artifacts/bulk')
     config.add_route('artifact', 'api/artifacts/{id}')
+    config.add_route('artifact_group', 'api/artifacts/{id}/group')
     config.add_route('labels', 'api/labels')
     config.add_route('authors', 'api/authors')
     config.add_route('supported_os', 'api/supported_os')
     config.add_route('sources', 'api/sources')
     config.add_route('export_artifacts', 'api/export')
     config.add_route('import_artifacts', 'api/import')
+    config.add_route('import_job', 'api/import/{job_id}')
+    config.add_route('search', 'api/search')
+    config.add_route('collection_plan', 'api/plan')
+    config.add_route('changes', 'api/changes')
+    config.add_route('events', 'api/events')
@@ -0,0 +1,94 @@
+import os
+import sys
+import transaction
+
+from pyramid.paster import (
+    get_appsettings,
+    setup_logging,
+    )
+
+from pyramid.scripts.common import parse_vars
+
+from sqlalchemy import Text, bindparam, type_coerce
+from zope.sqlalchemy import mark_changed
+
+from artificer.models import (
+    configure_storage,
+    get_engine,
+    get_session_factory,
+    get_tm_session,
+    )
+
+from artificer.models import Artifact
+from artificer.models.storage import encode_definition
+
+
+def usage(argv):
+    cmd = os.path.basename(argv[0])
+    print('usage: %s <config_uri> [var=value]\n'
+          '(example: "%s development.ini artificer.storage_format=zlib")' % (cmd, cmd))
+    sys.exit(1)
+
+
+def main(argv=sys.argv):
+    if len(argv) < 2:
+        usage(argv)
+    config_uri = argv[1]
+    options = parse_vars(argv[2:])
+    setup_logging(config_uri)
+    settings = get_appsettings(config_uri, options=options)
+    storage_format = configure_storage(settings)
+
+    engine = get_engine(settings)
+    session_factory = get_session_factory(engine)
+
+    with transaction.manager:
+        db_session = get_tm_session(session_factory, transaction.manager)
+        count, before, after = convert_artifact_storage(db_session, storage_format)
+    print('Converted %d artifacts to %s storage' % (count, storage_format))
+    print('Stored definitions: %d bytes before, %d bytes after, %d bytes saved' % (before, after, before - after))
+
+
+def convert_artifact_storage(db_session, storage_format, batch_size=500):
+    """
+    Rewrites every stored artifact definition in storage_format.
+
+    Returns the number of rows rewritten and the total size in bytes of
+    the stored definitions before and after.
+    """
+    # The raw column bypasses the decoding done by StoredDefinition
+    raw_data = type_coerce(Artifact.data, Text)
+    artifacts = Artifact.__table__
+    update = artifacts.update().\
+        where(artifacts.c.id == bindparam('artifact_id')).\
+        values(data=type_coerce(bindparam('stored'), Text))
+
+    count = before = after = 0
+    last_id = 0
+    while True:
+        rows = db_session.query(Artifact.id, raw_data).\
+            filter(Artifact.id > last_id, Artifact.data.isnot(None)).\
+            order_by(Artifact.id).\
+            limit(batch_size).\
+            all()
+        if not rows:
+            break
+
+        changed = []
+        for artifact_id, stored in rows:
+            converted = encode_definition(stored, storage_format)
+            before += len(stored.encode('utf-8'))
+            after += len(converted.encode('utf-8'))
+            if converted != stored:
+                changed.append({'artifact_id': artifact_id, 'stored': converted})
+            last_id = artifact_id
+        if changed:
+            db_session.execute(update, changed)
+        count += len(changed)
+
+    mark_changed(db_session)
+    return count, before, after
+
+
+if __name__ == "__main__":
+    main()
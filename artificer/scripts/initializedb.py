@@ -9,17 +9,18 @@ from pyramid.paster import (
 
 from pyramid.scripts.common import parse_vars
 
-from artificer.models.meta import Base
 from artificer.models import (
+    configure_storage,
     get_engine,
     get_session_factory,
     get_tm_session,
     )
 
-from artificer.lib.artifacts import get_artifact, init_labels, init_sources, init_supported_os
+from artificer.lib.artifacts import import_artifacts, init_labels, init_sources, init_supported_os
 from artificer.models import User
 
-from artifacts import reader as fa_readers
+from artificer.lib.parsing import get_parse_workers, read_artifacts_directory
+from artificer.scripts.upgradedb import upgrade_schema
 
 def usage(argv):
     cmd = os.path.basename(argv[0])
@@ -35,9 +36,10 @@ def main(argv=sys.argv):
     options = parse_vars(argv[2:])
     setup_logging(config_uri)
     settings = get_appsettings(config_uri, options=options)
+    configure_storage(settings)
 
     engine = get_engine(settings)
-    Base.metadata.create_all(engine)
+    upgrade_schema(engine)
 
     session_factory = get_session_factory(engine)
 
@@ -47,26 +49,28 @@ def main(argv=sys.argv):
         init_supported_os(db_session)
         init_sources(db_session)
         init_admin(db_session)
-        init_artifacts(db_session)
+        results = init_artifacts(db_session, workers=get_parse_workers(settings))
+    print('Artifacts added: %d, changed: %d, unchanged: %d' % (
+        results['added'], results['changed'], results['unchanged']))
 
 
 def init_admin(db_session):
+    if db_session.query(User).filter_by(name='admin').count():
+        return
+
     password = ''
     # TODO prompt for password
     admin = User(name='admin', fullname='admin', password=password)
     db_session.add(admin)
 
 
-def init_artifacts(db_session, artifact_path=None):
+def init_artifacts(db_session, artifact_path=None, workers=1):
     # TODO handle alternate artifact_path options
     if not artifact_path:
         artifact_path = os.path.join(sys.prefix, 'share/artifacts')
 
-    artifact_reader = fa_readers.YamlArtifactsReader()
-
-    for forensic_artifact in artifact_reader.ReadDirectory(artifact_path, extension='yaml'):
-        artifact = get_artifact(db_session, forensic_artifact, author='admin', replace=True)
-        db_session.add(artifact)
+    return import_artifacts(db_session, read_artifacts_directory(artifact_path, extension='yaml', workers=workers),
+                            author='admin', replace=True)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,259 @@
+import json
+import os
+import sys
+import transaction
+
+from pyramid.paster import (
+    get_appsettings,
+    setup_logging,
+    )
+
+from pyramid.scripts.common import parse_vars
+
+from sqlalchemy import bindparam, inspect, literal, select, text
+from zope.sqlalchemy import mark_changed
+
+from artificer.models.meta import Base
+from artificer.models import (
+    configure_storage,
+    get_engine,
+    get_session_factory,
+    get_tm_session,
+    )
+
+from artificer.lib.artifacts import (
+    format_artifact_json,
+    format_artifact_yaml,
+    hash_artifact_definition,
+    read_forensic_artifact,
+    )
+from artificer.lib.attributes import source_attribute_rows
+from artificer.lib.groups import group_member_rows
+from artificer.lib.paths import source_path_rows
+from artificer.lib.search import fts_available, search_document
+from artificer.models import Artifact, ArtifactChange, ArtifactSearch, GroupMember, SourceAttribute, SourcePath
+
+
+def usage(argv):
+    cmd = os.path.basename(argv[0])
+    print('usage: %s <config_uri> [var=value]\n'
+          '(example: "%s development.ini")' % (cmd, cmd))
+    sys.exit(1)
+
+
+def main(argv=sys.argv):
+    if len(argv) < 2:
+        usage(argv)
+    config_uri = argv[1]
+    options = parse_vars(argv[2:])
+    setup_logging(config_uri)
+    settings = get_appsettings(config_uri, options=options)
+    configure_storage(settings)
+
+    engine = get_engine(settings)
+    upgrade_schema(engine)
+
+    session_factory = get_session_factory(engine)
+
+    with transaction.manager:
+        db_session = get_tm_session(session_factory, transaction.manager)
+        change_count = seed_artifact_changes(db_session)
+        canonical_count = canonicalize_artifact_data(db_session)
+        yaml_count = backfill_artifact_yaml(db_session)
+        search_count = backfill_artifact_search(db_session)
+        path_count = rebuild_source_paths(db_session)
+        member_count = rebuild_group_members(db_session)
+        attribute_count = rebuild_source_attributes(db_session)
+    print('Logged %d existing artifacts as created' % change_count)
+    print('Canonicalized JSON for %d artifacts' % canonical_count)
+    print('Rendered YAML for %d artifacts' % yaml_count)
+    print('Indexed %d artifacts for search' % search_count)
+    print('Indexed %d source paths and keys' % path_count)
+    print('Indexed %d artifact group members' % member_count)
+    print('Indexed %d source attribute values' % attribute_count)
+
+
+def upgrade_schema(engine):
+    """
+    Bring an existing database up to the current models.
+
+    Missing tables are created, and columns and indexes that were added to
+    existing tables since the database was initialized are added in place.
+    """
+    Base.metadata.create_all(engine)
+    inspector = inspect(engine)
+
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            column_names = set(column['name'] for column in inspector.get_columns(table.name))
+            for column in table.columns:
+                if column.name not in column_names:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    connection.execute(text('ALTER TABLE %s ADD COLUMN %s %s' % (table.name, column.name, column_type)))
+
+            index_names = set(index['name'] for index in inspector.get_indexes(table.name))
+            for index in table.indexes:
+                if index.name not in index_names:
+                    index.create(connection)
+
+
+def canonicalize_artifact_data(db_session, batch_size=500):
+    """
+    Rewrites every stored definition that is not in canonical JSON form or lacks its content hash.
+
+    Rows are rewritten with Core statements, so re-serialising a definition
+    is not logged as a change to the artifact.
+    """
+    artifacts_table = Artifact.__table__
+    canonicalize = artifacts_table.update().\
+        where(artifacts_table.c.id == bindparam('artifact_id')).\
+        values(data=bindparam('artifact_data'), data_hash=bindparam('artifact_data_hash'))
+    count = 0
+    after = 0
+    while True:
+        artifacts = db_session.query(Artifact.id, Artifact.data, Artifact.data_hash).\
+            filter(Artifact.id > after).\
+            order_by(Artifact.id).\
+            limit(batch_size).\
+            all()
+        if not artifacts:
+            break
+
+        rows = []
+        for artifact in artifacts:
+            artifact_definition = format_artifact_json(read_forensic_artifact(artifact))
+            data_hash = hash_artifact_definition(artifact_definition)
+            if artifact.data != artifact_definition or artifact.data_hash != data_hash:
+                rows.append({'artifact_id': artifact.id,
+                             'artifact_data': artifact_definition,
+                             'artifact_data_hash': data_hash})
+            after = artifact.id
+        if rows:
+            db_session.execute(canonicalize, rows)
+        count += len(rows)
+
+    mark_changed(db_session)
+    return count
+
+
+def backfill_artifact_yaml(db_session, batch_size=500):
+    """Stores the YAML rendering of every artifact that does not have one yet, without logging changes."""
+    artifacts_table = Artifact.__table__
+    backfill = artifacts_table.update().\
+        where(artifacts_table.c.id == bindparam('artifact_id')).\
+        values(yaml_data=bindparam('artifact_yaml'))
+    count = 0
+    after = 0
+    while True:
+        artifacts = db_session.query(Artifact.id, Artifact.data).\
+            filter(Artifact.id > after, Artifact.yaml_data.is_(None)).\
+            order_by(Artifact.id).\
+            limit(batch_size).\
+            all()
+        if not artifacts:
+            break
+
+        rows = []
+        for artifact in artifacts:
+            rows.append({'artifact_id': artifact.id,
+                         'artifact_yaml': format_artifact_yaml(read_forensic_artifact(artifact))})
+            after = artifact.id
+        db_session.execute(backfill, rows)
+        count += len(rows)
+
+    mark_changed(db_session)
+    return count
+
+
+def backfill_artifact_search(db_session, batch_size=500):
+    """
+    Adds the search rows of artifacts that do not have one and rebuilds the full-text index.
+
+    Rows are inserted with Core statements, so indexing an artifact is not
+    logged as a change to it.
+    """
+    count = 0
+    after = 0
+    while True:
+        artifacts = db_session.query(Artifact.id, Artifact.data).\
+            outerjoin(Artifact.search).\
+            filter(Artifact.id > after, ArtifactSearch.artifact_id.is_(None)).\
+            order_by(Artifact.id).\
+            limit(batch_size).\
+            all()
+        if not artifacts:
+            break
+
+        rows = []
+        for artifact in artifacts:
+            rows.append(dict(search_document(json.loads(artifact.data)), artifact_id=artifact.id))
+            after = artifact.id
+        db_session.execute(ArtifactSearch.__table__.insert(), rows)
+        count += len(rows)
+
+    if fts_available(db_session):
+        db_session.execute(text("INSERT INTO artifact_fts(artifact_fts) VALUES ('rebuild')"))
+    mark_changed(db_session)
+    return count
+
+
+def seed_artifact_changes(db_session):
+    """Logs every artifact as created when the change log is still empty.
+
+    This gives clients of the change feed a starting point that covers the
+    artifacts stored before the change log existed. It must run before
+    anything else that writes artifacts.
+    """
+    if db_session.query(ArtifactChange.seq).first() is not None:
+        return 0
+
+    artifacts = select([Artifact.id, Artifact.name, literal(ArtifactChange.CREATED)]).order_by(Artifact.id)
+    result = db_session.execute(ArtifactChange.__table__.insert().
+                                from_select(['artifact_id', 'name', 'action'], artifacts))
+    mark_changed(db_session)
+    return result.rowcount
+
+
+def _rebuild_index(db_session, table, index_rows, batch_size):
+    db_session.execute(table.delete())
+
+    count = 0
+    after = 0
+    while True:
+        artifacts = db_session.query(Artifact.id, Artifact.data).\
+            filter(Artifact.id > after).\
+            order_by(Artifact.id).\
+            limit(batch_size).\
+            all()
+        if not artifacts:
+            break
+
+        rows = []
+        for artifact_id, artifact_definition in artifacts:
+            rows.extend(dict(row, artifact_id=artifact_id)
+                        for row in index_rows(json.loads(artifact_definition)))
+            after = artifact_id
+        if rows:
+            db_session.execute(table.insert(), rows)
+        count += len(rows)
+
+    mark_changed(db_session)
+    return count
+
+
+def rebuild_source_paths(db_session, batch_size=500):
+    """Rebuilds the path and registry key index of every artifact."""
+    return _rebuild_index(db_session, SourcePath.__table__, source_path_rows, batch_size)
+
+
+def rebuild_group_members(db_session, batch_size=500):
+    """Rebuilds the ARTIFACT_GROUP member edges of every artifact."""
+    return _rebuild_index(db_session, GroupMember.__table__, group_member_rows, batch_size)
+
+
+def rebuild_source_attributes(db_session, batch_size=500):
+    """Rebuilds the source attribute index of every artifact."""
+    return _rebuild_index(db_session, SourceAttribute.__table__, source_attribute_rows, batch_size)
+
+if __name__ == "__main__":
+    main()
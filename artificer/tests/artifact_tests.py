@@ -1,4 +1,18 @@
-from artificer.tests.base_tests import BaseTest
+import json
+
+from artificer.tests.base_tests import BaseTest, QueryCounter
+
+
+def make_forensic_artifacts(count, prefix='BulkArtifact'):
+    from artifacts import reader
+    artifact_reader = reader.ArtifactsReader()
+    return [artifact_reader.ReadArtifactDefinitionValues({
+        'name': '%s%d' % (prefix, index),
+        'doc': 'This artifact is for testing',
+        'sources': [{'type': 'FILE', 'attributes': {'paths': ['/tmp/%d' % index]}}],
+        'supported_os': ['Linux'],
+        'labels': ['Logs', 'Software'],
+    }) for index in range(count)]
 
 class TestArtifacts(BaseTest):
 
@@ -17,6 +31,21 @@ class TestArtifacts(BaseTest):
         self.assertEqual(artifact.name, 'TestArtifact1')
         self.assertEqual(artifact.author.name, 'admin')
 
+    def test_artifact_yaml_stored(self):
+        from artificer.models import Artifact
+        from artifacts import reader
+        artifact_reader = reader.YamlArtifactsReader()
+        artifact = self.db_session.query(Artifact).filter_by(name='TestArtifact1').one()
+        forensic_artifacts = list(artifact_reader.ReadFileObject(artifact.yaml_data))
+        self.assertEqual(len(forensic_artifacts), 1)
+        self.assertEqual(forensic_artifacts[0].AsDict(), json.loads(artifact.data))
+
+    def test_artifact_hash_stored(self):
+        from artificer.lib.artifacts import hash_artifact_definition
+        from artificer.models import Artifact
+        artifact = self.db_session.query(Artifact).filter_by(name='TestArtifact1').one()
+        self.assertEqual(artifact.data_hash, hash_artifact_definition(artifact.data))
+
     def test_delete_artifact(self):
         from artificer.models import Artifact
         artifact = self.db_session.query(Artifact).filter_by(name='TestArtifact1').one()
@@ -58,3 +87,72 @@ class TestArtifacts(BaseTest):
         artifact.author = author
         artifact = self.db_session.query(Artifact).filter_by(name='TestArtifact1').one()
         self.assertEqual(artifact.author.name, 'user')
+
+
+class TestImportArtifacts(BaseTest):
+
+    def setUp(self):
+        super(TestImportArtifacts, self).setUp()
+        self.init_database()
+        self.db_session.flush()
+
+    def test_import_artifacts(self):
+        from artificer.lib.artifacts import import_artifacts
+        from artificer.models import Artifact
+        results = import_artifacts(self.db_session, make_forensic_artifacts(3), author='user')
+        self.assertEqual(len(results['ids']), 3)
+        self.assertEqual(results['failed'], [])
+        self.assertEqual(results['added'], 3)
+        artifact = self.db_session.query(Artifact).filter_by(id=results['ids'][1]).one()
+        self.assertEqual(artifact.name, 'BulkArtifact1')
+        self.assertEqual(artifact.author.name, 'user')
+        self.assertCountEqual([label.name for label in artifact.labels], ['Logs', 'Software'])
+        self.assertEqual([source.type for source in artifact.sources], ['FILE'])
+        self.assertEqual([supported_os.name for supported_os in artifact.supported_os], ['Linux'])
+
+    def test_import_artifacts_replace(self):
+        from artificer.lib.artifacts import import_artifacts
+        from artificer.models import Artifact
+        from artifacts import reader
+        artifact_reader = reader.YamlArtifactsReader()
+        forensic_artifacts = list(artifact_reader.ReadFile('test_data/test_artifacts_admin.yaml'))
+        results = import_artifacts(self.db_session, forensic_artifacts, author='user')
+        self.assertEqual(results['ids'], [])
+        self.assertEqual(results['failed'], ['TestArtifact1', 'TestArtifact2'])
+
+        results = import_artifacts(self.db_session, forensic_artifacts, author='user', replace=True)
+        self.assertEqual(results['failed'], [])
+        self.assertEqual(results['changed'], 2)
+        artifacts = self.db_session.query(Artifact).filter(Artifact.id.in_(results['ids'])).order_by(Artifact.id)
+        self.assertEqual([artifact.name for artifact in artifacts], ['TestArtifact1', 'TestArtifact2'])
+        self.assertEqual([artifact.author.name for artifact in artifacts], ['user', 'user'])
+        self.assertEqual(self.db_session.query(Artifact).count(), 3)
+
+    def test_import_artifacts_unchanged(self):
+        from artificer.lib.artifacts import import_artifacts
+        from artificer.models import Artifact
+        from artifacts import reader
+        artifact_reader = reader.YamlArtifactsReader()
+        forensic_artifacts = list(artifact_reader.ReadFile('test_data/test_artifacts_admin.yaml'))
+        forensic_artifacts.extend(artifact_reader.ReadFile('test_data/test_artifacts_user.yaml'))
+        forensic_artifacts[0].description = 'This artifact has changed'
+        forensic_artifacts.extend(make_forensic_artifacts(1))
+        artifact = self.db_session.query(Artifact).filter_by(name=forensic_artifacts[1].name).one()
+        data_hash = artifact.data_hash
+
+        results = import_artifacts(self.db_session, forensic_artifacts, author='admin', replace=True)
+        self.assertEqual((results['added'], results['changed'], results['unchanged']), (1, 2, 1))
+        self.assertEqual(len(results['ids']), 4)
+        artifact = self.db_session.query(Artifact).filter_by(name=forensic_artifacts[1].name).one()
+        self.assertEqual(artifact.data_hash, data_hash)
+
+        results = import_artifacts(self.db_session, forensic_artifacts, author='admin', replace=True)
+        self.assertEqual((results['added'], results['changed'], results['unchanged']), (0, 0, 4))
+
+    def test_import_artifacts_query_count(self):
+        from artificer.lib.artifacts import import_artifacts
+        with QueryCounter(self.engine) as small_import:
+            import_artifacts(self.db_session, make_forensic_artifacts(5, 'Small'), author='admin')
+        with QueryCounter(self.engine) as large_import:
+            import_artifacts(self.db_session, make_forensic_artifacts(50, 'Large'), author='admin')
+        self.assertEqual(small_import.count, large_import.count)
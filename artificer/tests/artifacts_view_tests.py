@@ -1,4 +1,4 @@
-from artificer.tests.base_tests import BaseTest, ArtifactFileUpload
+from artificer.tests.base_tests import BaseTest, ArtifactFileUpload, QueryCounter
 
 from pyramid import testing
 from webob.multidict import MultiDict
@@ -8,9 +8,11 @@ import artifacts.source_type as fa_sources
 import artifacts.reader as fa_readers
 import artifacts.artifact as fa_artifact
 
+import json
+import transaction
 import pyramid.exceptions
 
-from artificer.models import Artifact
+from artificer.models import Artifact, get_session_factory
 import artificer.views.artifacts as artifact_views
 
 TEST_ARTIFACT = {"urls": ["https://www.github.com/"],
@@ -41,6 +43,66 @@ class TestArtifactsView(BaseTest):
         artifact_names = [artifact['name'] for artifact in results['artifacts']]
         self.assertCountEqual(artifact_names, ['TestArtifact1', 'TestArtifact2', 'TestArtifact3'])
 
+    def test_list_artifacts_query_count(self):
+        from artificer.lib.artifacts import get_artifact
+        self.db_session.flush()
+        self.db_session.expire_all()
+        with QueryCounter(self.engine) as small_catalog:
+            artifact_views.artifacts_view(dummy_request(self.db_session))
+
+        artifact_reader = fa_readers.YamlArtifactsReader()
+        for forensic_artifact in artifact_reader.ReadFile('test_data/test_artifacts_import.upload'):
+            self.db_session.add(get_artifact(self.db_session, forensic_artifact, author='user'))
+        self.db_session.flush()
+        self.db_session.expire_all()
+        with QueryCounter(self.engine) as large_catalog:
+            results = artifact_views.artifacts_view(dummy_request(self.db_session))
+
+        self.assertEqual(len(results['artifacts']), 4)
+        self.assertEqual(small_catalog.count, large_catalog.count)
+        self.assertLessEqual(large_catalog.count, 4)
+
+    def test_list_paged_artifacts(self):
+        test_request = dummy_request(self.db_session)
+        test_request.params.add('limit', '2')
+        results = artifact_views.artifacts_view(test_request)
+        self.assertEqual([artifact['name'] for artifact in results['artifacts']], ['TestArtifact1', 'TestArtifact2'])
+        self.assertEqual(results['next'], results['artifacts'][-1]['id'])
+
+        test_request = dummy_request(self.db_session)
+        test_request.params.add('limit', '2')
+        test_request.params.add('after', str(results['next']))
+        results = artifact_views.artifacts_view(test_request)
+        self.assertEqual([artifact['name'] for artifact in results['artifacts']], ['TestArtifact3'])
+        self.assertIsNone(results['next'])
+
+    def test_list_paged_artifacts_invalid_failure(self):
+        test_request = dummy_request(self.db_session)
+        test_request.params.add('limit', 'all')
+        response = artifact_views.artifacts_view(test_request)
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.text, artifact_views.invalid_page_err_msg)
+
+    def test_stream_artifacts(self):
+        transaction.commit()
+        self.config.registry['dbsession_factory'] = get_session_factory(self.engine)
+        self.config.registry.settings['artificer.stream_page_size'] = '2'
+        test_request = dummy_request(self.db_session)
+        test_request.params.add('stream', 'true')
+        test_request.params.add('labels', 'Software')
+        response = artifact_views.artifacts_view(test_request)
+        chunks = list(response.app_iter)
+        self.assertEqual(len(chunks), 3)
+        results = json.loads(b''.join(chunks).decode('utf-8'))
+        artifact_names = [artifact['name'] for artifact in results['artifacts']]
+        self.assertEqual(artifact_names, ['TestArtifact1', 'TestArtifact3'])
+
+        test_request = dummy_request(self.db_session)
+        test_request.params.add('stream', 'true')
+        response = artifact_views.artifacts_view(test_request)
+        results = json.loads(response.text)
+        artifact_names = [artifact['name'] for artifact in results['artifacts']]
+        self.assertEqual(artifact_names, ['TestArtifact1', 'TestArtifact2', 'TestArtifact3'])
 
     def test_list_labeled_artifacts(self):
         test_request = dummy_request(self.db_session)
@@ -121,6 +183,16 @@ class TestLabelsView(BaseTest):
             if label['name'] == 'Software':
                 self.assertEqual(len(label['artifacts']), 2)
 
+    def test_count_all_labels(self):
+        test_request = dummy_request(self.db_session)
+        test_request.params.add('expand', 'false')
+        results = artifact_views.labels_view(test_request)
+        self.assertEqual(len(results['labels']), len(fa_definitions.LABELS))
+        counts = dict((label['name'], label['count']) for label in results['labels'])
+        self.assertEqual(counts['Configuration Files'], 1)
+        self.assertEqual(counts['Software'], 2)
+        self.assertEqual(counts['Browser'], 0)
+
 
 class TestSupportedOSView(BaseTest):
 
@@ -171,6 +243,18 @@ class TestAuthorsView(BaseTest):
             if author['name'] == 'user':
                 self.assertEqual(len(author['artifacts']), 1)
 
+    def test_list_all_authors_query_count(self):
+        self.db_session.flush()
+        with QueryCounter(self.engine) as counter:
+            artifact_views.authors_view(dummy_request(self.db_session))
+        self.assertEqual(counter.count, 1)
+
+    def test_count_all_authors(self):
+        test_request = dummy_request(self.db_session)
+        test_request.params.add('expand', 'false')
+        results = artifact_views.authors_view(test_request)
+        self.assertEqual(results['authors'], [{'name': 'admin', 'count': 2}, {'name': 'user', 'count': 1}])
+
 
 class TestArtifactView(BaseTest):
 
@@ -183,8 +267,10 @@ class TestArtifactView(BaseTest):
         test_request = dummy_request(self.db_session)
         test_request.matchdict['id'] = artifact.id
         response = artifact_views.artifact_view(test_request)
-        print(response)
-        self.assertEqual(response['name'], 'TestArtifact1')
+        self.assertEqual(response.content_type, 'application/json')
+        self.assertEqual(response.json['name'], 'TestArtifact1')
+        self.assertEqual(response.body, artifact.data.encode('utf-8'))
+        self.assertEqual(response.text, json.dumps(response.json, sort_keys=True, separators=(',', ':')))
 
     def test_view_artifact_failure(self):
         test_request = dummy_request(self.db_session)
@@ -193,6 +279,145 @@ class TestArtifactView(BaseTest):
             artifact_views.artifact_view(test_request)
 
 
+class TestArtifactBatchView(BaseTest):
+
+    def setUp(self):
+        super(TestArtifactBatchView, self).setUp()
+        self.init_database()
+        self.db_session.flush()
+
+    def test_batch_artifacts(self):
+        test_request = dummy_request(self.db_session)
+        for artifact_id in ('3', '1', '100', 'x', '3'):
+            test_request.params.add('id', artifact_id)
+        for name in ('TestArtifact2', 'TestArtifact1', 'Missing'):
+            test_request.params.add('name', name)
+        with QueryCounter(self.engine) as counter:
+            response = artifact_views.artifact_batch_view(test_request)
+        self.assertEqual(counter.count, 1)
+        self.assertEqual(response.content_type, 'application/json')
+        self.assertEqual([artifact['name'] for artifact in response.json['artifacts']],
+                         ['TestArtifact3', 'TestArtifact1', 'TestArtifact2'])
+        self.assertEqual(response.json['missing_ids'], ['x', 100])
+        self.assertEqual(response.json['missing_names'], ['Missing'])
+
+    def test_batch_missing_params_failure(self):
+        response = artifact_views.artifact_batch_view(dummy_request(self.db_session))
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.text, artifact_views.missing_batch_err_msg)
+
+    def test_batch_size_failure(self):
+        self.config.registry.settings['artificer.batch_max'] = '2'
+        test_request = dummy_request(self.db_session)
+        for artifact_id in ('1', '2', '3'):
+            test_request.params.add('id', artifact_id)
+        response = artifact_views.artifact_batch_view(test_request)
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.text, artifact_views.batch_size_err_msg % 2)
+
+
+class TestArtifactsBulk(BaseTest):
+
+    def setUp(self):
+        super(TestArtifactsBulk, self).setUp()
+        self.init_database()
+        self.db_session.flush()
+
+    def artifact_names(self):
+        return [name for name, in self.db_session.query(Artifact.name).order_by(Artifact.id)]
+
+    def bulk_delete(self, artifact_ids, partial=False):
+        test_request = dummy_request(self.db_session)
+        for artifact_id in artifact_ids:
+            test_request.params.add('id', str(artifact_id))
+        if partial:
+            test_request.params['partial'] = 'true'
+        return artifact_views.artifacts_bulk_delete(test_request), test_request.response
+
+    def bulk_update(self, items, partial=False):
+        test_request = dummy_request(self.db_session)
+        test_request.params['artifacts'] = json.dumps(items)
+        if partial:
+            test_request.params['partial'] = 'true'
+        return artifact_views.artifacts_bulk_update(test_request), test_request.response
+
+    def test_bulk_delete(self):
+        with QueryCounter(self.engine) as counter:
+            results, response = self.bulk_delete([1, 3])
+        self.assertEqual(results, {'applied': True, 'results': [{'id': 1, 'status': 'deleted'},
+                                                                 {'id': 3, 'status': 'deleted'}]})
+        self.assertEqual(self.artifact_names(), ['TestArtifact2'])
+        self.assertLess(counter.count, 15)
+
+    def test_bulk_delete_atomic(self):
+        results, response = self.bulk_delete([1, 100])
+        self.assertEqual(response.status_int, 409)
+        self.assertEqual(results['results'], [{'id': 1, 'status': 'skipped'}, {'id': 100, 'status': 'not_found'}])
+        self.assertEqual(self.artifact_names(), ['TestArtifact1', 'TestArtifact2', 'TestArtifact3'])
+
+    def test_bulk_delete_partial(self):
+        results, response = self.bulk_delete([1, 100], partial=True)
+        self.assertTrue(results['applied'])
+        self.assertEqual(results['results'], [{'id': 1, 'status': 'deleted'}, {'id': 100, 'status': 'not_found'}])
+        self.assertEqual(self.artifact_names(), ['TestArtifact2', 'TestArtifact3'])
+
+    def test_bulk_delete_partial_all_failed(self):
+        results, response = self.bulk_delete([100, 101], partial=True)
+        self.assertEqual(response.status_int, 200)
+        self.assertFalse(results['applied'])
+
+    def test_bulk_delete_invalid_id_failure(self):
+        response, _ = self.bulk_delete(['x'])
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.text, artifact_views.invalid_id_err_msg)
+
+    def test_bulk_update(self):
+        relabelled = json.loads(self.db_session.query(Artifact).get(1).data)
+        relabelled['labels'] = ['Logs']
+        results, response = self.bulk_update([{'id': 1, 'artifact_data': relabelled},
+                                              {'id': 3, 'artifact_data': TEST_ARTIFACT}])
+        self.assertEqual(results['results'], [{'id': 1, 'status': 'updated'}, {'id': 3, 'status': 'updated'}])
+        self.assertEqual(self.artifact_names(), ['TestArtifact1', 'TestArtifact2', 'TestArtifact4'])
+        artifact = self.db_session.query(Artifact).get(1)
+        self.assertEqual([label.name for label in artifact.labels], ['Logs'])
+        self.assertEqual(artifact.author.name, 'admin')
+
+    def test_bulk_update_atomic(self):
+        artifact_definition = json.loads(self.db_session.query(Artifact).get(1).data)
+        results, response = self.bulk_update([{'id': 3, 'artifact_data': TEST_ARTIFACT},
+                                              {'id': 2, 'artifact_data': artifact_definition},
+                                              {'id': 100, 'artifact_data': TEST_ARTIFACT},
+                                              {'id': 1, 'artifact_data': {'name': 'Invalid'}}])
+        self.assertEqual(response.status_int, 409)
+        self.assertEqual([status['status'] for status in results['results']],
+                         ['skipped', 'exists', 'not_found', 'invalid'])
+        self.assertEqual(self.artifact_names(), ['TestArtifact1', 'TestArtifact2', 'TestArtifact3'])
+
+    def test_bulk_update_partial(self):
+        artifact_definition = json.loads(self.db_session.query(Artifact).get(1).data)
+        results, response = self.bulk_update([{'id': 3, 'artifact_data': TEST_ARTIFACT},
+                                              {'id': 1, 'artifact_data': artifact_definition},
+                                              {'id': 2, 'artifact_data': artifact_definition}], partial=True)
+        self.assertEqual([status['status'] for status in results['results']], ['updated', 'unchanged', 'exists'])
+        self.assertTrue(results['applied'])
+        self.assertEqual(self.artifact_names(), ['TestArtifact1', 'TestArtifact2', 'TestArtifact4'])
+
+    def test_bulk_update_partial_all_failed(self):
+        artifact_definition = json.loads(self.db_session.query(Artifact).get(1).data)
+        results, response = self.bulk_update([{'id': 100, 'artifact_data': TEST_ARTIFACT},
+                                              {'id': 1, 'artifact_data': {'name': 'Invalid'}},
+                                              {'id': 2, 'artifact_data': artifact_definition}], partial=True)
+        self.assertEqual([status['status'] for status in results['results']], ['not_found', 'invalid', 'exists'])
+        self.assertEqual(response.status_int, 200)
+        self.assertFalse(results['applied'])
+        self.assertEqual(self.artifact_names(), ['TestArtifact1', 'TestArtifact2', 'TestArtifact3'])
+
+    def test_bulk_update_missing_artifacts_failure(self):
+        response, _ = self.bulk_update({'id': 1})
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.text, artifact_views.missing_bulk_artifacts_err_msg)
+
+
 class TestArtifactDelete(BaseTest):
 
     def setUp(self):
@@ -313,9 +538,32 @@ class TestArtifactsExportView(BaseTest):
         test_request.params.add('id', 1)
         test_request.params.add('id', 2)
         response = artifact_views.artifact_export_view(test_request)
-        for forensic_artifact in artifact_reader.ReadFileObject(response):
+        for forensic_artifact in artifact_reader.ReadFileObject(response.text):
             self.assertIsInstance(forensic_artifact, fa_artifact.ArtifactDefinition)
 
+    def test_export_artifacts_stored_yaml(self):
+        artifacts = self.db_session.query(Artifact).filter(Artifact.id.in_([1, 2])).order_by(Artifact.id)
+        test_request = dummy_request(self.db_session)
+        test_request.params.add('id', 1)
+        test_request.params.add('id', 2)
+        response = artifact_views.artifact_export_view(test_request)
+        self.assertEqual(response.text, '---\n'.join(artifact.yaml_data for artifact in artifacts))
+
+    def test_export_artifacts_batched(self):
+        transaction.commit()
+        self.config.registry['dbsession_factory'] = get_session_factory(self.engine)
+        self.config.registry.settings['artificer.export_batch_size'] = '2'
+        artifact_reader = fa_readers.YamlArtifactsReader()
+        test_request = dummy_request(self.db_session)
+        for artifact_id in (1, 2, 3, 100):
+            test_request.params.add('id', artifact_id)
+        response = artifact_views.artifact_export_view(test_request)
+        chunks = list(response.app_iter)
+        self.assertEqual(len(chunks), 3)
+        forensic_artifacts = list(artifact_reader.ReadFileObject(b''.join(chunks).decode('utf-8')))
+        artifact_names = [forensic_artifact.name for forensic_artifact in forensic_artifacts]
+        self.assertEqual(artifact_names, ['TestArtifact1', 'TestArtifact2', 'TestArtifact3'])
+
 
 class TestArtifactsImport(BaseTest):
     # TODO test bad/empty file failures
@@ -343,7 +591,7 @@ class TestArtifactsImport(BaseTest):
         upload = ArtifactFileUpload('test_data/test_artifacts_replace.upload')
         test_request = dummy_request(self.db_session)
         test_request.params.add('artifact_file', upload)
-        test_request.params.add('replace', True)
+        test_request.params.add('replace', 'true')
         response = artifact_views.artifact_import(test_request)
         self.assertEqual(response.status_code, 200)
         artifact = self.db_session.query(Artifact).filter_by(name="TestArtifact5").one()
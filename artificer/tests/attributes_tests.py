@@ -0,0 +1,101 @@
+from artificer.tests.base_tests import BaseTest
+from artificer.tests.artifacts_view_tests import dummy_request
+
+import artifacts.reader as fa_readers
+
+import artificer.views.artifacts as artifact_views
+from artificer.lib.artifacts import delete_artifacts, get_artifact, update_artifacts
+from artificer.lib.attributes import source_attribute_rows
+from artificer.models import Artifact, SourceAttribute
+
+ATTRIBUTE_ARTIFACTS = [
+    {"name": "WindowsRunKeys",
+     "doc": "Windows run keys",
+     "sources": [{"type": "REGISTRY_KEY",
+                  "attributes": {"keys": ["HKEY_LOCAL_MACHINE\\Software\\Microsoft\\Windows\\CurrentVersion\\Run",
+                                          "HKEY_USERS\\%%users.sid%%\\Software\\Microsoft\\Windows\\CurrentVersion\\Run"]}}],
+     "supported_os": ["Windows"]},
+    {"name": "WindowsServices",
+     "doc": "Windows services",
+     "sources": [{"type": "REGISTRY_VALUE",
+                  "attributes": {"key_value_pairs": [
+                      {"key": "HKEY_LOCAL_MACHINE\\System\\CurrentControlSet\\Services\\*", "value": "ImagePath"}]}}],
+     "supported_os": ["Windows"]},
+    {"name": "WindowsProcesses",
+     "doc": "Windows processes",
+     "sources": [{"type": "WMI", "attributes": {"query": "SELECT * FROM Win32_Process"}}],
+     "supported_os": ["Windows"]},
+]
+
+
+class TestSourceAttributeRows(BaseTest):
+
+    def test_source_attribute_rows(self):
+        rows = source_attribute_rows(ATTRIBUTE_ARTIFACTS[1])
+        self.assertEqual([(row['name'], row['value']) for row in rows], [
+            ('key_value_pairs.key', 'hkey_local_machine\\system\\currentcontrolset\\services\\*'),
+            ('key_value_pairs.value', 'imagepath')])
+        self.assertEqual(set(row['source_type'] for row in rows), set(['REGISTRY_VALUE']))
+
+
+class TestSourceAttributeFilter(BaseTest):
+
+    def setUp(self):
+        super(TestSourceAttributeFilter, self).setUp()
+        self.init_database()
+        self.artifact_reader = fa_readers.ArtifactsReader()
+        for artifact_definition in ATTRIBUTE_ARTIFACTS:
+            forensic_artifact = self.artifact_reader.ReadArtifactDefinitionValues(artifact_definition)
+            self.db_session.add(get_artifact(self.db_session, forensic_artifact, author='admin'))
+        self.db_session.flush()
+        self.ids = dict(self.db_session.query(Artifact.name, Artifact.id))
+
+    def select(self, *values, **params):
+        test_request = dummy_request(self.db_session)
+        for value in values:
+            test_request.params.add('source_attr', value)
+        for param, value in params.items():
+            test_request.params[param] = value
+        results = artifact_views.artifacts_view(test_request)
+        return [artifact['name'] for artifact in results['artifacts']]
+
+    def test_prefix_filter(self):
+        self.assertEqual(self.select('keys:HKEY_LOCAL_MACHINE\\SOFTWARE*'), ['WindowsRunKeys'])
+        self.assertEqual(self.select('keys:HKEY_LOCAL_MACHINE\\SYSTEM*'), [])
+        self.assertEqual(self.select('key_value_pairs.key:hkey_local_machine\\system\\*'), ['WindowsServices'])
+
+    def test_exact_filter(self):
+        self.assertEqual(self.select('query:select * from win32_process'), ['WindowsProcesses'])
+        self.assertEqual(self.select('key_value_pairs.value:ImagePath'), ['WindowsServices'])
+
+    def test_wildcards_and_escapes(self):
+        self.assertEqual(self.select('keys:*\\%%users.sid%%\\*'), ['WindowsRunKeys'])
+        self.assertEqual(self.select('keys:HKEY_USERS_*'), [])
+        self.assertEqual(self.select('query:select ? from win32_process'), ['WindowsProcesses'])
+
+    def test_filter_modes(self):
+        self.assertEqual(self.select('keys:HKEY_LOCAL_MACHINE\\Software*', 'query:*'),
+                         ['WindowsRunKeys', 'WindowsProcesses'])
+        self.assertEqual(self.select('keys:HKEY_LOCAL_MACHINE\\Software*', 'keys:HKEY_USERS*', source_attr_mode='all'),
+                         ['WindowsRunKeys'])
+        not_selected = self.select('keys:*', source_attr_mode='not')
+        self.assertNotIn('WindowsRunKeys', not_selected)
+        self.assertIn('WindowsProcesses', not_selected)
+
+    def test_attributes_follow_updates(self):
+        forensic_artifact = self.artifact_reader.ReadArtifactDefinitionValues(
+            dict(ATTRIBUTE_ARTIFACTS[2], sources=[{"type": "WMI", "attributes": {"query": "SELECT * FROM Win32_Service"}}]))
+        update_artifacts(self.db_session, [(self.ids['WindowsProcesses'], forensic_artifact)], 'admin')
+        self.assertEqual(self.select('query:*win32_process'), [])
+        self.assertEqual(self.select('query:*win32_service'), ['WindowsProcesses'])
+
+        delete_artifacts(self.db_session, [self.ids['WindowsProcesses']])
+        self.assertEqual(self.db_session.query(SourceAttribute).
+                         filter_by(artifact_id=self.ids['WindowsProcesses']).count(), 0)
+
+    def test_invalid_filter_failure(self):
+        test_request = dummy_request(self.db_session)
+        test_request.params.add('source_attr', 'keys')
+        response = artifact_views.artifacts_view(test_request)
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.text, artifact_views.invalid_source_attr_err_msg)
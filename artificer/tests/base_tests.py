@@ -8,6 +8,7 @@ except ImportError:
     from io import StringIO
 
 from pyramid import testing
+from sqlalchemy import event
 from artifacts import reader as fa_readers
 
 class BaseTest(unittest.TestCase):
@@ -29,6 +30,15 @@ class BaseTest(unittest.TestCase):
 
         self.db_session = get_tm_session(session_factory, transaction.manager)
 
+        from artificer.lib.vocabulary import vocabulary_cache
+        vocabulary_cache.invalidate()
+
+        from artificer.lib.facets import facet_engine
+        facet_engine.invalidate()
+
+        from artificer.lib.cache import result_cache
+        result_cache.clear()
+
     def init_database(self):
         from artificer.models.meta import Base
         from artificer.models import User
@@ -66,3 +76,21 @@ class ArtifactFileUpload(object):
             yaml_data = fd.read()
         self.filename = os.path.basename(filepath)
         self.file = StringIO(yaml_data)
+
+
+class QueryCounter(object):
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+        self.statements = []
+
+    def _count(self, conn, cursor, statement, *args, **kwargs):
+        self.count += 1
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._count)
+        return self
+
+    def __exit__(self, *args):
+        event.remove(self.engine, 'before_cursor_execute', self._count)
@@ -0,0 +1,117 @@
+import unittest
+
+import transaction
+
+from artificer.tests.base_tests import BaseTest, QueryCounter
+from artificer.tests.artifact_tests import make_forensic_artifacts
+from artificer.tests.artifacts_view_tests import dummy_request
+
+import artificer.views.artifacts as artifact_views
+from artificer.lib.artifacts import import_artifacts
+from artificer.lib.cache import ResultCache, result_cache
+from artificer.lib.catalog import get_catalog_generation
+from artificer.models import Artifact
+
+
+class TestResultCache(unittest.TestCase):
+
+    def test_lru_eviction(self):
+        cache = ResultCache(max_size=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.stats(), {'size': 2, 'max_size': 2, 'hits': 3, 'misses': 1})
+
+    def test_disabled(self):
+        cache = ResultCache(max_size=0)
+        cache.put('a', 1)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)
+
+
+class TestCatalogGeneration(BaseTest):
+
+    def setUp(self):
+        super(TestCatalogGeneration, self).setUp()
+        self.init_database()
+        transaction.commit()
+        self.generation = get_catalog_generation(self.db_session)
+
+    def test_bumped_once_per_transaction(self):
+        self.db_session.delete(self.db_session.query(Artifact).filter_by(name='TestArtifact1').one())
+        self.db_session.flush()
+        self.db_session.delete(self.db_session.query(Artifact).filter_by(name='TestArtifact2').one())
+        self.db_session.flush()
+        transaction.commit()
+        self.assertEqual(get_catalog_generation(self.db_session), self.generation + 1)
+
+    def test_bumped_by_import(self):
+        import_artifacts(self.db_session, make_forensic_artifacts(2), author='admin')
+        transaction.commit()
+        self.assertEqual(get_catalog_generation(self.db_session), self.generation + 1)
+
+    def test_unchanged_by_rollback(self):
+        self.db_session.delete(self.db_session.query(Artifact).filter_by(name='TestArtifact1').one())
+        self.db_session.flush()
+        transaction.abort()
+        self.assertEqual(get_catalog_generation(self.db_session), self.generation)
+
+    def test_bumped_after_abort(self):
+        # zope.sqlalchemy aborts by closing the session, without after_rollback
+        self.db_session.delete(self.db_session.query(Artifact).filter_by(name='TestArtifact1').one())
+        self.db_session.flush()
+        transaction.abort()
+        self.db_session.delete(self.db_session.query(Artifact).filter_by(name='TestArtifact2').one())
+        transaction.commit()
+        self.assertEqual(get_catalog_generation(self.db_session), self.generation + 1)
+
+    def test_unchanged_by_reads(self):
+        artifact_views.artifacts_view(dummy_request(self.db_session))
+        transaction.commit()
+        self.assertEqual(get_catalog_generation(self.db_session), self.generation)
+
+
+class TestCachedViews(BaseTest):
+
+    def setUp(self):
+        super(TestCachedViews, self).setUp()
+        self.init_database()
+        transaction.commit()
+
+    def list_names(self, *labels):
+        test_request = dummy_request(self.db_session)
+        for label in labels:
+            test_request.params.add('labels', label)
+        return [artifact['name'] for artifact in artifact_views.artifacts_view(test_request)['artifacts']]
+
+    def test_listing_cached(self):
+        self.assertEqual(self.list_names('Software'), ['TestArtifact1', 'TestArtifact3'])
+        with QueryCounter(self.engine) as counter:
+            self.assertEqual(self.list_names('Software', 'Software'), ['TestArtifact1', 'TestArtifact3'])
+        self.assertEqual(counter.count, 1)
+        self.assertEqual((result_cache.hits, result_cache.misses), (1, 1))
+
+    def test_listing_not_stale_after_commit(self):
+        self.assertEqual(self.list_names('Software'), ['TestArtifact1', 'TestArtifact3'])
+        self.db_session.delete(self.db_session.query(Artifact).filter_by(name='TestArtifact1').one())
+        self.db_session.flush()
+        # Uncommitted changes bypass the cache
+        self.assertEqual(self.list_names('Software'), ['TestArtifact3'])
+        transaction.commit()
+        self.assertEqual(self.list_names('Software'), ['TestArtifact3'])
+        self.assertEqual((result_cache.hits, result_cache.misses), (0, 2))
+
+    def test_facet_view_cached(self):
+        results = artifact_views.labels_view(dummy_request(self.db_session))
+        with QueryCounter(self.engine) as counter:
+            self.assertEqual(artifact_views.labels_view(dummy_request(self.db_session)), results)
+        self.assertEqual(counter.count, 1)
+
+        test_request = dummy_request(self.db_session)
+        test_request.params['expand'] = 'false'
+        self.assertNotEqual(artifact_views.labels_view(test_request), results)
+        self.assertEqual((result_cache.hits, result_cache.misses), (1, 2))
@@ -0,0 +1,102 @@
+import json
+
+import transaction
+
+from artificer.tests.base_tests import BaseTest, QueryCounter
+from artificer.tests.artifact_tests import make_forensic_artifacts
+from artificer.tests.artifacts_view_tests import dummy_request
+
+import artificer.views.artifacts as artifact_views
+from artificer.lib.artifacts import import_artifacts
+from artificer.models import Artifact, ArtifactChange
+
+
+class TestChangesView(BaseTest):
+
+    def setUp(self):
+        super(TestChangesView, self).setUp()
+        self.init_database()
+        transaction.commit()
+        self.since = self.db_session.query(ArtifactChange.seq).order_by(ArtifactChange.seq.desc()).first()[0]
+
+    def changes(self, since=None, limit=None):
+        test_request = dummy_request(self.db_session)
+        if since is not None:
+            test_request.params['since'] = str(since)
+        if limit is not None:
+            test_request.params['limit'] = str(limit)
+        return artifact_views.changes_view(test_request)
+
+    def test_initial_changes(self):
+        results = self.changes()
+        self.assertEqual([(change['name'], change['action']) for change in results['changes']],
+                         [('TestArtifact1', 'created'), ('TestArtifact2', 'created'), ('TestArtifact3', 'created')])
+        artifact = self.db_session.query(Artifact).filter_by(name='TestArtifact1').one()
+        self.assertEqual(results['changes'][0]['artifact'], json.loads(artifact.data))
+        self.assertEqual(results['next'], self.since)
+
+    def test_no_changes(self):
+        self.assertEqual(self.changes(self.since), {'changes': [], 'next': self.since})
+
+    def test_update_and_delete(self):
+        test_request = dummy_request(self.db_session)
+        test_request.matchdict['id'] = 3
+        artifact_views.artifact_delete(test_request)
+        artifact = self.db_session.query(Artifact).filter_by(name='TestArtifact1').one()
+        artifact.data_hash = None
+        transaction.commit()
+
+        changes = self.changes(self.since)['changes']
+        self.assertEqual([(change['id'], change['action']) for change in changes], [(3, 'deleted'), (1, 'updated')])
+        self.assertIsNone(changes[0]['artifact'])
+        self.assertEqual(changes[1]['artifact']['name'], 'TestArtifact1')
+
+    def test_latest_change_only(self):
+        artifact = self.db_session.query(Artifact).filter_by(name='TestArtifact2').one()
+        artifact.data_hash = None
+        transaction.commit()
+        self.db_session.delete(self.db_session.query(Artifact).filter_by(name='TestArtifact2').one())
+        transaction.commit()
+        changes = self.changes()['changes']
+        self.assertEqual([(change['name'], change['action']) for change in changes],
+                         [('TestArtifact1', 'created'), ('TestArtifact3', 'created'), ('TestArtifact2', 'deleted')])
+
+    def test_changes_after_abort(self):
+        artifact = self.db_session.query(Artifact).filter_by(name='TestArtifact2').one()
+        artifact.data_hash = None
+        self.db_session.flush()
+        transaction.abort()
+        artifact = self.db_session.query(Artifact).filter_by(name='TestArtifact2').one()
+        artifact.data_hash = None
+        transaction.commit()
+        changes = self.changes(self.since)['changes']
+        self.assertEqual([(change['name'], change['action']) for change in changes], [('TestArtifact2', 'updated')])
+
+    def test_import_changes(self):
+        import_artifacts(self.db_session, make_forensic_artifacts(3), author='admin')
+        transaction.commit()
+        import_artifacts(self.db_session, make_forensic_artifacts(2), author='user', replace=True)
+        transaction.commit()
+        changes = self.changes(self.since)['changes']
+        self.assertEqual([(change['name'], change['action']) for change in changes],
+                         [('BulkArtifact2', 'created'), ('BulkArtifact0', 'updated'), ('BulkArtifact1', 'updated')])
+
+    def test_paging(self):
+        import_artifacts(self.db_session, make_forensic_artifacts(5), author='admin')
+        transaction.commit()
+        names = []
+        since = self.since
+        while True:
+            with QueryCounter(self.engine) as counter:
+                results = self.changes(since, limit=2)
+            self.assertEqual(counter.count, 1)
+            if not results['changes']:
+                break
+            names.extend(change['name'] for change in results['changes'])
+            since = results['next']
+        self.assertEqual(names, ['BulkArtifact%d' % index for index in range(5)])
+
+    def test_invalid_since_failure(self):
+        response = self.changes(since=-1)
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.text, artifact_views.invalid_since_err_msg)
@@ -0,0 +1,114 @@
+import transaction
+
+from artificer.tests.base_tests import BaseTest, QueryCounter
+from artificer.tests.artifacts_view_tests import dummy_request
+
+import artificer.views.artifacts as artifact_views
+from artificer.models import Artifact
+
+
+class TestConditionalGet(BaseTest):
+
+    def setUp(self):
+        super(TestConditionalGet, self).setUp()
+        self.init_database()
+        transaction.commit()
+
+    def conditional_request(self, response, **params):
+        test_request = dummy_request(self.db_session)
+        test_request.headers['If-None-Match'] = response.headers['ETag']
+        for key, value in params.items():
+            test_request.params[key] = value
+        return test_request
+
+    def test_artifact_not_modified(self):
+        artifact = self.db_session.query(Artifact).filter_by(name='TestArtifact1').one()
+        test_request = dummy_request(self.db_session)
+        test_request.matchdict['id'] = artifact.id
+        response = artifact_views.artifact_view(test_request)
+        self.assertEqual(response.etag, artifact.data_hash)
+
+        test_request = self.conditional_request(response)
+        test_request.matchdict['id'] = artifact.id
+        with QueryCounter(self.engine) as counter:
+            response = artifact_views.artifact_view(test_request)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.body, b'')
+        self.assertEqual(counter.count, 1)
+        self.assertNotRegex(counter.statements[0], r'artifacts\.data\b')
+
+    def test_artifact_single_query(self):
+        test_request = dummy_request(self.db_session)
+        test_request.matchdict['id'] = 1
+        with QueryCounter(self.engine) as counter:
+            response = artifact_views.artifact_view(test_request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(counter.count, 1)
+
+    def test_artifact_not_modified_weak_tag(self):
+        artifact = self.db_session.query(Artifact).filter_by(name='TestArtifact1').one()
+        test_request = dummy_request(self.db_session)
+        test_request.matchdict['id'] = artifact.id
+        test_request.headers['If-None-Match'] = '"other", W/"%s"' % artifact.data_hash
+        response = artifact_views.artifact_view(test_request)
+        self.assertEqual(response.status_code, 304)
+
+    def test_artifact_modified(self):
+        test_request = dummy_request(self.db_session)
+        test_request.matchdict['id'] = 2
+        response = artifact_views.artifact_view(test_request)
+
+        test_request = self.conditional_request(response)
+        test_request.matchdict['id'] = 1
+        response = artifact_views.artifact_view(test_request)
+        self.assertEqual(response.status_code, 200)
+
+    def test_export_not_modified(self):
+        test_request = dummy_request(self.db_session)
+        test_request.params.add('id', 1)
+        test_request.params.add('id', 2)
+        response = artifact_views.artifact_export_view(test_request)
+
+        test_request = self.conditional_request(response)
+        test_request.params.add('id', 2)
+        test_request.params.add('id', 1)
+        with QueryCounter(self.engine) as counter:
+            response = artifact_views.artifact_export_view(test_request)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(counter.count, 1)
+
+        test_request = self.conditional_request(response, id='1')
+        response = artifact_views.artifact_export_view(test_request)
+        self.assertEqual(response.status_code, 200)
+
+    def test_listing_not_modified(self):
+        test_request = dummy_request(self.db_session)
+        test_request.params['labels'] = 'Software'
+        artifact_views.artifacts_view(test_request)
+        response = test_request.response
+
+        test_request = self.conditional_request(response, labels='Software')
+        with QueryCounter(self.engine) as counter:
+            response = artifact_views.artifacts_view(test_request)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(counter.count, 1)
+
+        # Other filters and later catalog generations have other tags
+        test_request = self.conditional_request(response, labels='Logs')
+        self.assertIsInstance(artifact_views.artifacts_view(test_request), dict)
+
+        self.db_session.delete(self.db_session.query(Artifact).filter_by(name='TestArtifact1').one())
+        transaction.commit()
+        test_request = self.conditional_request(response, labels='Software')
+        results = artifact_views.artifacts_view(test_request)
+        self.assertEqual([artifact['name'] for artifact in results['artifacts']], ['TestArtifact3'])
+        self.assertNotEqual(test_request.response.etag, response.etag)
+
+    def test_facet_not_modified(self):
+        test_request = dummy_request(self.db_session)
+        artifact_views.labels_view(test_request)
+
+        response = test_request.response
+        self.assertEqual(artifact_views.labels_view(self.conditional_request(response)).status_code, 304)
+        self.assertIsInstance(artifact_views.labels_view(self.conditional_request(response, expand='false')), dict)
+        self.assertIsInstance(artifact_views.sources_view(self.conditional_request(response)), dict)
@@ -0,0 +1,106 @@
+import json
+import socket
+
+import transaction
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+from artificer.tests.base_tests import BaseTest
+from artificer.tests.artifacts_view_tests import dummy_request
+
+import artificer.views.artifacts as artifact_views
+from artificer.lib import events
+from artificer.lib.events import EventBroadcaster, _parse_since
+from artificer.models import Artifact, get_session_factory, get_tm_session
+
+
+class TestParseSince(BaseTest):
+
+    def test_parse_since(self):
+        self.assertIsNone(_parse_since(b'GET /events HTTP/1.1\r\nHost: x\r\n\r\n'))
+        self.assertEqual(_parse_since(b'GET /events?since=4 HTTP/1.1\r\nLast-Event-ID: 2\r\n\r\n'), 4)
+        self.assertEqual(_parse_since(b'GET /events HTTP/1.1\r\nlast-event-id: 2\r\n\r\n'), 2)
+        with self.assertRaises(ValueError):
+            _parse_since(b'POST /events HTTP/1.1\r\n\r\n')
+        with self.assertRaises(ValueError):
+            _parse_since(b'GET /events?since=-1 HTTP/1.1\r\n\r\n')
+
+
+class TestEventBroadcaster(BaseTest):
+
+    def setUp(self):
+        super(TestEventBroadcaster, self).setUp()
+        # The broadcaster reads from its own threads, so share one connection
+        self.engine = create_engine('sqlite://', poolclass=StaticPool, connect_args={'check_same_thread': False})
+        self.session_factory = get_session_factory(self.engine)
+        self.db_session = get_tm_session(self.session_factory, transaction.manager)
+        self.init_database()
+        transaction.commit()
+
+        self.broadcaster = EventBroadcaster(self.session_factory, poll_interval=60, keepalive_interval=1)
+        self.broadcaster.start()
+        self.clients = []
+
+    def tearDown(self):
+        for client in self.clients:
+            client.close()
+        self.broadcaster.stop()
+        super(TestEventBroadcaster, self).tearDown()
+
+    def subscribe(self, query=''):
+        client = socket.create_connection(('127.0.0.1', self.broadcaster.port), timeout=5)
+        client.sendall(('GET /events%s HTTP/1.1\r\nHost: localhost\r\n\r\n' % query).encode('ascii'))
+        self.clients.append(client)
+        return client
+
+    def read_events(self, client, count):
+        data = b''
+        while data.count(b'\n\n') < count + 1:
+            chunk = client.recv(4096)
+            if not chunk:
+                break
+            data += chunk
+        head, _, body = data.partition(b'\r\n\r\n')
+        self.assertTrue(head.startswith(b'HTTP/1.1 200 OK'))
+        self.assertIn(b'text/event-stream', head)
+        results = []
+        for block in body.decode('utf-8').split('\n\n'):
+            fields = dict(line.split(': ', 1) for line in block.split('\n') if line and not line.startswith(':'))
+            if 'data' in fields:
+                results.append((int(fields['id']), fields['event'], json.loads(fields['data'])['name']))
+        return results
+
+    def test_backlog(self):
+        client = self.subscribe('?since=0')
+        self.assertEqual([name for _, _, name in self.read_events(client, 3)],
+                         ['TestArtifact1', 'TestArtifact2', 'TestArtifact3'])
+
+    def test_live_events(self):
+        client = self.subscribe()
+        self.db_session.delete(self.db_session.query(Artifact).filter_by(name='TestArtifact2').one())
+        transaction.commit()
+        self.assertEqual(self.read_events(client, 1), [(self.broadcaster.last_seq, 'deleted', 'TestArtifact2')])
+
+    def test_events_redirect(self):
+        events.event_broadcaster = self.broadcaster
+        try:
+            test_request = dummy_request(self.db_session)
+            test_request.params['since'] = '5'
+            response = artifact_views.events_view(test_request)
+        finally:
+            events.event_broadcaster = None
+        self.assertEqual(response.status_code, 307)
+        self.assertEqual(response.location, 'http://example.com:%d/events?since=5' % self.broadcaster.port)
+
+    def test_bad_request(self):
+        client = self.subscribe('?since=x')
+        self.assertTrue(client.recv(4096).startswith(b'HTTP/1.1 400'))
+
+
+class TestEventsView(BaseTest):
+
+    def test_events_disabled(self):
+        response = artifact_views.events_view(dummy_request(self.db_session))
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.text, artifact_views.events_disabled_err_msg)
+
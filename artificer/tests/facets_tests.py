@@ -0,0 +1,107 @@
+import transaction
+
+from artificer.tests.base_tests import BaseTest, QueryCounter
+from artificer.tests.artifacts_view_tests import dummy_request
+
+import artificer.views.artifacts as artifact_views
+from artificer.lib.facets import FacetIndex, facet_engine
+from artificer.models import Artifact, Label
+
+
+class TestFacetIndex(BaseTest):
+
+    def test_select(self):
+        index = FacetIndex([
+            {'id': 2, 'author': 'admin', 'labels': ['Software'], 'supported_os': [], 'sources': []},
+            {'id': 5, 'author': 'user', 'labels': ['Software', 'Logs'], 'supported_os': [], 'sources': []},
+            {'id': 9, 'author': 'admin', 'labels': [], 'supported_os': [], 'sources': []},
+        ])
+        select = lambda *args, **kwargs: [entry['id'] for entry in index.select(*args, **kwargs)]
+        self.assertEqual(select({'labels': ['Software']}), [2, 5])
+        self.assertEqual(select({'labels': ['Software', 'Logs']}, {'labels': 'all'}), [5])
+        self.assertEqual(select({'labels': ['Software']}, {'labels': 'not'}), [9])
+        self.assertEqual(select({'labels': ['Unknown']}, {'labels': 'not'}), [2, 5, 9])
+        self.assertEqual(select({'authors': ['admin']}, after=2), [9])
+        self.assertEqual(select({}, after=3, limit=1), [5])
+
+
+class TestFilterModes(BaseTest):
+    """Filter modes answered with SQL while the facet engine is cold."""
+
+    def setUp(self):
+        super(TestFilterModes, self).setUp()
+        self.init_database()
+        transaction.commit()
+
+    def list_names(self, **params):
+        test_request = dummy_request(self.db_session)
+        for key, values in params.items():
+            for value in (values if isinstance(values, list) else [values]):
+                test_request.params.add(key, value)
+        results = artifact_views.artifacts_view(test_request)
+        return [artifact['name'] for artifact in results['artifacts']]
+
+    def test_labels_any(self):
+        self.assertEqual(self.list_names(labels=['Software', 'Configuration Files']),
+                         ['TestArtifact1', 'TestArtifact2', 'TestArtifact3'])
+
+    def test_labels_all(self):
+        self.assertEqual(self.list_names(labels=['Software', 'Configuration Files'], labels_mode='all'), [])
+
+    def test_supported_os_all(self):
+        self.assertEqual(self.list_names(supported_os=['Darwin', 'Linux'], supported_os_mode='all'),
+                         ['TestArtifact2', 'TestArtifact3'])
+
+    def test_supported_os_not(self):
+        self.assertEqual(self.list_names(supported_os='Windows', supported_os_mode='not'),
+                         ['TestArtifact2', 'TestArtifact3'])
+
+    def test_sources_not(self):
+        self.assertEqual(self.list_names(sources='REGISTRY_KEY', sources_mode='NOT'),
+                         ['TestArtifact1', 'TestArtifact2'])
+
+    def test_combined_filters(self):
+        self.assertEqual(self.list_names(author='admin', author_mode='not', labels='Software'), ['TestArtifact3'])
+
+    def test_paging(self):
+        self.assertEqual(self.list_names(supported_os='Linux', after='1', limit='1'), ['TestArtifact2'])
+
+    def test_invalid_mode_failure(self):
+        test_request = dummy_request(self.db_session)
+        test_request.params['labels_mode'] = 'some'
+        response = artifact_views.artifacts_view(test_request)
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.text, artifact_views.invalid_mode_err_msg)
+
+
+class TestFacetEngine(TestFilterModes):
+    """The same filters answered by the warm facet engine."""
+
+    def setUp(self):
+        super(TestFacetEngine, self).setUp()
+        self.assertTrue(facet_engine.load(self.db_session))
+
+    def tearDown(self):
+        facet_engine.invalidate()
+        super(TestFacetEngine, self).tearDown()
+
+    def test_engine_query_count(self):
+        with QueryCounter(self.engine) as counter:
+            self.list_names(labels='Software', supported_os='Windows', supported_os_mode='not')
+        # Only the catalog generation is read
+        self.assertEqual(counter.count, 1)
+
+    def test_invalidated_on_commit(self):
+        artifact = self.db_session.query(Artifact).filter_by(name='TestArtifact1').one()
+        artifact.labels.append(self.db_session.query(Label).filter_by(name='Logs').one())
+        self.db_session.flush()
+        self.assertTrue(facet_engine.warm)
+        transaction.commit()
+        self.assertFalse(facet_engine.warm)
+        self.assertEqual(self.list_names(labels='Logs'), ['TestArtifact1'])
+
+    def test_kept_on_rollback(self):
+        self.db_session.delete(self.db_session.query(Artifact).filter_by(name='TestArtifact1').one())
+        self.db_session.flush()
+        transaction.abort()
+        self.assertTrue(facet_engine.warm)
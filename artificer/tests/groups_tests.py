@@ -0,0 +1,173 @@
+import transaction
+
+from pyramid.exceptions import HTTPNotFound
+
+from artificer.tests.base_tests import BaseTest, QueryCounter
+from artificer.tests.artifacts_view_tests import dummy_request
+
+import artifacts.reader as fa_readers
+
+import artificer.views.artifacts as artifact_views
+from artificer.lib.artifacts import delete_artifacts, get_artifact, import_artifacts, update_artifacts
+from artificer.lib.groups import group_member_rows
+from artificer.models import Artifact, GroupMember, get_session_factory
+
+
+def group_definition(name, *members):
+    return {"name": name,
+            "doc": "Group of %s" % ', '.join(members),
+            "sources": [{"type": "ARTIFACT_GROUP", "attributes": {"names": list(members)}}]}
+
+
+GROUP_ARTIFACTS = [
+    group_definition('BrowserGroup', 'TestArtifact1', 'HistoryGroup', 'MissingArtifact'),
+    group_definition('HistoryGroup', 'TestArtifact2', 'TestArtifact1', 'BrowserGroup'),
+    group_definition('ToolsGroup', 'TestArtifact3'),
+]
+
+
+class TestGroupMemberRows(BaseTest):
+
+    def test_group_member_rows(self):
+        definition = group_definition('Group', 'A', 'B', 'A')
+        definition['sources'].append({"type": "FILE", "attributes": {"paths": ["/etc/passwd"]}})
+        definition['sources'].append({"type": "ARTIFACT_GROUP", "attributes": {"names": ["C", "B"]}})
+        self.assertEqual(group_member_rows(definition),
+                         [{'member_name': 'A'}, {'member_name': 'B'}, {'member_name': 'C'}])
+
+
+class TestArtifactGroupView(BaseTest):
+
+    def setUp(self):
+        super(TestArtifactGroupView, self).setUp()
+        self.init_database()
+        self.artifact_reader = fa_readers.ArtifactsReader()
+        for artifact_definition in GROUP_ARTIFACTS:
+            forensic_artifact = self.artifact_reader.ReadArtifactDefinitionValues(artifact_definition)
+            self.db_session.add(get_artifact(self.db_session, forensic_artifact, author='admin'))
+        self.db_session.flush()
+        self.ids = dict(self.db_session.query(Artifact.name, Artifact.id))
+
+    def expand(self, name):
+        test_request = dummy_request(self.db_session)
+        test_request.matchdict['id'] = str(self.ids[name])
+        return artifact_views.artifact_group_view(test_request)
+
+    def test_group_closure(self):
+        results = self.expand('BrowserGroup')
+        self.assertEqual(results['name'], 'BrowserGroup')
+        self.assertEqual([member['name'] for member in results['members']], ['TestArtifact1', 'TestArtifact2'])
+        self.assertEqual([group['name'] for group in results['groups']], ['HistoryGroup'])
+        self.assertEqual(results['dangling'], [{'group': 'BrowserGroup', 'member': 'MissingArtifact'}])
+        self.assertEqual(results['cycles'], [['BrowserGroup', 'HistoryGroup', 'BrowserGroup']])
+
+    def test_artifact_without_members(self):
+        results = self.expand('TestArtifact1')
+        self.assertEqual((results['members'], results['groups'], results['dangling'], results['cycles']),
+                         ([], [], [], []))
+
+    def test_missing_artifact(self):
+        test_request = dummy_request(self.db_session)
+        test_request.matchdict['id'] = '100'
+        self.assertRaises(HTTPNotFound, artifact_views.artifact_group_view, test_request)
+        test_request.matchdict['id'] = 'abc'
+        self.assertRaises(HTTPNotFound, artifact_views.artifact_group_view, test_request)
+
+    def test_members_follow_updates(self):
+        forensic_artifact = self.artifact_reader.ReadArtifactDefinitionValues(
+            group_definition('HistoryGroup', 'TestArtifact3'))
+        statuses = update_artifacts(self.db_session, [(self.ids['HistoryGroup'], forensic_artifact)], 'admin')
+        self.assertEqual(statuses[0]['status'], 'updated')
+        results = self.expand('BrowserGroup')
+        self.assertEqual([member['name'] for member in results['members']], ['TestArtifact1', 'TestArtifact3'])
+        self.assertEqual(results['cycles'], [])
+
+    def test_dangling_after_delete(self):
+        delete_artifacts(self.db_session, [self.ids['TestArtifact2']])
+        results = self.expand('HistoryGroup')
+        self.assertEqual(results['dangling'], [{'group': 'HistoryGroup', 'member': 'TestArtifact2'},
+                                               {'group': 'BrowserGroup', 'member': 'MissingArtifact'}])
+        self.assertEqual(self.db_session.query(GroupMember).filter_by(artifact_id=self.ids['TestArtifact2']).count(), 0)
+
+    def test_deleted_group_edges_removed(self):
+        delete_artifacts(self.db_session, [self.ids['HistoryGroup']])
+        self.assertEqual(self.db_session.query(GroupMember).filter_by(artifact_id=self.ids['HistoryGroup']).count(), 0)
+        results = self.expand('BrowserGroup')
+        self.assertEqual(results['dangling'], [{'group': 'BrowserGroup', 'member': 'HistoryGroup'},
+                                               {'group': 'BrowserGroup', 'member': 'MissingArtifact'}])
+
+    def test_imported_members(self):
+        forensic_artifact = self.artifact_reader.ReadArtifactDefinitionValues(
+            group_definition('ImportedGroup', 'ToolsGroup', 'TestArtifact3'))
+        results = import_artifacts(self.db_session, [forensic_artifact], 'admin')
+        self.ids['ImportedGroup'] = results['ids'][0]
+        results = self.expand('ImportedGroup')
+        self.assertEqual([member['name'] for member in results['members']], ['TestArtifact3'])
+        self.assertEqual([group['name'] for group in results['groups']], ['ToolsGroup'])
+        self.assertEqual(results['dangling'], [])
+
+    def test_closure_cached_per_generation(self):
+        transaction.commit()
+        first = self.expand('BrowserGroup')
+        with QueryCounter(self.engine) as counter:
+            self.assertEqual(self.expand('BrowserGroup'), first)
+        self.assertEqual(counter.count, 1)
+
+        test_request = dummy_request(self.db_session)
+        test_request.matchdict['id'] = str(self.ids['BrowserGroup'])
+        test_request.headers['If-None-Match'] = artifact_views._generation_etag(
+            ('group', self.ids['BrowserGroup'], artifact_views._get_cache_generation(self.db_session)))
+        self.assertEqual(artifact_views.artifact_group_view(test_request).status_code, 304)
+
+
+class TestExpandedExport(BaseTest):
+
+    def setUp(self):
+        super(TestExpandedExport, self).setUp()
+        self.init_database()
+        artifact_reader = fa_readers.ArtifactsReader()
+        for artifact_definition in GROUP_ARTIFACTS:
+            forensic_artifact = artifact_reader.ReadArtifactDefinitionValues(artifact_definition)
+            self.db_session.add(get_artifact(self.db_session, forensic_artifact, author='admin'))
+        self.db_session.flush()
+        self.ids = dict(self.db_session.query(Artifact.name, Artifact.id))
+
+    def export(self, *names, **params):
+        test_request = dummy_request(self.db_session)
+        for name in names:
+            test_request.params.add('id', self.ids[name])
+        for param, value in params.items():
+            test_request.params[param] = value
+        response = artifact_views.artifact_export_view(test_request)
+        forensic_artifacts = fa_readers.YamlArtifactsReader().ReadFileObject(b''.join(response.app_iter).decode('utf-8'))
+        return [forensic_artifact.name for forensic_artifact in forensic_artifacts]
+
+    def test_export_without_expand(self):
+        self.assertEqual(self.export('BrowserGroup'), ['BrowserGroup'])
+
+    def test_expanded_export(self):
+        self.assertEqual(self.export('BrowserGroup', expand='true'),
+                         ['TestArtifact1', 'TestArtifact2', 'HistoryGroup', 'BrowserGroup'])
+
+    def test_expanded_export_shared_members(self):
+        self.assertEqual(self.export('ToolsGroup', 'HistoryGroup', 'TestArtifact3', expand='true'),
+                         ['TestArtifact3', 'ToolsGroup', 'TestArtifact2', 'TestArtifact1', 'BrowserGroup',
+                          'HistoryGroup'])
+
+    def test_expanded_export_batched(self):
+        self.config.registry.settings['artificer.export_batch_size'] = '2'
+        transaction.commit()
+        self.config.registry['dbsession_factory'] = get_session_factory(self.engine)
+        with QueryCounter(self.engine) as counter:
+            self.assertEqual(self.export('BrowserGroup', expand='true'),
+                             ['TestArtifact1', 'TestArtifact2', 'HistoryGroup', 'BrowserGroup'])
+        # Root names, three member levels, two hash batches and two document batches
+        self.assertEqual(counter.count, 8)
+
+    def test_expanded_export_invalid_id(self):
+        test_request = dummy_request(self.db_session)
+        test_request.params.add('id', 'abc')
+        test_request.params['expand'] = 'true'
+        response = artifact_views.artifact_export_view(test_request)
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.text, artifact_views.invalid_id_err_msg)
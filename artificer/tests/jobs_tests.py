@@ -0,0 +1,189 @@
+import datetime
+import os
+import shutil
+import tempfile
+
+import transaction
+
+from artificer.tests.base_tests import BaseTest, ArtifactFileUpload
+from artificer.tests.artifacts_view_tests import dummy_request
+
+import pyramid.exceptions
+
+import artificer.views.artifacts as artifact_views
+import artificer.lib.jobs as jobs
+from artificer.lib.jobs import ImportWorker, start_import_worker
+from artificer.models import Artifact, ImportJob, get_session_factory
+
+
+class TestImportJobs(BaseTest):
+
+    def setUp(self):
+        super(TestImportJobs, self).setUp()
+        self.init_database()
+        self.spool_dir = tempfile.mkdtemp()
+        self.config.registry.settings['artificer.import_spool_dir'] = self.spool_dir
+        self.worker = ImportWorker(get_session_factory(self.engine), chunk_size=1)
+
+    def tearDown(self):
+        shutil.rmtree(self.spool_dir)
+        super(TestImportJobs, self).tearDown()
+
+    def queue(self, upload_path, replace=None):
+        test_request = dummy_request(self.db_session)
+        test_request.params.add('artifact_file', ArtifactFileUpload(upload_path))
+        test_request.params.add('job', 'true')
+        if replace is not None:
+            test_request.params.add('replace', replace)
+        results = artifact_views.artifact_import(test_request)
+        self.assertEqual(test_request.response.status_int, 202)
+        return results
+
+    def job_status(self, job_id):
+        test_request = dummy_request(self.db_session)
+        test_request.matchdict['job_id'] = job_id
+        return artifact_views.import_job_view(test_request)
+
+    def test_queue_import(self):
+        results = self.queue('test_data/test_artifacts_partial.upload')
+        self.assertEqual(results['status'], 'queued')
+        self.assertEqual(results['filename'], 'test_artifacts_partial.upload')
+        self.assertEqual(len(os.listdir(self.spool_dir)), 1)
+        self.assertEqual(self.db_session.query(Artifact).filter_by(name='TestArtifact5').count(), 0)
+
+    def test_queue_replace_flag(self):
+        for replace, expected in (('false', False), ('0', False), ('true', True), (None, False)):
+            job_id = self.queue('test_data/test_artifacts_partial.upload', replace=replace)['id']
+            self.assertIs(self.db_session.query(ImportJob).get(job_id).replace, expected)
+
+    def test_run_import_job(self):
+        self.queue('test_data/test_artifacts_import.upload')
+        job_id = self.queue('test_data/test_artifacts_partial.upload')['id']
+        transaction.commit()
+        self.worker.run_pending()
+
+        results = self.job_status(job_id)
+        self.assertEqual(results['status'], 'finished')
+        self.assertEqual((results['total'], results['processed'], results['added']), (2, 2, 1))
+        self.assertEqual(results['failed'], ['TestArtifact5'])
+        artifact = self.db_session.query(Artifact).filter_by(name='TestArtifact6').one()
+        self.assertEqual(results['ids'], [artifact.id])
+        self.assertEqual(os.listdir(self.spool_dir), [])
+
+    def test_resume_interrupted_job(self):
+        job_id = self.queue('test_data/test_artifacts_partial.upload')['id']
+        job = self.db_session.query(ImportJob).get(job_id)
+        job.status = ImportJob.RUNNING
+        job.processed = 1
+        transaction.commit()
+
+        self.worker.resume_interrupted()
+        self.worker.run_pending()
+        results = self.job_status(job_id)
+        self.assertEqual((results['status'], results['processed'], results['added']), ('finished', 2, 1))
+        self.assertEqual(self.db_session.query(Artifact).filter_by(name='TestArtifact5').count(), 0)
+
+    def test_resume_skips_live_jobs(self):
+        job_id = self.queue('test_data/test_artifacts_partial.upload')['id']
+        job = self.db_session.query(ImportJob).get(job_id)
+        job.status = ImportJob.RUNNING
+        job.owner = 'other'
+        job.heartbeat = datetime.datetime.utcnow()
+        transaction.commit()
+
+        self.worker.resume_interrupted()
+        job = self.db_session.query(ImportJob).get(job_id)
+        self.assertEqual((job.status, job.owner), (ImportJob.RUNNING, 'other'))
+
+        job.heartbeat -= datetime.timedelta(seconds=self.worker.stale_after + 1)
+        transaction.commit()
+        self.worker.resume_interrupted()
+        job = self.db_session.query(ImportJob).get(job_id)
+        self.assertEqual((job.status, job.owner), (ImportJob.QUEUED, None))
+
+    def test_taken_over_job(self):
+        job_id = self.queue('test_data/test_artifacts_partial.upload')['id']
+        job = self.db_session.query(ImportJob).get(job_id)
+        job.status = ImportJob.RUNNING
+        job.owner = 'other'
+        path = job.path
+        transaction.commit()
+
+        self.worker.run_job(job_id)
+        job = self.db_session.query(ImportJob).get(job_id)
+        self.assertEqual((job.status, job.processed), (ImportJob.RUNNING, 0))
+        self.assertTrue(os.path.exists(path))
+
+    def test_heartbeat(self):
+        job_id = self.queue('test_data/test_artifacts_partial.upload')['id']
+        job = self.db_session.query(ImportJob).get(job_id)
+        job.status = ImportJob.RUNNING
+        job.owner = self.worker.owner
+        transaction.commit()
+
+        self.worker.heartbeat()
+        self.assertIsNotNone(self.db_session.query(ImportJob).get(job_id).heartbeat)
+
+    def test_import_worker_setting(self):
+        self.assertIsNone(start_import_worker({}, get_session_factory(self.engine)))
+        worker = start_import_worker({'artificer.import_worker': 'true'}, get_session_factory(self.engine))
+        try:
+            self.assertIsNotNone(worker)
+        finally:
+            worker.stop()
+            jobs.import_worker = None
+
+    def test_invalid_file_job(self):
+        job_id = self.queue('test_data/test_artifacts_import.upload')['id']
+        with open(self.db_session.query(ImportJob).get(job_id).path, 'w') as spool:
+            spool.write('name: [')
+        transaction.commit()
+        self.worker.run_pending()
+        results = self.job_status(job_id)
+        self.assertEqual(results['status'], 'failed')
+        self.assertTrue(results['error'])
+        self.assertEqual(results['processed'], 0)
+
+    def test_non_utf8_file_job(self):
+        job_id = self.queue('test_data/test_artifacts_import.upload')['id']
+        next_job_id = self.queue('test_data/test_artifacts_partial.upload')['id']
+        for parse_workers in (1, 2):
+            # Failing the job removes its upload, so it is spooled again
+            job = self.db_session.query(ImportJob).get(job_id)
+            with open(job.path, 'wb') as spool:
+                spool.write(b'name: Caf\xe9\ndoc: Latin-1 text\n')
+            job.status = ImportJob.QUEUED
+            transaction.commit()
+            self.worker.parse_workers = parse_workers
+            self.worker.run_pending()
+            results = self.job_status(job_id)
+            self.assertEqual(results['status'], 'failed')
+            # Both yaml and the UTF-8 codec name the offending byte
+            self.assertIn('e9', results['error'])
+        self.assertEqual(self.job_status(next_job_id)['status'], 'finished')
+
+    def test_unexpected_error_fails_job(self):
+        first_job_id = self.queue('test_data/test_artifacts_import.upload')['id']
+        job_id = self.queue('test_data/test_artifacts_partial.upload')['id']
+        transaction.commit()
+        run_job = self.worker.run_job
+
+        def failing_run_job(claimed_id):
+            if claimed_id == first_job_id:
+                raise RuntimeError('unexpected')
+            return run_job(claimed_id)
+        self.worker.run_job = failing_run_job
+        self.worker.run_pending()
+
+        results = self.job_status(first_job_id)
+        self.assertEqual((results['status'], results['error']), ('failed', 'unexpected'))
+        self.assertEqual(self.job_status(job_id)['status'], 'finished')
+
+    def test_rollback_removes_upload(self):
+        self.queue('test_data/test_artifacts_import.upload')
+        transaction.abort()
+        self.assertEqual(os.listdir(self.spool_dir), [])
+
+    def test_job_not_found(self):
+        with self.assertRaises(pyramid.exceptions.HTTPNotFound):
+            self.job_status(100)
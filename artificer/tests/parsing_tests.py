@@ -0,0 +1,65 @@
+import unittest
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+import artifacts.errors as fa_errors
+import artifacts.reader as fa_readers
+
+from artificer.lib.parsing import (get_parse_pool, read_artifacts_directory, read_artifacts_file_object,
+                                   split_yaml_documents)
+
+INVALID_YAML = """\
+name: TestArtifact7
+doc: This artifact is for testing
+sources:
+- type: FILE
+  attributes: {paths: ['Test']}
+---
+name: TestArtifact8
+sources:
+- type: FILE
+  attributes: {paths: ['Test']}
+"""
+
+
+class TestParallelParsing(unittest.TestCase):
+
+    def test_split_yaml_documents(self):
+        documents = split_yaml_documents('---\na: 1\n--- \nb: |\n  ---\n  text\n---\n')
+        self.assertEqual(documents, ['\na: 1\n', ' \nb: |\n  ---\n  text\n'])
+
+    def test_read_file_object(self):
+        with open('test_data/test_artifacts_admin.yaml') as file_object:
+            serial = [artifact.AsDict() for artifact in read_artifacts_file_object(file_object)]
+        with open('test_data/test_artifacts_admin.yaml') as file_object:
+            parallel = [artifact.AsDict() for artifact in read_artifacts_file_object(file_object, workers=2)]
+        self.assertEqual(len(parallel), 2)
+        self.assertEqual(serial, parallel)
+
+    def test_read_directory(self):
+        artifact_reader = fa_readers.YamlArtifactsReader()
+        serial = [artifact.AsDict() for artifact in artifact_reader.ReadDirectory('test_data', extension='yaml')]
+        parallel = [artifact.AsDict() for artifact in read_artifacts_directory('test_data', workers=2)]
+        self.assertEqual(len(parallel), 3)
+        self.assertEqual(serial, parallel)
+
+    def test_parse_pool_reused(self):
+        pool = get_parse_pool(2)
+        with open('test_data/test_artifacts_admin.yaml') as file_object:
+            list(read_artifacts_file_object(file_object, workers=2))
+        with self.assertRaises(fa_errors.FormatError):
+            list(read_artifacts_file_object(StringIO(INVALID_YAML), workers=2))
+        self.assertIs(get_parse_pool(2), pool)
+        self.assertEqual(len(list(read_artifacts_directory('test_data', workers=2))), 3)
+
+    def test_read_file_object_failure(self):
+        artifact_reader = fa_readers.YamlArtifactsReader()
+        with self.assertRaises(fa_errors.FormatError) as serial:
+            list(artifact_reader.ReadFileObject(StringIO(INVALID_YAML)))
+        with self.assertRaises(fa_errors.FormatError) as parallel:
+            list(read_artifacts_file_object(StringIO(INVALID_YAML), workers=2))
+        self.assertEqual(str(serial.exception), str(parallel.exception))
+        self.assertTrue(str(parallel.exception).startswith('After: TestArtifact7'))
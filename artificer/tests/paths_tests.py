@@ -0,0 +1,114 @@
+import unittest
+
+from artificer.tests.base_tests import BaseTest, QueryCounter
+from artificer.tests.artifacts_view_tests import dummy_request
+
+import artifacts.reader as fa_readers
+
+import artificer.views.artifacts as artifact_views
+from artificer.lib.artifacts import get_artifact
+from artificer.lib.paths import candidate_patterns, compile_pattern, index_patterns, normalize_path, pattern_anchor
+from artificer.models import Artifact
+
+PATH_ARTIFACTS = [
+    {"name": "WindowsPrefetchFiles",
+     "doc": "Windows prefetch files",
+     "sources": [{"type": "FILE",
+                  "attributes": {"paths": ["%%environ_systemroot%%\\Prefetch\\*.pf"], "separator": "\\"}}],
+     "supported_os": ["Windows"]},
+    {"name": "LinuxLogFiles",
+     "doc": "Linux log files",
+     "sources": [{"type": "FILE", "attributes": {"paths": ["/var/log/**", "/var/log/syslog"]}}],
+     "supported_os": ["Linux"]},
+    {"name": "WindowsRunKeys",
+     "doc": "Windows run keys",
+     "sources": [{"type": "REGISTRY_VALUE",
+                  "attributes": {"key_value_pairs": [
+                      {"key": "HKEY_LOCAL_MACHINE\\Software\\Microsoft\\Windows\\CurrentVersion\\Run",
+                       "value": "*"}]}}],
+     "supported_os": ["Windows"]},
+]
+
+
+class TestPathPatterns(unittest.TestCase):
+
+    def test_normalize_path(self):
+        self.assertEqual(normalize_path('HKLM\\Software\\\\Microsoft\\'), 'hkey_local_machine/software/microsoft')
+        self.assertEqual(normalize_path('C:\\Windows\\Prefetch'), 'c:/windows/prefetch')
+        self.assertEqual(normalize_path('/'), '/')
+
+    def test_pattern_anchor(self):
+        self.assertEqual(pattern_anchor('/var/log/*.log'), '/var/log')
+        self.assertEqual(pattern_anchor('%%environ_systemroot%%/prefetch/*.pf'), '**/prefetch')
+        self.assertEqual(pattern_anchor('%%users.homedir%%/*/ntuser.dat'), '**/ntuser.dat')
+        self.assertEqual(pattern_anchor('/etc/passwd'), '/etc/passwd')
+        self.assertEqual(pattern_anchor('%%users.homedir%%/**'), '')
+
+    def test_interpolated_candidates_bounded(self):
+        patterns = ['%%environ_systemroot%%/dir{0}/*.pf'.format(index) for index in range(200)]
+        index = index_patterns((pattern_anchor(pattern), pattern, artifact_id, 'Artifact')
+                               for artifact_id, pattern in enumerate(patterns))
+        candidates = list(candidate_patterns(index, 'c:/windows/dir7/foo.pf'))
+        self.assertEqual([pattern for pattern, _ in candidates], ['%%environ_systemroot%%/dir7/*.pf'])
+        self.assertEqual(list(candidate_patterns(index, 'c:/windows/system32/foo.pf')), [])
+
+    def test_compile_pattern(self):
+        self.assertTrue(compile_pattern('/var/log/*.log').match('/var/log/auth.log'))
+        self.assertFalse(compile_pattern('/var/log/*.log').match('/var/log/apt/history.log'))
+        self.assertTrue(compile_pattern('/var/log/**').match('/var/log/apt/history.log'))
+        self.assertTrue(compile_pattern('%%environ_systemroot%%/prefetch/*.pf').match('c:/windows/prefetch/foo.pf'))
+        self.assertFalse(compile_pattern('/var/lo?').match('/var/log/'))
+
+    def test_compile_pattern_recursion_depth(self):
+        self.assertTrue(compile_pattern('c:/windows/**').match('c:/windows/a/b/c'))
+        self.assertFalse(compile_pattern('c:/windows/**').match('c:/windows/a/b/c/d'))
+        self.assertTrue(compile_pattern('/var/log/**1').match('/var/log/syslog'))
+        self.assertFalse(compile_pattern('/var/log/**1').match('/var/log/apt/history.log'))
+        self.assertTrue(compile_pattern('/var/**5/*.log').match('/var/a/b/c/d/e/x.log'))
+        self.assertFalse(compile_pattern('/var/**5/*.log').match('/var/a/b/c/d/e/f/x.log'))
+
+
+class TestArtifactMatchView(BaseTest):
+
+    def setUp(self):
+        super(TestArtifactMatchView, self).setUp()
+        self.init_database()
+        artifact_reader = fa_readers.ArtifactsReader()
+        for artifact_definition in PATH_ARTIFACTS:
+            forensic_artifact = artifact_reader.ReadArtifactDefinitionValues(artifact_definition)
+            self.db_session.add(get_artifact(self.db_session, forensic_artifact, author='admin'))
+        self.db_session.flush()
+
+    def match(self, *paths):
+        test_request = dummy_request(self.db_session)
+        for path in paths:
+            test_request.params.add('path', path)
+        results = artifact_views.artifact_match_view(test_request)
+        return [[artifact['name'] for artifact in match['artifacts']] for match in results['matches']]
+
+    def test_match_paths(self):
+        self.assertEqual(self.match('C:\\Windows\\Prefetch\\FOO.pf',
+                                    '/var/log/syslog',
+                                    '/var/log/apt/history.log',
+                                    '/etc/passwd'),
+                         [['WindowsPrefetchFiles'], ['LinuxLogFiles'], ['LinuxLogFiles'], []])
+
+    def test_match_registry_keys(self):
+        self.assertEqual(self.match('HKLM\\SOFTWARE\\Microsoft\\Windows\\CurrentVersion\\Run', 'HKEY_LOCAL_MACHINE\\TEST'),
+                         [['WindowsRunKeys'], ['TestArtifact3']])
+
+    def test_match_query_count(self):
+        with QueryCounter(self.engine) as counter:
+            self.match('/var/log/syslog', '/var/log/messages', 'C:\\Windows\\Prefetch\\FOO.pf')
+        self.assertEqual(counter.count, 1)
+
+    def test_match_after_delete(self):
+        artifact = self.db_session.query(Artifact).filter_by(name='LinuxLogFiles').one()
+        self.db_session.delete(artifact)
+        self.db_session.flush()
+        self.assertEqual(self.match('/var/log/syslog'), [[]])
+
+    def test_match_missing_path_failure(self):
+        response = artifact_views.artifact_match_view(dummy_request(self.db_session))
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.text, artifact_views.missing_path_err_msg)
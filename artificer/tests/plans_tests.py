@@ -0,0 +1,152 @@
+import transaction
+
+from artificer.tests.base_tests import BaseTest, QueryCounter
+from artificer.tests.artifacts_view_tests import dummy_request
+
+import artifacts.reader as fa_readers
+
+import artificer.views.artifacts as artifact_views
+from artificer.lib.artifacts import get_artifact
+from artificer.lib.paths import collapse_patterns
+from artificer.models import Artifact
+
+RUN_KEY = 'HKEY_LOCAL_MACHINE\\Software\\Microsoft\\Windows\\CurrentVersion\\Run'
+
+PLAN_ARTIFACTS = [
+    {"name": "LinuxLogFiles",
+     "doc": "Linux log files",
+     "sources": [{"type": "FILE", "attributes": {"paths": ["/var/log/*.log", "/var/log/syslog"]}}],
+     "supported_os": ["Linux"]},
+    {"name": "LinuxAllLogFiles",
+     "doc": "All Linux log files",
+     "sources": [{"type": "FILE", "attributes": {"paths": ["/var/log/**", "/var//log/syslog/"]}}],
+     "supported_os": ["Linux"]},
+    {"name": "WindowsPrefetchFiles",
+     "doc": "Windows prefetch files",
+     "sources": [{"type": "FILE",
+                  "attributes": {"paths": ["%%environ_systemroot%%\\Prefetch\\*.pf"], "separator": "\\"}}],
+     "supported_os": ["Windows"]},
+    {"name": "WindowsCmdPrefetch",
+     "doc": "Windows cmd prefetch file",
+     "sources": [{"type": "FILE",
+                  "attributes": {"paths": ["%%environ_systemroot%%\\prefetch\\CMD.EXE-1234.pf",
+                                           "%%environ_windir%%\\Prefetch\\CMD.EXE-1234.pf"],
+                                 "separator": "\\"}}],
+     "supported_os": ["Windows"]},
+    {"name": "WindowsRunKeys",
+     "doc": "Windows run keys",
+     "sources": [{"type": "REGISTRY_KEY", "attributes": {"keys": [RUN_KEY, RUN_KEY.upper()]}}],
+     "supported_os": ["Windows"]},
+    {"name": "WindowsRunValues",
+     "doc": "Windows run values",
+     "sources": [{"type": "REGISTRY_VALUE",
+                  "attributes": {"key_value_pairs": [{"key": RUN_KEY, "value": "Updater"},
+                                                     {"key": RUN_KEY + "Once", "value": "Updater"}]}}],
+     "supported_os": ["Windows"]},
+    {"name": "WindowsProcesses",
+     "doc": "Windows processes",
+     "sources": [{"type": "WMI", "attributes": {"query": "SELECT *  FROM Win32_Process"}}],
+     "supported_os": ["Windows"]},
+    {"name": "TriageGroup",
+     "doc": "Triage collection",
+     "sources": [{"type": "ARTIFACT_GROUP",
+                  "attributes": {"names": ["WindowsPrefetchFiles", "WindowsCmdPrefetch", "WindowsRunKeys",
+                                           "WindowsRunValues", "WindowsProcesses", "LinuxLogFiles"]}}]},
+]
+
+
+class TestCollapsePatterns(BaseTest):
+
+    def test_collapse_patterns(self):
+        collapsed = collapse_patterns(['/var/log/**', '/var/log/*.log', '/var/log/syslog', '/var/lo?/x',
+                                       '%%a%%/b/*.pf', '%%a%%/b/x.pf', '%%c%%/b/x.pf', '/a/**1', '/a/*', '/a/b/c'])
+        self.assertEqual(collapsed['/var/log/*.log'], '/var/log/**')
+        self.assertEqual(collapsed['/var/log/syslog'], '/var/log/**')
+        self.assertEqual(collapsed['/var/lo?/x'], '/var/lo?/x')
+        self.assertEqual(collapsed['%%a%%/b/x.pf'], '%%a%%/b/*.pf')
+        self.assertEqual(collapsed['%%c%%/b/x.pf'], '%%c%%/b/x.pf')
+        self.assertEqual(collapsed['/a/*'], '/a/**1')
+        self.assertEqual(collapsed['/a/b/c'], '/a/b/c')
+
+    def test_wildcards_do_not_cover_wider_patterns(self):
+        collapsed = collapse_patterns(['/var/log/?', '/var/log/*', '/var/*/x', '/var/**/x', '/var/%%users.username%%'])
+        self.assertEqual(collapsed['/var/log/*'], '/var/log/*')
+        self.assertEqual(collapsed['/var/**/x'], '/var/**/x')
+        self.assertEqual(collapsed['/var/%%users.username%%'], '/var/%%users.username%%')
+        self.assertEqual(collapsed['/var/log/?'], '/var/log/*')
+
+
+class TestCollectionPlanView(BaseTest):
+
+    def setUp(self):
+        super(TestCollectionPlanView, self).setUp()
+        self.init_database()
+        artifact_reader = fa_readers.ArtifactsReader()
+        for artifact_definition in PLAN_ARTIFACTS:
+            forensic_artifact = artifact_reader.ReadArtifactDefinitionValues(artifact_definition)
+            self.db_session.add(get_artifact(self.db_session, forensic_artifact, author='admin'))
+        self.db_session.flush()
+        self.ids = dict(self.db_session.query(Artifact.name, Artifact.id))
+
+    def plan(self, *names, **params):
+        test_request = dummy_request(self.db_session)
+        for name in names:
+            test_request.params.add('id', self.ids[name])
+        for param, value in params.items():
+            test_request.params.add(param, value)
+        return artifact_views.collection_plan_view(test_request)
+
+    def test_plan_merges_paths(self):
+        plan = self.plan('LinuxLogFiles', 'LinuxAllLogFiles')
+        self.assertEqual(plan['artifacts'], ['LinuxAllLogFiles', 'LinuxLogFiles'])
+        self.assertEqual(plan['sources']['FILE'], [
+            {'path': '/var/log/**', 'separator': '/', 'artifacts': ['LinuxAllLogFiles', 'LinuxLogFiles']}])
+
+    def test_plan_expands_groups(self):
+        plan = self.plan('TriageGroup')
+        self.assertEqual(plan['artifacts'], ['LinuxLogFiles', 'TriageGroup', 'WindowsCmdPrefetch',
+                                             'WindowsPrefetchFiles', 'WindowsProcesses', 'WindowsRunKeys',
+                                             'WindowsRunValues'])
+        self.assertEqual([entry['path'] for entry in plan['sources']['FILE']],
+                         ['%%environ_systemroot%%\\Prefetch\\*.pf', '%%environ_windir%%\\Prefetch\\CMD.EXE-1234.pf',
+                          '/var/log/*.log', '/var/log/syslog'])
+        self.assertEqual(plan['sources']['FILE'][0]['artifacts'], ['WindowsCmdPrefetch', 'WindowsPrefetchFiles'])
+        self.assertEqual(plan['sources']['REGISTRY_KEY'], [
+            {'key': RUN_KEY, 'artifacts': ['WindowsRunKeys', 'WindowsRunValues']}])
+        self.assertEqual(plan['sources']['REGISTRY_VALUE'], [
+            {'key': RUN_KEY + 'Once', 'value': 'Updater', 'artifacts': ['WindowsRunValues']}])
+        self.assertEqual(plan['sources']['WMI'], [
+            {'query': 'SELECT * FROM Win32_Process', 'base_object': None, 'artifacts': ['WindowsProcesses']}])
+        self.assertEqual(plan['sources']['PATH'], [])
+
+    def test_plan_skips_other_systems(self):
+        # supported_os also selects the Windows test artifacts
+        plan = self.plan('TriageGroup', supported_os='Windows')
+        self.assertIn('WindowsRunKeys', plan['artifacts'])
+        self.assertNotIn('LinuxLogFiles', plan['artifacts'])
+        self.assertNotIn('/var/log/*.log', [entry['path'] for entry in plan['sources']['FILE']])
+
+    def test_plan_by_supported_os(self):
+        plan = self.plan(supported_os='Linux')
+        self.assertIn('LinuxLogFiles', plan['artifacts'])
+        self.assertNotIn('WindowsRunKeys', plan['artifacts'])
+        paths = [entry['path'] for entry in plan['sources']['FILE']]
+        self.assertIn('/var/log/**', paths)
+        self.assertNotIn('/var/log/syslog', paths)
+
+    def test_plan_cached_per_generation(self):
+        transaction.commit()
+        first = self.plan('TriageGroup')
+        with QueryCounter(self.engine) as counter:
+            self.assertEqual(self.plan('TriageGroup'), first)
+        self.assertEqual(counter.count, 1)
+
+    def test_missing_selection_failure(self):
+        response = artifact_views.collection_plan_view(dummy_request(self.db_session))
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.text, artifact_views.missing_selection_err_msg)
+
+    def test_invalid_id_failure(self):
+        response = self.plan(id='abc')
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.text, artifact_views.invalid_id_err_msg)
@@ -0,0 +1,77 @@
+from artificer.tests.base_tests import BaseTest, ArtifactFileUpload
+from artificer.tests.artifacts_view_tests import dummy_request, TEST_ARTIFACT
+
+import artificer.lib.search as search
+import artificer.views.artifacts as artifact_views
+from artificer.models import Artifact
+
+
+class TestSearchView(BaseTest):
+
+    def setUp(self):
+        super(TestSearchView, self).setUp()
+        self.init_database()
+
+    def search(self, query):
+        test_request = dummy_request(self.db_session)
+        test_request.params.add('q', query)
+        results = artifact_views.search_view(test_request)
+        return [artifact['name'] for artifact in results['artifacts']]
+
+    def test_search_fts_available(self):
+        self.assertTrue(search.fts_available(self.db_session))
+
+    def test_search_name(self):
+        self.assertEqual(self.search('testartifact2'), ['TestArtifact2'])
+
+    def test_search_attributes(self):
+        self.assertEqual(self.search('HKEY_LOCAL_MACHINE'), ['TestArtifact3'])
+        self.assertCountEqual(self.search('testing'), ['TestArtifact1', 'TestArtifact2', 'TestArtifact3'])
+
+    def test_search_ranking(self):
+        upload = ArtifactFileUpload('test_data/test_artifacts_import.upload')
+        test_request = dummy_request(self.db_session)
+        test_request.params.add('artifact_file', upload)
+        artifact_views.artifact_import(test_request)
+        artifact = self.db_session.query(Artifact).filter_by(name='TestArtifact3').one()
+        artifact.search.doc = 'Mentions TestArtifact5'
+        self.db_session.flush()
+        self.assertEqual(self.search('TestArtifact5'), ['TestArtifact5', 'TestArtifact3'])
+
+    def test_search_update_and_delete(self):
+        artifact = self.db_session.query(Artifact).filter_by(name='TestArtifact3').one()
+        test_request = dummy_request(self.db_session)
+        test_request.matchdict['id'] = artifact.id
+        test_request.params.add('artifact_data', TEST_ARTIFACT)
+        artifact_views.artifact_update(test_request)
+        self.db_session.flush()
+        self.assertEqual(self.search('TestArtifact3'), [])
+        self.assertEqual(self.search('TestArtifact4'), ['TestArtifact4'])
+
+        test_request = dummy_request(self.db_session)
+        test_request.matchdict['id'] = artifact.id
+        artifact_views.artifact_delete(test_request)
+        self.db_session.flush()
+        self.assertEqual(self.search('TestArtifact4'), [])
+
+    def test_search_missing_query_failure(self):
+        test_request = dummy_request(self.db_session)
+        test_request.params.add('q', ' ? ')
+        response = artifact_views.search_view(test_request)
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.text, artifact_views.missing_query_err_msg)
+
+
+class TestSearchFallback(TestSearchView):
+
+    def setUp(self):
+        super(TestSearchFallback, self).setUp()
+        self.fts_available = search.fts_available
+        search.fts_available = lambda db_session: False
+
+    def tearDown(self):
+        search.fts_available = self.fts_available
+        super(TestSearchFallback, self).tearDown()
+
+    def test_search_fts_available(self):
+        self.assertFalse(search.fts_available(self.db_session))
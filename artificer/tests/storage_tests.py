@@ -0,0 +1,95 @@
+import json
+import unittest
+
+from sqlalchemy import Text, inspect, type_coerce
+
+from artificer.tests.base_tests import BaseTest
+from artificer.tests.artifacts_view_tests import dummy_request
+
+import artifacts.reader as fa_readers
+
+import artificer.views.artifacts as artifact_views
+from artificer.lib.artifacts import get_artifact, import_artifacts
+from artificer.models import Artifact
+from artificer.models.storage import ZLIB_PREFIX, configure_storage, decode_definition, encode_definition
+from artificer.scripts.convertstorage import convert_artifact_storage
+
+LARGE_ARTIFACT = {
+    "name": "LargeDocArtifact",
+    "doc": "Collects every log file. " * 200,
+    "sources": [{"type": "FILE", "attributes": {"paths": ["/var/log/%d/*.log" % index for index in range(100)]}}],
+    "supported_os": ["Linux"],
+}
+
+
+class TestDefinitionEncoding(unittest.TestCase):
+
+    def test_encode_definition(self):
+        artifact_definition = json.dumps(LARGE_ARTIFACT, sort_keys=True)
+        packed = encode_definition(artifact_definition, 'zlib')
+        self.assertTrue(packed.startswith(ZLIB_PREFIX))
+        self.assertLess(len(packed), len(artifact_definition))
+        self.assertEqual(decode_definition(packed), artifact_definition)
+        self.assertEqual(encode_definition(packed, 'json'), artifact_definition)
+        self.assertEqual(encode_definition(packed, 'zlib'), packed)
+
+    def test_small_definitions_stay_json(self):
+        self.assertEqual(encode_definition('{"name": "A"}', 'zlib'), '{"name": "A"}')
+        self.assertIsNone(encode_definition(None, 'zlib'))
+
+    def test_invalid_storage_format(self):
+        self.assertRaises(ValueError, configure_storage, {'artificer.storage_format': 'msgpack'})
+
+
+class TestCompressedStorage(BaseTest):
+
+    def setUp(self):
+        super(TestCompressedStorage, self).setUp()
+        configure_storage({'artificer.storage_format': 'zlib'})
+        self.init_database()
+        forensic_artifact = fa_readers.ArtifactsReader().ReadArtifactDefinitionValues(LARGE_ARTIFACT)
+        self.db_session.add(get_artifact(self.db_session, forensic_artifact, author='admin'))
+        self.db_session.flush()
+        self.artifact_id = self.db_session.query(Artifact.id).filter_by(name='LargeDocArtifact').scalar()
+
+    def tearDown(self):
+        configure_storage({})
+        super(TestCompressedStorage, self).tearDown()
+
+    def stored(self, artifact_id):
+        return self.db_session.query(type_coerce(Artifact.data, Text)).filter_by(id=artifact_id).scalar()
+
+    def test_definitions_stored_compressed(self):
+        self.assertTrue(self.stored(self.artifact_id).startswith(ZLIB_PREFIX))
+        artifact = self.db_session.query(Artifact).filter_by(id=self.artifact_id).one()
+        self.assertEqual(json.loads(artifact.data)['name'], 'LargeDocArtifact')
+
+    def test_data_deferred(self):
+        self.db_session.expunge_all()
+        artifact = self.db_session.query(Artifact).filter_by(id=self.artifact_id).one()
+        self.assertNotIn('data', inspect(artifact).dict)
+        self.assertEqual(json.loads(artifact.data)['name'], 'LargeDocArtifact')
+
+    def test_bulk_import_compressed(self):
+        forensic_artifact = fa_readers.ArtifactsReader().ReadArtifactDefinitionValues(
+            dict(LARGE_ARTIFACT, name='LargeDocArtifact2'))
+        results = import_artifacts(self.db_session, [forensic_artifact], 'admin')
+        self.assertTrue(self.stored(results['ids'][0]).startswith(ZLIB_PREFIX))
+
+    def test_artifact_view_decodes(self):
+        test_request = dummy_request(self.db_session)
+        test_request.matchdict['id'] = self.artifact_id
+        response = artifact_views.artifact_view(test_request)
+        self.assertEqual(response.json['doc'], LARGE_ARTIFACT['doc'])
+
+    def test_convert_artifact_storage(self):
+        compressed, before, after = convert_artifact_storage(self.db_session, 'json')
+        self.assertGreaterEqual(compressed, 1)
+        self.assertGreater(after, before)
+        self.assertFalse(self.stored(self.artifact_id).startswith(ZLIB_PREFIX))
+
+        count, before, after = convert_artifact_storage(self.db_session, 'zlib', batch_size=2)
+        self.assertEqual(count, compressed)
+        self.assertLess(after, before)
+        self.assertTrue(self.stored(self.artifact_id).startswith(ZLIB_PREFIX))
+        self.assertEqual(convert_artifact_storage(self.db_session, 'zlib')[0], 0)
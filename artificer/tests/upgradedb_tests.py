@@ -0,0 +1,124 @@
+import json
+
+import transaction
+
+from artificer.tests.base_tests import BaseTest
+
+from sqlalchemy import inspect, text
+
+
+class TestUpgradeSchema(BaseTest):
+
+    def test_upgrade_adds_missing_columns(self):
+        from artificer.scripts.upgradedb import upgrade_schema
+        with self.engine.begin() as connection:
+            connection.execute(text('CREATE TABLE artifacts (id INTEGER PRIMARY KEY, user_id INTEGER, '
+                                    'name VARCHAR, data TEXT)'))
+        upgrade_schema(self.engine)
+        column_names = [column['name'] for column in inspect(self.engine).get_columns('artifacts')]
+        self.assertIn('yaml_data', column_names)
+
+
+class TestBackfill(BaseTest):
+
+    def setUp(self):
+        super(TestBackfill, self).setUp()
+        self.init_database()
+
+    def test_canonicalize_artifact_data(self):
+        from artificer.models import Artifact
+        from artificer.scripts.upgradedb import canonicalize_artifact_data
+        artifact = self.db_session.query(Artifact).filter_by(name='TestArtifact1').one()
+        artifact_definition = artifact.data
+        artifact.data = json.dumps(json.loads(artifact_definition), indent=2)
+        self.db_session.flush()
+
+        self.assertEqual(canonicalize_artifact_data(self.db_session), 1)
+        self.db_session.expire_all()
+        artifact = self.db_session.query(Artifact).filter_by(name='TestArtifact1').one()
+        self.assertEqual(artifact.data, artifact_definition)
+        self.assertEqual(canonicalize_artifact_data(self.db_session), 0)
+
+    def test_canonicalize_logs_no_changes(self):
+        from artificer.lib.catalog import get_catalog_generation
+        from artificer.models import Artifact, ArtifactChange
+        from artificer.scripts.upgradedb import canonicalize_artifact_data
+        artifact = self.db_session.query(Artifact).filter_by(name='TestArtifact1').one()
+        artifact.data = json.dumps(json.loads(artifact.data), indent=2)
+        transaction.commit()
+        change_count = self.db_session.query(ArtifactChange).count()
+        generation = get_catalog_generation(self.db_session)
+
+        self.assertEqual(canonicalize_artifact_data(self.db_session), 1)
+        transaction.commit()
+        self.assertEqual(self.db_session.query(ArtifactChange).count(), change_count)
+        self.assertEqual(get_catalog_generation(self.db_session), generation)
+
+    def test_backfill_artifact_yaml(self):
+        from artificer.models import Artifact, ArtifactChange
+        from artificer.scripts.upgradedb import backfill_artifact_yaml
+        artifact = self.db_session.query(Artifact).filter_by(name='TestArtifact1').one()
+        artifact_yaml = artifact.yaml_data
+        artifact.yaml_data = None
+        self.db_session.flush()
+
+        transaction.commit()
+        change_count = self.db_session.query(ArtifactChange).count()
+
+        self.assertEqual(backfill_artifact_yaml(self.db_session), 1)
+        transaction.commit()
+        artifact = self.db_session.query(Artifact).filter_by(name='TestArtifact1').one()
+        self.assertEqual(artifact.yaml_data, artifact_yaml)
+        self.assertEqual(backfill_artifact_yaml(self.db_session), 0)
+        self.assertEqual(self.db_session.query(ArtifactChange).count(), change_count)
+
+    def test_backfill_artifact_search(self):
+        from artificer.lib.search import search_artifacts
+        from artificer.models import ArtifactChange, ArtifactSearch
+        from artificer.scripts.upgradedb import backfill_artifact_search
+        self.db_session.query(ArtifactSearch).delete()
+        self.assertEqual(search_artifacts(self.db_session, 'TestArtifact1'), [])
+        transaction.commit()
+        change_count = self.db_session.query(ArtifactChange).count()
+
+        self.assertEqual(backfill_artifact_search(self.db_session), 3)
+        self.assertEqual(self.db_session.query(ArtifactChange).count(), change_count)
+        self.assertEqual([result['name'] for result in search_artifacts(self.db_session, 'TestArtifact1')],
+                         ['TestArtifact1'])
+        self.assertEqual(backfill_artifact_search(self.db_session), 0)
+
+    def test_rebuild_source_paths(self):
+        from artificer.models import SourcePath
+        from artificer.scripts.upgradedb import rebuild_source_paths
+        self.db_session.flush()
+        patterns = sorted(self.db_session.query(SourcePath.artifact_id, SourcePath.pattern))
+        self.assertEqual(rebuild_source_paths(self.db_session), len(patterns))
+        self.assertEqual(sorted(self.db_session.query(SourcePath.artifact_id, SourcePath.pattern)), patterns)
+
+    def test_rebuild_group_members(self):
+        from artificer.models import GroupMember
+        from artificer.scripts.upgradedb import rebuild_group_members
+        self.db_session.flush()
+        members = sorted(self.db_session.query(GroupMember.artifact_id, GroupMember.member_name))
+        self.assertEqual(rebuild_group_members(self.db_session), len(members))
+        self.assertEqual(sorted(self.db_session.query(GroupMember.artifact_id, GroupMember.member_name)), members)
+
+    def test_rebuild_source_attributes(self):
+        from artificer.models import SourceAttribute
+        from artificer.scripts.upgradedb import rebuild_source_attributes
+        self.db_session.flush()
+        values = sorted(self.db_session.query(SourceAttribute.artifact_id, SourceAttribute.name, SourceAttribute.value))
+        self.assertTrue(values)
+        self.assertEqual(rebuild_source_attributes(self.db_session), len(values))
+        self.assertEqual(sorted(self.db_session.query(SourceAttribute.artifact_id, SourceAttribute.name,
+                                                      SourceAttribute.value)), values)
+
+    def test_seed_artifact_changes(self):
+        from artificer.models import ArtifactChange
+        from artificer.scripts.upgradedb import seed_artifact_changes
+        self.db_session.flush()
+        self.db_session.query(ArtifactChange).delete()
+        self.assertEqual(seed_artifact_changes(self.db_session), 3)
+        self.assertEqual(seed_artifact_changes(self.db_session), 0)
+        changes = self.db_session.query(ArtifactChange.name, ArtifactChange.action).order_by(ArtifactChange.seq).all()
+        self.assertEqual(changes, [('TestArtifact1', 'created'), ('TestArtifact2', 'created'), ('TestArtifact3', 'created')])
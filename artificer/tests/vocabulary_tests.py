@@ -0,0 +1,56 @@
+import transaction
+
+from artificer.tests.base_tests import BaseTest, QueryCounter
+
+
+class TestVocabularyCache(BaseTest):
+
+    def setUp(self):
+        super(TestVocabularyCache, self).setUp()
+        self.init_database()
+        transaction.commit()
+
+    def test_cached_lookup(self):
+        from artificer.lib.artifacts import get_label
+        from artificer.lib.vocabulary import vocabulary_cache
+        from artificer.models import Label
+        vocabulary_cache.load(self.db_session)
+        label = self.db_session.query(Label).filter_by(name='Software').one()
+        with QueryCounter(self.engine) as counter:
+            self.assertIs(get_label(self.db_session, 'Software', ''), label)
+        self.assertEqual(counter.count, 0)
+
+    def test_rolled_back_vocabulary_not_cached(self):
+        from artificer.lib.artifacts import get_label
+        from artificer.lib.vocabulary import vocabulary_cache
+        from artificer.models import Label
+        get_label(self.db_session, 'Uncommitted', '')
+        self.db_session.flush()
+        self.assertEqual(vocabulary_cache.lookup(self.db_session, Label.name, ['Uncommitted']), {})
+        transaction.abort()
+
+        self.assertEqual(vocabulary_cache.lookup(self.db_session, Label.name, ['Uncommitted']), {})
+        self.assertEqual(self.db_session.query(Label).filter_by(name='Uncommitted').count(), 0)
+
+    def test_abort_forgets_added_vocabulary(self):
+        # zope.sqlalchemy aborts by closing the session, without after_rollback
+        from artificer.lib.artifacts import get_label
+        from artificer.lib.vocabulary import VOCABULARY_ADDED
+        get_label(self.db_session, 'Uncommitted', '')
+        self.db_session.flush()
+        self.assertTrue(self.db_session.info.get(VOCABULARY_ADDED))
+        transaction.abort()
+        self.assertNotIn(VOCABULARY_ADDED, self.db_session.info)
+
+    def test_committed_vocabulary_invalidates(self):
+        from artificer.lib.artifacts import get_label
+        from artificer.lib.vocabulary import vocabulary_cache
+        from artificer.models import Label
+        vocabulary_cache.load(self.db_session)
+        label = get_label(self.db_session, 'Committed', '')
+        self.db_session.flush()
+        label_id = label.id
+        transaction.commit()
+
+        self.assertFalse(vocabulary_cache.warm)
+        self.assertEqual(vocabulary_cache.lookup(self.db_session, Label.name, ['Committed']), {'Committed': label_id})
@@ -1,18 +1,46 @@
+import hashlib
 import json
+from urllib.parse import urlencode, urlsplit
 
 from pyramid.response import Response
 from pyramid.view import view_config
 import pyramid.exceptions
+import pyramid.httpexceptions
 
+from webob.etag import ETagMatcher
+
+from sqlalchemy import or_
 from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import undefer
 from sqlalchemy.orm.exc import NoResultFound
 
-from artificer.models import Artifact, Label, SupportedOS, Source, User
-
-from artificer.lib.artifacts import update_artifact, get_artifact
+from artificer.models import Artifact, ImportJob, Label, SupportedOS, Source, User
+
+from artificer.lib.artifacts import (
+    update_artifact,
+    update_artifacts,
+    delete_artifacts,
+    get_artifact,
+    import_artifacts,
+    query_facet_index,
+    query_facet_counts,
+    render_artifact_yaml,
+    hash_artifact_definition,
+    )
+from artificer.lib.attributes import parse_source_attribute_filter
+from artificer.lib.cache import result_cache
+from artificer.lib.catalog import catalog_changed, get_catalog_generation
+from artificer.lib.changes import query_artifact_changes
+from artificer.lib import events
 from artificer.lib.errors import ArtifactAlreadyExists, MissingAuthor
+from artificer.lib.facets import FILTER_MODES, select_artifact_index
+from artificer.lib.groups import dependency_order, expand_group
+from artificer.lib.jobs import get_spool_dir, import_job_entry, queue_import
+from artificer.lib.paths import match_paths
+from artificer.lib.plans import compile_collection_plan
+from artificer.lib.parsing import read_artifacts_file_object
+from artificer.lib.search import search_artifacts, search_terms
 
-import artifacts.writer as fa_writers
 import artifacts.reader as fa_readers
 import artifacts.errors as fa_errors
 
@@ -37,120 +65,532 @@ artifact_exists_err_msg = "Artifact exists"
 num_artifact_err_msg = "Must provide only one artifact_data parameter"
 invalid_artifact_err_msg = "Invalid artifact sent"
 invalid_file_err_msg = "Missing or invalid artifact yaml file"
+invalid_page_err_msg = "limit and after must be non-negative integers"
+missing_query_err_msg = "Missing search query"
+missing_path_err_msg = "Missing path parameter"
+invalid_since_err_msg = "since and limit must be non-negative integers"
+missing_batch_err_msg = "Missing id or name parameter"
+batch_size_err_msg = "Too many artifacts requested, the limit is %d"
+invalid_id_err_msg = "Artifact ids must be integers"
+missing_bulk_ids_err_msg = "Missing id parameter"
+missing_bulk_artifacts_err_msg = "Missing or invalid artifacts parameter, expected a JSON list of id and artifact_data"
+events_disabled_err_msg = "Event stream is not enabled, set artificer.events_port"
+invalid_source_attr_err_msg = "source_attr filters must be given as name:pattern"
+missing_selection_err_msg = "Missing supported_os, labels or id parameter"
+invalid_mode_err_msg = "Filter modes must be one of: %s" % ', '.join(FILTER_MODES)
+
+default_stream_page_size = 500
+default_export_batch_size = 100
+default_search_limit = 50
+default_changes_limit = 500
+default_batch_max = 500
+
+
+def _param_enabled(request, name, default=True):
+    value = request.params.get(name)
+    if value is None:
+        return default
+    return value.lower() not in ('false', '0', 'no', 'off')
+
+
+def _get_int_param(request, name):
+    value = request.params.get(name)
+    if value is None:
+        return None
+    value = int(value)
+    if value < 0:
+        raise ValueError(value)
+    return value
+
+
+def _get_filter_modes(request):
+    modes = {}
+    for filter_key, param in (('labels', 'labels'), ('supported_os', 'supported_os'),
+                              ('authors', 'author'), ('sources', 'sources'),
+                              ('source_attributes', 'source_attr')):
+        mode = request.params.get(param + '_mode', 'any').lower()
+        if mode not in FILTER_MODES:
+            raise ValueError(mode)
+        modes[filter_key] = mode
+    return modes
+
+
+def _get_cache_generation(db_session):
+    """Returns the catalog generation to key cached results on.
+
+    Returns None, bypassing the cache, while the session holds uncommitted
+    catalog changes.
+    """
+    if catalog_changed(db_session):
+        return None
+    return get_catalog_generation(db_session)
+
+
+def _generation_etag(cache_key):
+    """Returns a strong ETag for a result keyed on the catalog generation."""
+    return 'g%d-%s' % (cache_key[-1], hashlib.sha1(repr(cache_key[:-1]).encode('utf-8')).hexdigest()[:16])
+
+
+def _etag_matches(request, etag):
+    if_none_match = request.headers.get('If-None-Match')
+    # If-None-Match uses the weak comparison (RFC 7232, section 3.2)
+    return bool(if_none_match) and etag in ETagMatcher.parse(if_none_match, strong=False)
+
+
+def _not_modified(etag):
+    response = Response(status=304)
+    response.etag = etag
+    return response
+
+
+def _filter_cache_key(filters, modes):
+    return tuple((filter_key, tuple(sorted(set(values))), modes.get(filter_key, 'any'))
+                 for filter_key, values in sorted(filters.items()) if values)
+
+
+def _stream_artifact_index(session_factory, filters, modes, first_page, page_size):
+    db_session = None
+    try:
+        yield b'{"artifacts": ['
+        page = first_page
+        separator = b''
+        while page:
+            yield separator + b', '.join(json.dumps(entry).encode('utf-8') for entry in page)
+            separator = b', '
+            if len(page) < page_size:
+                break
+
+            if db_session is None:
+                db_session = session_factory()
+            else:
+                db_session.expunge_all()
+            page = select_artifact_index(db_session, filters, modes, after=page[-1]['id'], limit=page_size)
+        yield b']}'
+    finally:
+        if db_session is not None:
+            db_session.close()
 
 
 @view_config(route_name='artifacts', renderer='json')
 def artifacts_view(request):
     results = {'artifacts': []}
-    label_filter = request.params.getall('labels')
-    supported_os_filter = request.params.getall('supported_os')
-    author_filter = request.params.getall('author')
-    source_filter = request.params.getall('sources')
-
-    try:
-        artifacts = request.db_session.query(Artifact)
-        if label_filter:
-            artifacts = artifacts.filter(Artifact.labels.any(Label.name.in_(label_filter)))
-
-        if supported_os_filter:
-            artifacts = artifacts.filter(Artifact.supported_os.any(SupportedOS.name.in_(supported_os_filter)))
-
-        if author_filter:
-            artifacts = artifacts.filter(Artifact.author.has(User.name.in_(author_filter)))
-
-        if source_filter:
-            artifacts = artifacts.filter(Artifact.sources.any(Source.type.in_(source_filter)))
-
-        for artifact in artifacts:
-            results['artifacts'].append({
-                'name': artifact.name,
-                'id': artifact.id,
-                'author': artifact.author.name,
-                'supported_os': [supported_os.name for supported_os in artifact.supported_os],
-                'labels': [label.name for label in artifact.labels],
-                'sources': [source.type for source in artifact.sources]
-            })
+    filters = {
+        'labels': request.params.getall('labels'),
+        'supported_os': request.params.getall('supported_os'),
+        'authors': request.params.getall('author'),
+        'sources': request.params.getall('sources'),
+        'source_attributes': request.params.getall('source_attr'),
+    }
+    stream = _param_enabled(request, 'stream', default=False)
+
+    try:
+        for value in filters['source_attributes']:
+            parse_source_attribute_filter(value)
+    except ValueError:
+        return Response(invalid_source_attr_err_msg, content_type='text/plain', status=500)
+
+    try:
+        after = _get_int_param(request, 'after')
+        limit = _get_int_param(request, 'limit')
+    except ValueError:
+        return Response(invalid_page_err_msg, content_type='text/plain', status=500)
+
+    try:
+        modes = _get_filter_modes(request)
+    except ValueError:
+        return Response(invalid_mode_err_msg, content_type='text/plain', status=500)
+
+    if stream:
+        limit = int(request.registry.settings.get('artificer.stream_page_size', default_stream_page_size))
+
+    cache_key = etag = None
+    try:
+        generation = _get_cache_generation(request.db_session)
+        if generation is not None:
+            cache_key = ('artifacts', _filter_cache_key(filters, modes), after, limit, stream, generation)
+            etag = _generation_etag(cache_key)
+            if _etag_matches(request, etag):
+                return _not_modified(etag)
+            request.response.etag = etag
+            cached = None if stream else result_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        results['artifacts'] = select_artifact_index(request.db_session, filters, modes,
+                                                     after=after, limit=limit, generation=generation)
     except DBAPIError:
         return Response(db_err_msg, content_type='text/plain', status=500)
 
+    if stream:
+        # Later pages are read after pyramid_tm has closed the request
+        # session, so the stream holds its own read-only session.
+        session_factory = request.registry['dbsession_factory']
+        response = Response(content_type='application/json',
+                            charset='UTF-8',
+                            app_iter=_stream_artifact_index(session_factory, filters, modes, results['artifacts'], limit))
+        if etag is not None:
+            response.etag = etag
+        return response
+
+    if limit is not None:
+        results['next'] = None
+        if limit and len(results['artifacts']) == limit:
+            results['next'] = results['artifacts'][-1]['id']
+
+    if cache_key is not None:
+        result_cache.put(cache_key, results)
     return results
 
 
-@view_config(route_name='labels', renderer='json')
-def labels_view(request):
-    results = {'labels': []}
+def _facet_view(request, facet_key, value_key, facet_column, facet_artifacts):
+    results = {facet_key: []}
+    expand = _param_enabled(request, 'expand')
+    cache_key = None
     try:
-        labels = request.db_session.query(Label).all()
+        generation = _get_cache_generation(request.db_session)
+        if generation is not None:
+            cache_key = (facet_key, expand, generation)
+            etag = _generation_etag(cache_key)
+            if _etag_matches(request, etag):
+                return _not_modified(etag)
+            request.response.etag = etag
+            cached = result_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        if expand:
+            facets = query_facet_index(request.db_session, facet_column, facet_artifacts)
+        else:
+            facets = query_facet_counts(request.db_session, facet_column, facet_artifacts)
     except DBAPIError:
         return Response(db_err_msg, content_type='text/plain', status=500)
 
-    for label in labels:
-        results['labels'].append({
-            'name': label.name,
-            'artifacts': [{'id': artifact.id, 'name': artifact.name} for artifact in label.artifacts]
-        })
+    for facet_value, artifacts in facets.items():
+        if expand:
+            results[facet_key].append({value_key: facet_value, 'artifacts': artifacts})
+        else:
+            results[facet_key].append({value_key: facet_value, 'count': artifacts})
+
+    if cache_key is not None:
+        result_cache.put(cache_key, results)
     return results
 
 
+@view_config(route_name='labels', renderer='json')
+def labels_view(request):
+    return _facet_view(request, 'labels', 'name', Label.name, Label.artifacts)
+
+
 @view_config(route_name='supported_os', renderer='json')
 def supported_os_view(request):
-    results = {'supported_os': []}
+    return _facet_view(request, 'supported_os', 'name', SupportedOS.name, SupportedOS.artifacts)
+
+
+@view_config(route_name='sources', renderer='json')
+def sources_view(request):
+    return _facet_view(request, 'sources', 'type', Source.type, Source.artifacts)
+
+
+@view_config(route_name='authors', renderer='json')
+def authors_view(request):
+    return _facet_view(request, 'authors', 'name', User.name, User.artifacts)
+
+
+@view_config(route_name='search', renderer='json')
+def search_view(request):
+    query = request.params.get('q', '')
+    if not search_terms(query):
+        return Response(missing_query_err_msg, content_type='text/plain', status=500)
+
     try:
-        supported_oss = request.db_session.query(SupportedOS).all()
+        limit = _get_int_param(request, 'limit')
+    except ValueError:
+        return Response(invalid_page_err_msg, content_type='text/plain', status=500)
+    if limit is None:
+        limit = default_search_limit
+
+    try:
+        results = search_artifacts(request.db_session, query, limit=limit)
     except DBAPIError:
         return Response(db_err_msg, content_type='text/plain', status=500)
 
-    for supported_os in supported_oss:
-        results['supported_os'].append({
-            'name': supported_os.name,
-            'artifacts': [{'id': artifact.id, 'name': artifact.name} for artifact in supported_os.artifacts]
-        })
-    return results
+    return {'artifacts': results}
 
 
-@view_config(route_name='sources', renderer='json')
-def sources_view(request):
-    results = {'sources': []}
+@view_config(route_name='changes', renderer='json')
+def changes_view(request):
+    try:
+        since = _get_int_param(request, 'since') or 0
+        limit = _get_int_param(request, 'limit')
+    except ValueError:
+        return Response(invalid_since_err_msg, content_type='text/plain', status=500)
+    if limit is None:
+        limit = default_changes_limit
+
     try:
-        sources = request.db_session.query(Source).all()
+        changes = query_artifact_changes(request.db_session, since=since, limit=limit)
     except DBAPIError:
         return Response(db_err_msg, content_type='text/plain', status=500)
 
-    for source in sources:
-        results['sources'].append({
-            'type': source.type,
-            'artifacts': [{'id': artifact.id, 'name': artifact.name} for artifact in source.artifacts]
-        })
+    results = {'changes': changes, 'next': since}
+    if changes:
+        results['next'] = changes[-1]['seq']
     return results
 
 
-@view_config(route_name='authors', renderer='json')
-def authors_view(request):
-    results = {'authors': []}
+@view_config(route_name='events')
+def events_view(request):
+    # Subscribers are served by the broadcaster's own port so they do not
+    # hold a WSGI worker thread for the life of the connection.
+    broadcaster = events.event_broadcaster
+    if broadcaster is None or not broadcaster.running:
+        return Response(events_disabled_err_msg, content_type='text/plain', status=500)
+
+    location = request.registry.settings.get('artificer.events_url')
+    if location is None:
+        host_url = urlsplit(request.host_url)
+        location = '%s://%s:%d/events' % (host_url.scheme, host_url.hostname, broadcaster.port)
+    if request.params:
+        location += '?' + urlencode(list(request.params.items()))
+    return pyramid.httpexceptions.HTTPTemporaryRedirect(location=location)
+
+
+@view_config(route_name='artifact_match', renderer='json')
+def artifact_match_view(request):
+    paths = request.params.getall('path')
+    if not paths:
+        return Response(missing_path_err_msg, content_type='text/plain', status=500)
+
     try:
-        users = request.db_session.query(User).all()
+        matches = match_paths(request.db_session, paths)
     except DBAPIError:
         return Response(db_err_msg, content_type='text/plain', status=500)
 
-    for user in users:
-        results['authors'].append({
-            'name': user.name,
-            'artifacts': [{'id': artifact.id, 'name': artifact.name} for artifact in user.artifacts]
-        })
-    return results
+    return {'matches': matches}
+
+
+@view_config(route_name='collection_plan', renderer='json')
+def collection_plan_view(request):
+    filters = {
+        'labels': request.params.getall('labels'),
+        'supported_os': request.params.getall('supported_os'),
+    }
+    try:
+        artifact_ids = [int(artifact_id) for artifact_id in request.params.getall('id')]
+    except ValueError:
+        return Response(invalid_id_err_msg, content_type='text/plain', status=500)
+    if not artifact_ids and not any(filters.values()):
+        return Response(missing_selection_err_msg, content_type='text/plain', status=500)
+
+    cache_key = None
+    try:
+        generation = _get_cache_generation(request.db_session)
+        if generation is not None:
+            cache_key = ('plan', _filter_cache_key(filters, {}), tuple(sorted(set(artifact_ids))), generation)
+            etag = _generation_etag(cache_key)
+            if _etag_matches(request, etag):
+                return _not_modified(etag)
+            request.response.etag = etag
+            cached = result_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        if any(filters.values()):
+            entries = select_artifact_index(request.db_session, filters, generation=generation)
+            artifact_ids = [entry['id'] for entry in entries] + artifact_ids
+        plan = compile_collection_plan(request.db_session, artifact_ids, supported_os=filters['supported_os'])
+    except DBAPIError:
+        return Response(db_err_msg, content_type='text/plain', status=500)
+
+    if cache_key is not None:
+        result_cache.put(cache_key, plan)
+    return plan
+
+
+def _bulk_results(request, statuses, partial):
+    succeeded = [status['status'] in ('deleted', 'updated', 'unchanged') for status in statuses]
+    # A partial request applied whatever succeeded, so only it escapes the 409
+    if partial:
+        applied = any(succeeded)
+    else:
+        applied = all(succeeded)
+        if not applied:
+            request.response.status_int = 409
+    return {'applied': applied, 'results': statuses}
+
+
+@view_config(request_method='DELETE', route_name='artifacts_bulk', renderer='json')
+def artifacts_bulk_delete(request):
+    partial = _param_enabled(request, 'partial', default=False)
+    try:
+        artifact_ids = [int(artifact_id) for artifact_id in request.params.getall('id')]
+    except ValueError:
+        return Response(invalid_id_err_msg, content_type='text/plain', status=500)
+
+    if not artifact_ids:
+        return Response(missing_bulk_ids_err_msg, content_type='text/plain', status=500)
+    batch_max = int(request.registry.settings.get('artificer.batch_max', default_batch_max))
+    if len(artifact_ids) > batch_max:
+        return Response(batch_size_err_msg % batch_max, content_type='text/plain', status=500)
+
+    try:
+        statuses = delete_artifacts(request.db_session, artifact_ids, partial=partial)
+    except DBAPIError:
+        return Response(db_err_msg, content_type='text/plain', status=500)
+
+    return _bulk_results(request, statuses, partial)
+
+
+@view_config(request_method='PUT', route_name='artifacts_bulk', renderer='json')
+def artifacts_bulk_update(request):
+    partial = _param_enabled(request, 'partial', default=False)
+    artifact_reader = fa_readers.ArtifactsReader()
+
+    try:
+        items = json.loads(request.params.getone('artifacts'))
+        updates = [(int(item['id']), item.get('artifact_data')) for item in items]
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return Response(missing_bulk_artifacts_err_msg, content_type='text/plain', status=500)
+
+    if not updates:
+        return Response(missing_bulk_artifacts_err_msg, content_type='text/plain', status=500)
+    batch_max = int(request.registry.settings.get('artificer.batch_max', default_batch_max))
+    if len(updates) > batch_max:
+        return Response(batch_size_err_msg % batch_max, content_type='text/plain', status=500)
+
+    forensic_artifacts = []
+    for artifact_id, artifact_definition in updates:
+        try:
+            forensic_artifact = artifact_reader.ReadArtifactDefinitionValues(artifact_definition)
+        except (fa_errors.FormatError, TypeError):
+            forensic_artifact = None
+        forensic_artifacts.append((artifact_id, forensic_artifact))
+
+    try:
+        statuses = update_artifacts(request.db_session, forensic_artifacts, author='admin', partial=partial)
+    except MissingAuthor:
+        return Response(missing_author_err_msg, content_type='text/plain', status=500)
+    except DBAPIError:
+        return Response(db_err_msg, content_type='text/plain', status=500)
+
+    return _bulk_results(request, statuses, partial)
+
+
+@view_config(route_name='artifact_batch')
+def artifact_batch_view(request):
+    artifact_ids = []
+    missing_ids = []
+    for artifact_id in request.params.getall('id'):
+        try:
+            artifact_id = int(artifact_id)
+        except ValueError:
+            missing_ids.append(artifact_id)
+            continue
+        if artifact_id not in artifact_ids:
+            artifact_ids.append(artifact_id)
+    names = []
+    for name in request.params.getall('name'):
+        if name not in names:
+            names.append(name)
+
+    if not artifact_ids and not names and not missing_ids:
+        return Response(missing_batch_err_msg, content_type='text/plain', status=500)
+    batch_max = int(request.registry.settings.get('artificer.batch_max', default_batch_max))
+    if len(artifact_ids) + len(names) + len(missing_ids) > batch_max:
+        return Response(batch_size_err_msg % batch_max, content_type='text/plain', status=500)
+
+    try:
+        artifacts = request.db_session.query(Artifact.id, Artifact.name, Artifact.data).\
+            filter(or_(Artifact.id.in_(artifact_ids), Artifact.name.in_(names))).\
+            all()
+    except DBAPIError:
+        return Response(db_err_msg, content_type='text/plain', status=500)
+
+    by_id = dict((artifact_id, artifact_definition) for artifact_id, _, artifact_definition in artifacts)
+    by_name = dict((name, artifact_id) for artifact_id, name, _ in artifacts)
+
+    # Each artifact is listed once, in request order, ids before names
+    found = []
+    for artifact_id in artifact_ids:
+        if artifact_id in by_id:
+            found.append(artifact_id)
+        else:
+            missing_ids.append(artifact_id)
+    missing_names = []
+    for name in names:
+        if name not in by_name:
+            missing_names.append(name)
+        elif by_name[name] not in found:
+            found.append(by_name[name])
+
+    # The stored definitions are canonical JSON, so they are joined as is
+    body = '{"artifacts":[%s],"missing_ids":%s,"missing_names":%s}' % (
+        ','.join(by_id[artifact_id] for artifact_id in found),
+        json.dumps(missing_ids), json.dumps(missing_names))
+    return Response(body=body.encode('utf-8'), content_type='application/json', charset='UTF-8')
 
 
 @view_config(request_method='GET', route_name='artifact', renderer='json')
 def artifact_view(request):
     artifact_id = request.matchdict.get('id')
     try:
-        artifact = request.db_session.query(Artifact).filter_by(id=artifact_id).one()
+        if request.headers.get('If-None-Match'):
+            # A conditional request checks the hash before the definition is read
+            data_hash, = request.db_session.query(Artifact.data_hash).\
+                filter_by(id=artifact_id).\
+                one()
+            if data_hash and _etag_matches(request, data_hash):
+                return _not_modified(data_hash)
+            artifact_definition = request.db_session.query(Artifact.data).\
+                filter_by(id=artifact_id).\
+                scalar()
+        else:
+            data_hash, artifact_definition = request.db_session.query(Artifact.data_hash, Artifact.data).\
+                filter_by(id=artifact_id).\
+                one()
     except DBAPIError:
         return Response(db_err_msg, content_type='text/plain', status=500)
     except NoResultFound:
         raise pyramid.exceptions.HTTPNotFound()
 
-    return json.loads(artifact.data)
+    etag = data_hash or hash_artifact_definition(artifact_definition)
+    # Only rows without a stored data_hash can still match here
+    if not data_hash and _etag_matches(request, etag):
+        return _not_modified(etag)
+
+    # The stored definition is canonical JSON, so it is served as is
+    response = Response(body=artifact_definition.encode('utf-8'),
+                        content_type='application/json',
+                        charset='UTF-8')
+    response.etag = etag
+    return response
+
+
+@view_config(route_name='artifact_group', renderer='json')
+def artifact_group_view(request):
+    try:
+        artifact_id = int(request.matchdict.get('id'))
+    except ValueError:
+        raise pyramid.exceptions.HTTPNotFound()
+
+    cache_key = None
+    try:
+        generation = _get_cache_generation(request.db_session)
+        if generation is not None:
+            cache_key = ('group', artifact_id, generation)
+            etag = _generation_etag(cache_key)
+            if _etag_matches(request, etag):
+                return _not_modified(etag)
+            request.response.etag = etag
+            cached = result_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        closure = expand_group(request.db_session, artifact_id)
+    except DBAPIError:
+        return Response(db_err_msg, content_type='text/plain', status=500)
+    except NoResultFound:
+        raise pyramid.exceptions.HTTPNotFound()
+
+    if cache_key is not None:
+        result_cache.put(cache_key, closure)
+    return closure
 
 
 @view_config(request_method='DELETE', route_name='artifact', renderer='json')
@@ -233,55 +673,141 @@ def artifact_create(request):
                     status=200)
 
 
+def _query_export_batch(db_session, artifact_ids):
+    """Returns the YAML documents of artifact_ids, in the order given."""
+    artifacts = db_session.query(Artifact).\
+        options(undefer(Artifact.yaml_data)).\
+        filter(Artifact.id.in_(artifact_ids))
+    documents = dict((artifact.id, render_artifact_yaml(artifact).encode('utf-8')) for artifact in artifacts)
+    return [documents[artifact_id] for artifact_id in artifact_ids if artifact_id in documents]
+
+
+def _query_export_hashes(db_session, artifact_ids, batch_size):
+    """Returns (id, data_hash) pairs of artifact_ids in the order given, reading batch_size ids per query."""
+    hashes = {}
+    for offset in range(0, len(artifact_ids), batch_size):
+        hashes.update(db_session.query(Artifact.id, Artifact.data_hash).
+                      filter(Artifact.id.in_(artifact_ids[offset:offset + batch_size])))
+    return [(artifact_id, hashes[artifact_id]) for artifact_id in artifact_ids if artifact_id in hashes]
+
+
+def _stream_artifact_export(session_factory, artifact_ids, first_batch, batch_size):
+    db_session = None
+    try:
+        separator = b''
+        batch = first_batch
+        offset = batch_size
+        while True:
+            for document in batch:
+                yield separator + document
+                separator = b'---\n'
+
+            if offset >= len(artifact_ids):
+                break
+
+            if db_session is None:
+                db_session = session_factory()
+            else:
+                db_session.expunge_all()
+            batch = _query_export_batch(db_session, artifact_ids[offset:offset + batch_size])
+            offset += batch_size
+    finally:
+        if db_session is not None:
+            db_session.close()
+
+
 @view_config(route_name='export_artifacts', renderer='string')
 def artifact_export_view(request):
-    forensic_artifacts = []
-    artifact_reader = fa_readers.ArtifactsReader()
-    artifact_writer = fa_writers.YamlArtifactsWriter()
     artifact_ids = request.params.getall('id')
+    batch_size = int(request.registry.settings.get('artificer.export_batch_size', default_export_batch_size))
 
     if not artifact_ids:
         return ""
 
+    expand = _param_enabled(request, 'expand', default=False)
+    if expand:
+        try:
+            artifact_ids = [int(artifact_id) for artifact_id in artifact_ids]
+        except ValueError:
+            return Response(invalid_id_err_msg, content_type='text/plain', status=500)
+
     try:
-        artifacts = request.db_session.query(Artifact).filter(Artifact.id.in_(artifact_ids))
-        for artifact in artifacts:
-            artifact_definition = json.loads(artifact.data)
-            forensic_artifacts.append(artifact_reader.ReadArtifactDefinitionValues(artifact_definition))
+        if expand:
+            # Groups are followed to every member they reach, members first,
+            # so only the ids of the closure are held in memory
+            artifact_ids = dependency_order(request.db_session, artifact_ids)
+            artifact_hashes = _query_export_hashes(request.db_session, artifact_ids, batch_size)
+        else:
+            artifact_hashes = request.db_session.query(Artifact.id, Artifact.data_hash).\
+                filter(Artifact.id.in_(artifact_ids)).\
+                order_by(Artifact.id).\
+                all()
+        # The export is current for as long as the same artifacts hold the same definitions
+        versions = ''.join('%d:%s\n' % (artifact_id, data_hash) for artifact_id, data_hash in artifact_hashes)
+        etag = hashlib.sha256(versions.encode('utf-8')).hexdigest()
+        if _etag_matches(request, etag):
+            return _not_modified(etag)
+
+        artifact_ids = [artifact_id for artifact_id, _ in artifact_hashes]
+        first_batch = _query_export_batch(request.db_session, artifact_ids[:batch_size])
     except DBAPIError:
         return Response(db_err_msg, content_type='text/plain', status=500)
 
-    return artifact_writer.FormatArtifacts(forensic_artifacts)
+    # Stored documents are read one batch at a time; batches after the
+    # first are read through the stream's own session once the request
+    # session has been closed by pyramid_tm.
+    session_factory = request.registry['dbsession_factory']
+    response = Response(content_type='text/plain',
+                        charset='UTF-8',
+                        app_iter=_stream_artifact_export(session_factory, artifact_ids, first_batch, batch_size))
+    response.etag = etag
+    return response
 
 
 @view_config(route_name='import_artifacts', renderer='json')
 def artifact_import(request):
     # TODO Fix Author
-    replace = request.params.get('replace', False)
+    replace = _param_enabled(request, 'replace', default=False)
     artifact_file = request.params.get('artifact_file')
     if not artifact_file.file:
         return Response(invalid_file_err_msg, content_type='text/plain', status=500)
-    artifact_ids = []
-    failed_artifacts = []
-    artifact_reader = fa_readers.YamlArtifactsReader()
-
-    # TODO Catch bad file reads
 
-    for forensic_artifact in artifact_reader.ReadFileObject(artifact_file.file):
+    if _param_enabled(request, 'job', default=False):
         try:
-            artifact = get_artifact(request.db_session, forensic_artifact, author='admin', replace=replace)
-            request.db_session.add(artifact)
-            artifact_ids.append(artifact.id)
+            job = queue_import(request.db_session, artifact_file.file, artifact_file.filename, author='admin',
+                               replace=replace, spool_dir=get_spool_dir(request.registry.settings))
         except DBAPIError:
             return Response(db_err_msg, content_type='text/plain', status=500)
-        except ArtifactAlreadyExists:
-            failed_artifacts.append(forensic_artifact.name)
-        except MissingAuthor:
-            return Response(missing_author_err_msg, content_type='text/plain', status=500)
+        request.response.status_int = 202
+        return import_job_entry(job)
 
-    if artifact_ids:
+    # Parsed serially; uploads large enough for the process pool go through import jobs
+    forensic_artifacts = read_artifacts_file_object(artifact_file.file)
+
+    # TODO Catch bad file reads
+
+    try:
+        results = import_artifacts(request.db_session, forensic_artifacts, author='admin', replace=replace)
+    except DBAPIError:
+        return Response(db_err_msg, content_type='text/plain', status=500)
+    except MissingAuthor:
+        return Response(missing_author_err_msg, content_type='text/plain', status=500)
+
+    if results['ids']:
         return Response(content_type='application/json; charset=UTF-8',
-                        body={'ids': artifact_ids, 'failed': failed_artifacts},
+                        body=results,
                         status=200)
-    elif failed_artifacts:
+    elif results['failed']:
         return Response(artifact_exists_err_msg, content_type='text/plain', status=500)
+
+
+@view_config(route_name='import_job', renderer='json')
+def import_job_view(request):
+    job_id = request.matchdict.get('job_id')
+    try:
+        job = request.db_session.query(ImportJob).filter_by(id=job_id).one()
+    except DBAPIError:
+        return Response(db_err_msg, content_type='text/plain', status=500)
+    except NoResultFound:
+        raise pyramid.exceptions.HTTPNotFound()
+    return import_job_entry(job)
@@ -60,5 +60,7 @@ setup(name='artificer',
       main = artificer:main
       [console_scripts]
       initialize_artificer_db = artificer.scripts.initializedb:main
+      upgrade_artificer_db = artificer.scripts.upgradedb:main
+      convert_artificer_storage = artificer.scripts.convertstorage:main
       """,
       )